@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Heatmap tile benchmark.
+
+Adds a week of scored fixes to a ``TileStore`` in feed-sized batches and
+reports insert rows/second, then times heatmap queries for one dashboard
+view at several zooms against building the heat points from the raw fixes
+(the score, view and time filters the dashboard used to apply per rerun).
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src import config
+from src.heatmap_tiles import TileStore
+
+START = pd.Timestamp("2025-01-01")
+
+
+def raw_heat(lat, lon, t, score, bbox, start):
+    """Heat points straight from the fixes, as ``map_layers`` does for rows."""
+    south, west, north, east = bbox
+    keep = ((score > config.HEATMAP_HOT_SCORE) & (t >= start) & (lat >= south) & (lat <= north)
+            & (lon >= west) & (lon <= east))
+    return np.column_stack([lat[keep], lon[keep]]).tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--hours", type=int, default=168)
+    parser.add_argument("--batch", type=int, default=config.INGEST_BATCH_ROWS * 10)
+    parser.add_argument("--history", type=int, default=24, help="hours of history shown")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    lat = 23.8 + rng.normal(0, 0.3, args.rows)
+    lon = 68.7 + rng.normal(0, 0.3, args.rows)
+    t = (START + pd.to_timedelta(np.sort(rng.uniform(0, args.hours * 3600, args.rows)), unit="s")).to_numpy()
+    score = rng.random(args.rows)
+
+    store = TileStore()
+    t0 = time.perf_counter()
+    for i in range(0, args.rows, args.batch):
+        store.add(lat[i:i + args.batch], lon[i:i + args.batch], t[i:i + args.batch],
+                  score[i:i + args.batch])
+    store.merge()
+    elapsed = time.perf_counter() - t0
+    cells = sum(len(level["keys"]) for level in store.levels.values())
+    print(f"insert: {args.rows:,} fixes in {elapsed:.2f}s -> {args.rows / elapsed:,.0f} rows/s, "
+          f"{cells:,} (cell, bucket) aggregates over {len(store.levels)} levels")
+
+    start = pd.Timestamp(t[-1]) - pd.Timedelta(hours=args.history)
+    for zoom, half_deg in [(8, 1.5), (11, 0.2), (14, 0.025)]:
+        bbox = (23.8 - half_deg, 68.7 - half_deg * 2, 23.8 + half_deg, 68.7 + half_deg * 2)
+        t0 = time.perf_counter()
+        points = raw_heat(lat, lon, t, score, bbox, start.to_datetime64())
+        raw_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        view = store.query(zoom, bbox=bbox, start=start)
+        tile_s = time.perf_counter() - t0
+        print(f"zoom {zoom:>2}: raw {len(points):>9,} points in {raw_s * 1e3:8.1f} ms   "
+              f"tiles {len(view):>6,} cells ({store.last_scanned:,} aggregates read) in {tile_s * 1e3:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Inference latency benchmark: sklearn pipeline vs compiled forest.
+
+Scores batches of 1, 64 and 10k rows with both paths and reports the
+median latency per call and the largest probability difference.
+"""
+
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src import config
+from src.compiled_model import compile_pipeline
+
+
+def make_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "speed": rng.uniform(1, 9, n),
+            "angle_change": rng.uniform(0, 130, n),
+            "sensor_confidence": rng.uniform(0.55, 0.98, n),
+            "object_type": rng.choice(["Human", "Animal", "Vehicle", "Drone"], n),
+            "terrain": rng.choice(["Salt Flat", "Marshy", "Sandy"], n),
+            "visibility": rng.choice(["Clear", "Foggy", "Night"], n),
+        }
+    )
+
+
+def median_latency(fn, X, repeats):
+    fn(X)
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=str(config.model_path()))
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        pipeline = joblib.load(args.model)
+    compiled = compile_pipeline(pipeline)
+
+    print(f"{'batch':>7} {'pipeline ms':>12} {'compiled ms':>12} {'speed-up':>9} {'max diff':>9}")
+    for batch in (1, 64, 10_000):
+        X = make_rows(batch)
+        slow = median_latency(pipeline.predict_proba, X, args.repeats)
+        fast = median_latency(compiled.predict_proba, X, args.repeats)
+        diff = np.abs(pipeline.predict_proba(X) - compiled.predict_proba(X)).max()
+        print(f"{batch:>7} {slow * 1e3:>12.3f} {fast * 1e3:>12.3f} {slow / fast:>8.1f}x {diff:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
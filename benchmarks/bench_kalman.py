@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Kalman filter throughput benchmark.
+
+Compares the batched multi-agent filter against the per-row reference
+implementation and reports rows/second for both.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.kalman_filter import apply_kalman_filter, apply_kalman_filter_reference
+
+
+def make_tracks(n_rows, n_agents, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "agent_id": rng.integers(0, n_agents, n_rows).astype(str),
+            "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(n_rows), unit="s"),
+            "latitude": 23.8 + rng.normal(0, 1e-4, n_rows).cumsum(),
+            "longitude": 69.5 + rng.normal(0, 1e-4, n_rows).cumsum(),
+        }
+    )
+
+
+def run(fn, df):
+    t0 = time.perf_counter()
+    out = fn(df)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--agents", type=int, default=1_000)
+    parser.add_argument("--reference-rows", type=int, default=5_000,
+                        help="the per-row filter is only timed on this many rows")
+    args = parser.parse_args()
+
+    df = make_tracks(args.rows, args.agents)
+    _, batch_s = run(apply_kalman_filter, df)
+    print(f"batched   : {args.rows:>10,} rows in {batch_s:8.3f}s  -> {args.rows / batch_s:12,.0f} rows/s")
+
+    small = df.iloc[: args.reference_rows]
+    ref, ref_s = run(apply_kalman_filter_reference, small)
+    out, small_s = run(apply_kalman_filter, small)
+    print(f"reference : {len(small):>10,} rows in {ref_s:8.3f}s  -> {len(small) / ref_s:12,.0f} rows/s")
+
+    err = max(
+        np.abs(out["lat_kalman"] - ref["lat_kalman"]).max(),
+        np.abs(out["lon_kalman"] - ref["lon_kalman"]).max(),
+    )
+    print(f"speed-up  : {(args.rows / batch_s) / (len(small) / ref_s):,.0f}x  (max abs diff {err:.2e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Kalman filter accuracy benchmark on the synthetic generator.
+
+Filters ``simulate_agents`` tracks with the fixed-noise filter, the
+adaptive filter (real time gaps, confidence-weighted fixes) and the
+adaptive filter with the RTS smoother, and reports the RMSE in metres of
+each against the true positions (true_latitude, true_longitude) next to
+the raw fixes, along with rows/second.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# generate_data imports config as a top-level module
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from src.generate_data import METRES_PER_DEGREE, simulate_agents
+from src.kalman_filter import apply_kalman_filter
+
+VARIANTS = {
+    "fixed": {"adaptive": False, "smooth": False},
+    "adaptive": {"adaptive": True, "smooth": False},
+    "adaptive+rts": {"adaptive": True, "smooth": True},
+}
+
+
+def rmse_m(df, lat, lon):
+    """Root mean square distance in metres from the true positions."""
+    d_lat = (df[lat] - df["true_latitude"]) * METRES_PER_DEGREE
+    d_lon = (df[lon] - df["true_longitude"]) * METRES_PER_DEGREE * np.cos(np.radians(df["true_latitude"]))
+    return float(np.sqrt(np.mean(d_lat ** 2 + d_lon ** 2)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--agents", type=int, default=1_000)
+    parser.add_argument("--drop", type=float, default=0.3,
+                        help="share of fixes dropped at random, so time gaps vary")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = pd.concat(simulate_agents(args.rows, n_agents=args.agents, seed=args.seed), ignore_index=True)
+    rng = np.random.default_rng(args.seed)
+    df = df[rng.random(len(df)) >= args.drop].reset_index(drop=True)
+
+    print(f"{'raw fixes':<14}: RMSE {rmse_m(df, 'latitude', 'longitude'):8.2f} m")
+    for name, flags in VARIANTS.items():
+        t0 = time.perf_counter()
+        out = apply_kalman_filter(df, **flags)
+        elapsed = time.perf_counter() - t0
+        print(f"{name:<14}: RMSE {rmse_m(out, 'lat_kalman', 'lon_kalman'):8.2f} m"
+              f"   {len(df):,} rows in {elapsed:7.3f}s -> {len(df) / elapsed:12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""
+Parallel preprocessing scaling benchmark.
+
+Times ``calculate_features_parallel`` at increasing worker counts against
+the single-process ``calculate_features`` and reports rows/second and
+speed-up for each.
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# generate_data imports config as a top-level module
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from src.generate_data import simulate_agents
+from src.preprocess_data import calculate_features, calculate_features_parallel
+
+
+def timed(fn, df, **kwargs):
+    t0 = time.perf_counter()
+    fn(df.copy(), **kwargs)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--agents", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    df = pd.concat(simulate_agents(args.rows, n_agents=args.agents, seed=0), ignore_index=True)
+    print(f"{os.cpu_count()} CPUs, {args.rows:,} rows, {args.agents:,} agents")
+
+    serial_s = timed(calculate_features, df)
+    print(f"serial     : {serial_s:8.3f}s  -> {args.rows / serial_s:12,.0f} rows/s")
+    for n in args.workers:
+        s = timed(calculate_features_parallel, df, n_workers=n)
+        print(f"{n:>3} workers: {s:8.3f}s  -> {args.rows / s:12,.0f} rows/s  ({serial_s / s:4.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Storage benchmark: CSV vs partitioned Parquet.
+
+Writes a synthetic processed dataset in both formats and reports disk
+size, full load time and the load time of the training columns only.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src import storage
+
+TRAINING_COLUMNS = ["speed", "angle_change", "sensor_confidence",
+                    "object_type", "terrain", "visibility", "label"]
+
+
+def make_processed(n_rows, n_agents=5_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(n_rows) * 50, unit="ms"),
+            "latitude": 23.8 + rng.uniform(-0.05, 0.05, n_rows),
+            "longitude": 69.5 + rng.uniform(-0.05, 0.05, n_rows),
+            "speed": rng.uniform(1.0, 9.0, n_rows),
+            "angle_change": rng.uniform(0, 130, n_rows),
+            "object_type": rng.choice(["Human", "Animal", "Vehicle", "Drone"], n_rows),
+            "terrain": rng.choice(["Salt Flat", "Marshy", "Sandy"], n_rows),
+            "visibility": rng.choice(["Clear", "Foggy", "Night"], n_rows),
+            "sensor_confidence": rng.uniform(0.55, 0.98, n_rows).round(2),
+            "label": rng.integers(0, 2, n_rows),
+            "agent_id": np.char.add("ID_", rng.integers(0, n_agents, n_rows).astype(str)),
+            "speed_m_s": rng.uniform(0, 10, n_rows),
+            "dist_to_border": rng.uniform(0, 1, n_rows),
+        }
+    )
+
+
+def disk_size(path):
+    path = Path(path)
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--agents", type=int, default=5_000)
+    args = parser.parse_args()
+
+    df = make_processed(args.rows, args.agents)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'format':<8} {'size MB':>10} {'write s':>9} {'load s':>9} {'train cols s':>13}")
+        for suffix in (".csv", ".parquet"):
+            path = Path(tmp) / f"featured{suffix}"
+            write_s = timed(storage.write_table, df, path)
+            load_s = timed(storage.read_table, path)
+            cols_s = timed(storage.read_table, path, columns=TRAINING_COLUMNS)
+            print(f"{suffix[1:]:<8} {disk_size(path) / 1e6:>10.1f} {write_s:>9.2f} {load_s:>9.2f} {cols_s:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Multi-target tracker benchmark on the synthetic generator.
+
+Simulates agents with ``simulate_agents``, drops agent_id and links the
+detections back into tracks frame by frame. Reports detections/second,
+frames/second against the sensor rate, and how well tracks match the true
+agents: purity (share of detections whose track's majority agent is their
+own agent) and identity switches (an agent's track changing between two
+consecutive fixes).
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# generate_data imports config as a top-level module
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from src.generate_data import simulate_agents
+from src.tracker import MultiTargetTracker
+
+
+def track_quality(agents, tracks):
+    """(purity, identity switches) of track ids against the true agent ids."""
+    pairs = pd.DataFrame({"agent": agents, "track": tracks})
+    majority = pairs.groupby(["track", "agent"]).size().groupby("track").max()
+    purity = majority.sum() / len(pairs)
+    # Rows are in timestamp order, so consecutive fixes of an agent are in order
+    by_agent = pairs.groupby("agent")["track"]
+    switches = int((by_agent.shift() != pairs["track"]).sum() - pairs["agent"].nunique())
+    return purity, switches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, default=20_000)
+    parser.add_argument("--steps", type=int, default=30, help="frames, one per second")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    n_rows = args.agents * args.steps
+    df = pd.concat(simulate_agents(n_rows, n_agents=args.agents, seed=args.seed),
+                   ignore_index=True)
+    agents = df.pop("agent_id").to_numpy()
+
+    tracker = MultiTargetTracker()
+    t0 = time.perf_counter()
+    tracks = tracker.assign(df)
+    elapsed = time.perf_counter() - t0
+
+    frames = tracker.frames
+    purity, switches = track_quality(agents, tracks)
+    print(f"detections : {len(df):>10,} in {elapsed:8.3f}s  -> {len(df) / elapsed:12,.0f} detections/s")
+    print(f"frames     : {frames:>10,} of {args.agents:,} targets -> {frames / elapsed:12,.1f} frames/s "
+          f"(sensor rate 1/s: {'keeps up' if frames / elapsed >= 1 else 'falls behind'})")
+    print(f"tracks     : {tracker.next_id - 1:>10,} started, {len(tracker):,} live for {args.agents:,} agents")
+    print(f"purity     : {purity:10.4f}")
+    print(f"id switches: {switches:>10,} ({switches / len(df):.4%} of detections)")
+
+
+if __name__ == "__main__":
+    main()
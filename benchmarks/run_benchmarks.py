@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+"""
+End-to-end pipeline benchmark suite.
+
+Runs every pipeline stage at several dataset sizes and records wall time,
+peak RSS and rows/second per stage. Each stage runs in a fresh process
+inside a scratch project root, so peak RSS belongs to that stage alone.
+
+Results are appended to a JSON history file. When a baseline file exists,
+any stage that is slower than the baseline by more than ``--threshold``
+(as a fraction) fails the run with exit code 1.
+
+    python benchmarks/run_benchmarks.py --scales 1000 100000
+    python benchmarks/run_benchmarks.py --update-baseline
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT))
+# train_model and generate_data import config as a top-level module
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+DEFAULT_SCALES = [1_000, 100_000, 1_000_000, 10_000_000]
+STAGES = ["generate", "kalman", "features", "train", "evaluate", "shap", "scoring"]
+# Stages whose outputs a stage reads from the scratch root
+REQUIRES = {
+    "kalman": ["generate"],
+    "features": ["generate"],
+    "train": ["features"],
+    "evaluate": ["train"],
+    "shap": ["train"],
+    "scoring": ["train"],
+}
+
+
+# --------------------------------------------------
+# Stages. Each returns the number of rows it processed.
+# They run in a child process whose PROJECT_ROOT is the scratch root.
+# --------------------------------------------------
+def _raw_tracks():
+    from src import config, storage
+
+    return storage.read_table(config.raw_data_path())
+
+
+def stage_generate(n_rows, opts):
+    from src import generate_data
+
+    generate_data.generate_agent_data(n_rows, n_agents=opts["agents"], seed=opts["seed"])
+    return n_rows
+
+
+def stage_kalman(n_rows, opts):
+    from src.kalman_filter import apply_kalman_filter
+
+    df = _raw_tracks()
+    start = time.perf_counter()
+    apply_kalman_filter(df)
+    return len(df), time.perf_counter() - start
+
+
+def stage_features(n_rows, opts):
+    from src import config, storage
+    from src.preprocess_data import calculate_features
+
+    df = _raw_tracks()
+    start = time.perf_counter()
+    processed = calculate_features(df)
+    storage.write_table(processed, config.processed_data_path())
+    return len(df), time.perf_counter() - start
+
+
+def stage_train(n_rows, opts):
+    from src import train_model
+
+    train_model.train_elite_model(n_jobs=opts["n_jobs"])
+    return n_rows
+
+
+def stage_evaluate(n_rows, opts):
+    from src import evaluate_model
+
+    evaluate_model.evaluate_elite_system()
+    return n_rows
+
+
+def stage_shap(n_rows, opts):
+    from src.explainability import get_explainer, load_training_data
+
+    X, _, _ = load_training_data()
+    X = X.iloc[: opts["max_shap_rows"]]
+    start = time.perf_counter()
+    get_explainer().explain(X)
+    return len(X), time.perf_counter() - start
+
+
+def stage_scoring(n_rows, opts):
+    from src.scoring import TrackScorer
+
+    fixes = _raw_tracks().iloc[: opts["max_score_rows"]]
+    scorer = TrackScorer()
+    start = time.perf_counter()
+    scorer.score_batch(fixes)
+    return len(fixes), time.perf_counter() - start
+
+
+def with_prerequisites(stages):
+    """Requested stages plus everything they depend on, in pipeline order."""
+    needed = set()
+    pending = list(stages)
+    while pending:
+        stage = pending.pop()
+        if stage not in needed:
+            needed.add(stage)
+            pending.extend(REQUIRES.get(stage, []))
+    return [stage for stage in STAGES if stage in needed]
+
+
+def _run_stage(stage, n_rows, root, opts):
+    os.chdir(root)
+    start = time.perf_counter()
+    result = globals()[f"stage_{stage}"](n_rows, opts)
+    wall_s = time.perf_counter() - start
+    # Stages with untimed setup report their own timed section
+    rows, wall_s = result if isinstance(result, tuple) else (result, wall_s)
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "rows": rows,
+        "wall_s": wall_s,
+        "rows_per_s": rows / wall_s if wall_s > 0 else float("inf"),
+        "peak_rss_mb": peak_kb / 1024.0,
+    }
+
+
+def run_stage(stage, n_rows, root, opts):
+    env = {"PROJECT_ROOT": str(root), "MPLBACKEND": "Agg"}
+    os.environ.update(env)
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(_run_stage, stage, n_rows, str(root), opts).result()
+
+
+# --------------------------------------------------
+# History and regression checks
+# --------------------------------------------------
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_json(path, default):
+    path = Path(path)
+    if not path.exists():
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(data, path):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def find_regressions(results, baseline, threshold):
+    """Stages whose wall time grew by more than ``threshold`` over the baseline."""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base or base["wall_s"] <= 0:
+            continue
+        slowdown = current["wall_s"] / base["wall_s"] - 1.0
+        if slowdown > threshold:
+            regressions.append((key, slowdown))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmarks")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--agents", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--max-shap-rows", type=int, default=1_000)
+    parser.add_argument("--max-score-rows", type=int, default=100_000)
+    parser.add_argument("--history", default=str(BENCH_DIR / "history.json"))
+    parser.add_argument("--baseline", default=str(BENCH_DIR / "baseline.json"))
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown against the baseline, e.g. 0.25 = 25%%")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    opts = {
+        "agents": args.agents,
+        "seed": args.seed,
+        "n_jobs": args.n_jobs,
+        "max_shap_rows": args.max_shap_rows,
+        "max_score_rows": args.max_score_rows,
+    }
+
+    results = {}
+    print(f"{'stage':<10} {'rows':>12} {'wall s':>10} {'rows/s':>14} {'peak MB':>10}")
+    for n_rows in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            for sub in ("data/raw", "data/processed", "models", "visuals", "outputs"):
+                (root / sub).mkdir(parents=True)
+            for stage in with_prerequisites(args.stages):
+                metrics = run_stage(stage, n_rows, root, opts)
+                if stage not in args.stages:
+                    continue
+                results[f"{stage}@{n_rows}"] = metrics
+                print(f"{stage:<10} {metrics['rows']:>12,} {metrics['wall_s']:>10.3f} "
+                      f"{metrics['rows_per_s']:>14,.0f} {metrics['peak_rss_mb']:>10.1f}")
+
+    history = load_json(args.history, [])
+    history.append({
+        "time": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "options": opts,
+        "results": results,
+    })
+    save_json(history, args.history)
+
+    if args.update_baseline:
+        baseline = load_json(args.baseline, {})
+        baseline.update(results)
+        save_json(baseline, args.baseline)
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    regressions = find_regressions(results, load_json(args.baseline, {}), args.threshold)
+    for key, slowdown in regressions:
+        print(f"REGRESSION {key}: {slowdown:+.0%} wall time against baseline")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,25 @@
 
 __all__ = [
     "app",
+    "compiled_model",
     "evaluate_model",
     "generate_data",
+    "geofence",
+    "heatmap_tiles",
+    "incident_index",
+    "ingest",
+    "instrumentation",
+    "map_layers",
+    "model_artifact",
+    "model_registry",
     "preprocess_data",
+    "schema",
+    "scoring",
+    "stage_cache",
+    "storage",
+    "tracker",
     "train_model",
     "visualize_data",
+    "window_features",
     "config",
 ]
@@ -1,19 +1,32 @@
+import sys
+import time
 import streamlit as st
 import pandas as pd
 import numpy as np
-import folium
-import joblib
 from pathlib import Path
-from folium.plugins import HeatMap
 from streamlit_folium import st_folium
 
+# streamlit runs this file as a script, so make the src package importable
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src import config, map_layers
+from src.geofence import get_geofence
+from src.heatmap_tiles import TileStore, tiles_exist
+from src.incident_index import IncidentIndex, index_exists
+from src.ingest import IngestService
+from src.model_artifact import feature_importances
+from src.model_registry import ModelRegistry, list_versions
+from src.scoring import TrackScorer, load_model
+
 # =========================
 # 1. LOAD YOUR TRAINED ML BRAIN
 # =========================
 @st.cache_resource
 def get_model():
-    # Load the pipeline we just fixed and pushed to Git
-    return joblib.load("models/border_intruder_model.pkl")
+    # Published versions are served through the registry, which swaps in
+    # new ones without a restart; otherwise load the single saved model
+    if list_versions():
+        return ModelRegistry().start()
+    return load_model()
 
 pipeline = get_model()
 
@@ -58,9 +71,66 @@ def generate_tactical_data(n=50):
     probs = pipeline.predict_proba(data)[:, 1] 
     data["threat_score"] = probs
     data["is_intruder"] = pipeline.predict(data)
+
+    fence = get_geofence().query(data["lat"].to_numpy(), data["lon"].to_numpy())
+    data["dist_to_border_m"] = fence["dist_to_border_m"]
+    data["in_warning_zone"] = fence["in_warning_zone"]
     
     return data
 
+# =========================
+# 2.5 LIVE SENSOR FEED
+# =========================
+@st.cache_resource
+def get_heatmap_tiles():
+    # Every scored live fix is binned here, so the heatmap covers far more
+    # history than the ingest buffer holds; the ingest service trims and
+    # saves it, so history survives a restart
+    return TileStore.load() if tiles_exist() else TileStore()
+
+@st.cache_resource
+def get_ingest_service():
+    # One ingestion thread per server process, shared by every session.
+    # Fixes arrive as JSON lines on the socket or appended to the feed file.
+    feed_path = config.ingest_feed_path()
+    feed_path.parent.mkdir(parents=True, exist_ok=True)
+    service = IngestService(scorer=TrackScorer(model=pipeline), tiles=get_heatmap_tiles())
+    return service.start(port=config.INGEST_PORT, path=feed_path)
+
+def live_tracks():
+    """
+    Latest fix of every live track. Only rows new since the last poll are
+    processed, and tracks the scorer would evict as stale are dropped.
+    """
+    service = get_ingest_service()
+    rows, st.session_state.live_seq = service.buffer.since(st.session_state.get("live_seq", 0))
+    if rows.empty and "live_df" in st.session_state:
+        return st.session_state.live_df
+
+    fence = get_geofence().query(rows["lat_kalman"].to_numpy(), rows["lon_kalman"].to_numpy())
+    new = pd.DataFrame({
+        "track_id": rows["agent_id"],
+        "timestamp": rows["timestamp"],
+        "lat": rows["lat_kalman"],
+        "lon": rows["lon_kalman"],
+        "speed": rows["speed_m_s"],
+        "angle_change": np.degrees(rows["angle_change"]),
+        "sensor_confidence": rows["sensor_confidence"],
+        "object_type": rows["object_type"],
+        "terrain": rows["terrain"],
+        "visibility": rows["visibility"],
+        "threat_score": rows["threat_score"],
+        "is_intruder": (rows["threat_score"] >= 0.5).astype(int),
+        "dist_to_border_m": fence["dist_to_border_m"],
+        "in_warning_zone": fence["in_warning_zone"],
+    })
+    merged = pd.concat([st.session_state.get("live_df"), new])
+    merged = merged.drop_duplicates("track_id", keep="last")
+    # Sensor time, like the scorer's staleness window
+    cutoff = merged["timestamp"].max() - pd.Timedelta(service.scorer.stale_after_ns, unit="ns")
+    st.session_state.live_df = merged[merged["timestamp"] >= cutoff].reset_index(drop=True)
+    return st.session_state.live_df
+
 if 'df' not in st.session_state:
     st.session_state.df = generate_tactical_data()
 
@@ -70,14 +140,34 @@ if 'df' not in st.session_state:
 st.sidebar.header("Tactical Filters")
 min_threat = st.sidebar.slider("Threat Filter Threshold", 0.0, 1.0, 0.5)
 map_style = st.sidebar.selectbox(" Satellite View", ["Dark Tactical", "Satellite"])
+feed_mode = st.sidebar.radio("Sensor Feed", ["Simulated", "Live"])
+auto_refresh = feed_mode == "Live" and st.sidebar.checkbox("Auto Refresh", value=True)
+refresh_s = st.sidebar.slider("Refresh Interval (s)", 0.5, 10.0, 2.0) if auto_refresh else None
+heat_hours = (st.sidebar.slider("Heatmap History (h)", 1, config.HEATMAP_RETENTION_H,
+                                config.HEATMAP_HISTORY_H)
+              if feed_mode == "Live" else None)
 if st.sidebar.button("Refresh Sensor Feed"):
-    st.session_state.df = generate_tactical_data()
+    if feed_mode == "Simulated":
+        st.session_state.df = generate_tactical_data()
     st.rerun()
+if isinstance(pipeline, ModelRegistry):
+    registry = pipeline.stats()
+    st.sidebar.caption(f"Model {registry['live']} ({registry['rollout']} rollout)")
+    shadow = registry["shadow"]
+    if shadow and shadow["rows"]:
+        st.sidebar.caption(
+            f"Shadow {shadow['version']}: {shadow['agreement']:.1%} agreement over "
+            f"{shadow['rows']:,} rows, p95 {shadow['candidate_p95_ms']:.1f} ms "
+            f"vs {shadow['live_p95_ms']:.1f} ms live"
+        )
+        if st.sidebar.button(f"Promote {shadow['version']}"):
+            pipeline.promote()
+            st.rerun()
 # =========================
 # 4.5 APPLY FILTERS 
 # =========================
 # This creates the variable 'filtered_df' that the map needs!
-df = st.session_state.df
+df = live_tracks() if feed_mode == "Live" else st.session_state.df
 filtered_df = df[df['threat_score'] >= min_threat]
 # =========================
 # =========================
@@ -100,84 +190,45 @@ m4.metric("System Status", "ALERTS ACTIVE" if intruders_count > 0 else "SECURE")
 # =========================
 st.subheader("Live Border Surveillance Map")
 
-# A. Define the Border & Warning Zone Coordinates
-# These are simulated to cross through your sensor data range (23.8, 68.7)
-border_line = [
-    [23.75, 68.6], [23.80, 68.75], [23.85, 68.85], [23.90, 68.95]
-]
-# Offset the warning zone slightly to the left/bottom of the border
-warning_zone = [[p[0]-0.008, p[1]-0.008] for p in border_line]
-
-# B. Initialize Map
-tiles = "CartoDB dark_matter" if map_style == "Dark Tactical" else "Esri.WorldImagery"
-m = folium.Map(location=[23.8, 68.7], zoom_start=11, tiles=tiles)
-
-# C. Draw the Visual Barriers (The Geofences)
-# The Warning Zone (Yellow)
-folium.PolyLine(
-    locations=warning_zone,
-    color="#FFFF00",
-    weight=4,
-    opacity=0.3,
-    tooltip="Warning Zone: Entry Detected"
-).add_to(m)
-
-# The Main Border (Red)
-folium.PolyLine(
-    locations=border_line,
-    color="#FF4B4B",
-    weight=6,
-    opacity=0.9,
-    dash_array='10, 10',
-    tooltip="International Border (RESTRICTED)"
-).add_to(m)
-
-# D. Draw the Threat Heatmap
-if not filtered_df.empty:
-    # Only show heatmap for scores > 0.7 to keep it "clean"
-    heat_data = filtered_df[filtered_df['threat_score'] > 0.7][['lat', 'lon']].values.tolist()
-    if heat_data:
-        HeatMap(heat_data, radius=15, blur=18, min_opacity=0.4).add_to(m)
-
-# E. Plot Every Track (The Dots)
-for _, row in filtered_df.iterrows():
-    # Use Neon colors for high visibility on dark maps
-    color = "#FF0000" if row['is_intruder'] == 1 else "#00FF00"
-    
-    folium.CircleMarker(
-        location=[row.lat, row.lon],
-        radius=7,
-        color=color,
-        fill=True,
-        fill_opacity=0.8,
-        popup=f"""
-        <b>Track ID:</b> {row.track_id}<br>
-        <b>Type:</b> {row.object_type}<br>
-        <b>Threat Score:</b> {row.threat_score:.2f}<br>
-        <b>Status:</b> {'⚠️ INTRUDER' if row['is_intruder'] == 1 else '✅ NORMAL'}
-        """
-    ).add_to(m)
-
-# F. THE TACTICAL LEGEND (Floating HTML Overlay)
-legend_html = '''
-     <div style="position: fixed; 
-     bottom: 50px; left: 50px; width: 200px; height: 170px; 
-     background-color: rgba(14, 17, 23, 0.9); z-index:9999; font-size:14px;
-     color: white; border:1px solid #3e4451; border-radius:8px; padding: 12px;
-     font-family: sans-serif;">
-     <b style="color:#FF4B4B">Tactical Legend</b><br>
-     <hr style="margin: 5px 0; border-color: #3e4451;">
-     <span style="color:#FF4B4B"><b>--</b></span> Border Line<br>
-     <span style="color:#FFFF00"><b>--</b></span> Warning Zone<br>
-     <span style="color:#FF0000">●</span> Intruder (Confirmed)<br>
-     <span style="color:#00FF00">●</span> Normal Activity<br>
-     <span style="color:orange">🔥</span> Threat Density
-     </div>
-     '''
-m.get_root().html.add_child(folium.Element(legend_html))
-
-# G. Render in Streamlit
-st_folium(m, height=550, use_container_width=True)
+# A. Static base layers (tiles, border, warning zone, legend), built once per map style
+@st.cache_resource
+def get_base_map(style):
+    return map_layers.base_map(style)
+
+m = get_base_map(map_style)
+
+# B. Tracks and threat heatmap as one layer built from the filtered arrays.
+# Passing it as feature_group_to_add means a slider change only re-sends
+# this layer; the cached base map is left untouched on the client.
+# Live heat comes from the pre-aggregated tiles for the last view and
+# history window, so its cost follows the cells on screen, not the fixes.
+heat_cells = None
+if feed_mode == "Live":
+    view = st.session_state.get("map_view") or {}
+    bounds = view.get("bounds") or {}
+    south_west, north_east = bounds.get("_southWest"), bounds.get("_northEast")
+    bbox = None
+    if south_west and north_east and south_west.get("lat") is not None:
+        bbox = (south_west["lat"], south_west["lng"], north_east["lat"], north_east["lng"])
+    # The window ends at the newest fix the service has scored (sensor time,
+    # as retention uses); before the first one, show all retained history
+    latest = get_ingest_service().latest_t
+    start = latest - pd.Timedelta(hours=heat_hours) if latest is not None else None
+    heat_cells = get_heatmap_tiles().query(view.get("zoom") or 11, bbox=bbox, start=start)
+track_layer = map_layers.track_layer(filtered_df, heat_cells=heat_cells)
+
+# C. Render in Streamlit. Only the live heatmap needs the view back, so
+# elsewhere map interactions don't rerun the script.
+map_view = st_folium(
+    m,
+    feature_group_to_add=track_layer,
+    key="surveillance_map",
+    returned_objects=["zoom", "bounds"] if feed_mode == "Live" else [],
+    height=550,
+    use_container_width=True,
+)
+if feed_mode == "Live":
+    st.session_state.map_view = map_view
 
 # ==========================================
 # 6. FEATURE IMPORTANCE (Explainable AI)
@@ -187,18 +238,44 @@ col_left, col_right = st.columns([1, 1])
 
 with col_left:
     st.subheader(" Why is this a Threat?")
-    # Use the pipeline to show what features matter most
-    rf_model = pipeline.named_steps['classifier']
-    imp_df = pd.DataFrame({
-        "Feature": ["Speed", "Angle", "Confidence"],
-        "Importance": rf_model.feature_importances_[:3] 
-    }).sort_values("Importance", ascending=False)
-    st.bar_chart(imp_df.set_index("Feature"))
+    # Importance of every model input, one-hot columns summed per feature
+    importances = feature_importances(pipeline)
+    if importances:
+        imp_df = pd.DataFrame({
+            "Feature": [name.replace("_", " ").title() for name in importances],
+            "Importance": list(importances.values()),
+        }).sort_values("Importance", ascending=False)
+        st.bar_chart(imp_df.set_index("Feature"))
+    else:
+        st.info("Feature importances are recorded when the model is retrained.")
+
+@st.cache_resource
+def get_incident_index():
+    # Saved next to the model by training; None until it has been built
+    return IncidentIndex.load() if index_exists() else None
 
 with col_right:
     st.subheader("Top Priority Threats")
     # Show the actual data table for the intruders
-    st.dataframe(
-        filtered_df[filtered_df['is_intruder'] == 1].sort_values("threat_score", ascending=False),
-        use_container_width=True
-    )
\ No newline at end of file
+    priority = filtered_df[filtered_df['is_intruder'] == 1].sort_values("threat_score", ascending=False)
+    st.dataframe(priority, use_container_width=True)
+
+    incident_index = get_incident_index()
+    if incident_index is not None and not priority.empty:
+        alert_id = st.selectbox("Similar past incidents of track", priority["track_id"].tolist())
+        similar = incident_index.query(priority[priority["track_id"] == alert_id].head(1),
+                                       k=config.INCIDENT_TOP_K)
+        st.dataframe(
+            similar[["rank", "distance", "track_id", "source", "label", "object_type", "terrain",
+                     "visibility", "speed_mean", "dist_to_border_min", "first_seen", "last_seen"]],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+# ==========================================
+# 7. LIVE REFRESH
+# ==========================================
+# Reruns at a steady interval; each rerun only pulls fixes scored since the last one
+if auto_refresh:
+    time.sleep(refresh_s)
+    st.rerun()
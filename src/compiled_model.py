@@ -0,0 +1,219 @@
+"""
+Compiled inference for the trained RandomForest pipeline.
+
+``compile_pipeline`` flattens the fitted ColumnTransformer and every tree
+of the forest into plain NumPy arrays. ``CompiledForest.predict_proba``
+then scores rows by walking all trees at once, one tree level per step,
+without going through sklearn's estimator dispatch. Results match
+``pipeline.predict_proba``.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import config
+
+# Rows scored per tree walk; larger batches are split into chunks of this size
+WALK_CHUNK_ROWS = 256
+
+
+class CompiledForest:
+    """
+    Flat-array form of a StandardScaler + OneHotEncoder + RandomForest
+    pipeline.
+
+    Nodes of all trees share one set of arrays. Leaves point to themselves,
+    so walking ``depth`` steps from each root always ends on a leaf.
+    """
+
+    def __init__(self, numeric_features, mean, scale, categorical_features, categories,
+                 feature, threshold, left, right, value, roots, depth, classes, children=None):
+        self.numeric_features = list(numeric_features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.categorical_features = list(categorical_features)
+        self.categories = [list(c) for c in categories]
+        self.feature = np.asanyarray(feature)
+        self.threshold = np.asanyarray(threshold)
+        self.value = np.asanyarray(value)
+        self.roots = np.asanyarray(roots)
+        self.depth = int(depth)
+        self.classes_ = np.asarray(classes)
+
+        # Walk tables: child of node i is _children[2 * i + went_left].
+        # Arrays that already have the walk dtypes (e.g. memory-mapped
+        # artifacts) are used in place rather than copied.
+        self._feature = np.asanyarray(self.feature, dtype=np.intp)
+        if children is None:
+            children = np.column_stack([right, left]).ravel()
+        self._children = np.asanyarray(children, dtype=np.intp)
+        self.left = self._children[1::2] if left is None else np.asarray(left)
+        self.right = self._children[0::2] if right is None else np.asarray(right)
+        self._roots = np.asanyarray(self.roots, dtype=np.intp)
+
+        # Category value -> column of the one-hot block, per categorical feature
+        offset = len(self.numeric_features)
+        self.lookup = []
+        for cats in self.categories:
+            self.lookup.append({c: offset + i for i, c in enumerate(cats)})
+            offset += len(cats)
+        self.n_columns = offset
+
+    @property
+    def feature_names_in_(self):
+        return np.array(self.numeric_features + self.categorical_features, dtype=object)
+
+    def transform(self, X):
+        """Model matrix (float32, as the trees see it) for a DataFrame or list of records."""
+        if isinstance(X, pd.DataFrame):
+            n = len(X)
+            numeric = np.column_stack(
+                [X[name].to_numpy(dtype=np.float64) for name in self.numeric_features]
+            ).reshape(n, len(self.numeric_features))
+            categorical = [X[name].tolist() for name in self.categorical_features]
+        else:
+            X = list(X)
+            n = len(X)
+            numeric = np.array([[row[name] for name in self.numeric_features] for row in X],
+                               dtype=np.float64).reshape(n, len(self.numeric_features))
+            categorical = [[row[name] for row in X] for name in self.categorical_features]
+
+        out = np.zeros((n, self.n_columns), dtype=np.float32)
+        out[:, :len(self.numeric_features)] = (numeric - self.mean) / self.scale
+
+        rows = np.arange(n)
+        for values, lookup in zip(categorical, self.lookup):
+            cols = np.fromiter((lookup.get(v, -1) for v in values), dtype=np.int64, count=n)
+            known = cols >= 0
+            out[rows[known], cols[known]] = 1.0
+        return out
+
+    def predict_proba(self, X):
+        Xt = self.transform(X)
+        if len(Xt) <= WALK_CHUNK_ROWS:
+            return self._proba(Xt)
+        # Small chunks keep the walk's working set in cache
+        return np.concatenate(
+            [self._proba(Xt[i:i + WALK_CHUNK_ROWS]) for i in range(0, len(Xt), WALK_CHUNK_ROWS)]
+        )
+
+    def _proba(self, Xt):
+        n, n_trees = len(Xt), len(self._roots)
+
+        # Walk every (tree, row) pair down one level per step. Xt is
+        # addressed flat, so each step is a handful of 1-D gathers.
+        flat = Xt.ravel()
+        base = np.tile(np.arange(n, dtype=np.intp) * self.n_columns, n_trees)
+        node = np.repeat(self._roots, n)
+        for _ in range(self.depth):
+            col = np.take(self._feature, node)
+            col += base
+            went_left = np.take(flat, col) <= np.take(self.threshold, node)
+            node *= 2
+            node += went_left
+            node = np.take(self._children, node)
+
+        # Sum tree by tree in forest order, as sklearn accumulates them
+        leaf_values = np.take(self.value, node, axis=0).reshape(n_trees, n, -1)
+        return np.add.reduce(leaf_values, axis=0) / n_trees
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "numeric_features": self.numeric_features,
+            "categorical_features": self.categorical_features,
+            "categories": self.categories,
+            "depth": self.depth,
+            "classes": self.classes_.tolist(),
+        }
+        np.savez(
+            path,
+            meta=np.array(json.dumps(meta)),
+            mean=self.mean,
+            scale=self.scale,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            value=self.value,
+            roots=self.roots,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(
+                meta["numeric_features"], data["mean"], data["scale"],
+                meta["categorical_features"], meta["categories"],
+                data["feature"], data["threshold"], data["left"], data["right"],
+                data["value"], data["roots"], meta["depth"], meta["classes"],
+            )
+
+
+def compile_pipeline(pipeline):
+    """Flattens a fitted preprocessor + RandomForest pipeline into a CompiledForest."""
+    preprocessor = pipeline.named_steps["preprocessor"]
+    forest = pipeline.named_steps["classifier"]
+
+    transformers = {name: (est, cols) for name, est, cols in preprocessor.transformers_}
+    scaler, numeric_features = transformers["num"]
+    encoder, categorical_features = transformers["cat"]
+
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    depth = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left < 0
+
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, 0.0, tree.threshold))
+        left.append(np.where(is_leaf, ids, tree.children_left) + offset)
+        right.append(np.where(is_leaf, ids, tree.children_right) + offset)
+
+        # Leaf class fractions, normalised the way DecisionTreeClassifier does
+        v = tree.value[:, 0, :].astype(np.float64)
+        normalizer = v.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+        value.append(v / normalizer[:, None])
+
+        roots.append(offset)
+        offset += tree.node_count
+        depth = max(depth, tree.max_depth)
+
+    return CompiledForest(
+        numeric_features, scaler.mean_, scaler.scale_,
+        categorical_features, [c.tolist() for c in encoder.categories_],
+        np.concatenate(feature).astype(np.int32),
+        np.concatenate(threshold),
+        np.concatenate(left).astype(np.int32),
+        np.concatenate(right).astype(np.int32),
+        np.concatenate(value),
+        np.array(roots, dtype=np.int32),
+        depth,
+        forest.classes_,
+    )
+
+
+def export_pipeline(pipeline, path=None):
+    """Compiles a fitted pipeline and saves it next to the pickled model."""
+    path = Path(path) if path is not None else Path(config.compiled_model_path())
+    compiled = compile_pipeline(pipeline)
+    compiled.save(path)
+    return compiled
+
+
+def load_compiled_model(path=None):
+    path = Path(path) if path is not None else Path(config.compiled_model_path())
+    if not path.exists():
+        raise FileNotFoundError(f"Compiled model not found at {path}")
+    return CompiledForest.load(path)
@@ -4,17 +4,127 @@ import os
 
 PROJECT_ROOT = Path(os.environ.get("PROJECT_ROOT", Path(__file__).resolve().parents[1]))
 
+# Number of hash buckets agents are spread over in Parquet datasets
+PARQUET_AGENT_BUCKETS = 16
+
+# Geofences as [lat, lon] vertices, shared by preprocessing and the dashboard
+BORDER_LINES = [
+    [[23.75, 68.60], [23.80, 68.75], [23.85, 68.85], [23.90, 68.95]],
+]
+# Band along the home side of the border
+WARNING_ZONES = [
+    [[23.75, 68.60], [23.80, 68.75], [23.85, 68.85], [23.90, 68.95],
+     [23.892, 68.942], [23.842, 68.842], [23.792, 68.742], [23.742, 68.592]],
+]
+# Cell size of the geofence grid index, and how far around the border it reaches
+GEOFENCE_CELL_M = 1_000.0
+GEOFENCE_MARGIN_M = 50_000.0
+
+# Rolling trajectory-window lengths, and the border distance counted as dwelling near it
+FEATURE_WINDOWS_S = (10, 60, 300)
+BORDER_DWELL_M = 500.0
+
+# Kalman filter: step by each fix's real time gap and weigh fixes by their
+# sensor_confidence, and run the backward RTS smoother in batch preprocessing
+KALMAN_ADAPTIVE = os.environ.get("BORDER_KALMAN_ADAPTIVE", "").lower() in ("1", "true", "yes", "on")
+KALMAN_RTS = os.environ.get("BORDER_KALMAN_RTS", "").lower() in ("1", "true", "yes", "on")
+
+# Multi-target tracking of detections without an agent_id: gate radius and
+# Mahalanobis gate, noise standard deviations in metres (acceleration in m/s^2),
+# seconds a track may coast without a detection
+TRACK_GATE_M = 100.0
+TRACK_GATE_CHI2 = 9.21
+TRACK_MEASUREMENT_NOISE_M = 15.0
+TRACK_ACCELERATION_NOISE_M_S2 = 3.0
+TRACK_INITIAL_SPEED_M_S = 10.0
+TRACK_MAX_COAST_S = 2.0
+
+# Live sensor feed: JSON-lines fixes over a local socket or an appended file
+INGEST_HOST = "127.0.0.1"
+INGEST_PORT = 8765
+INGEST_BATCH_ROWS = 1_000
+INGEST_MAX_DELAY_S = 0.1
+INGEST_BUFFER_ROWS = 100_000
+# Fixes waiting to be scored; lines arriving while it is full are rejected
+INGEST_QUEUE_ROWS = 100_000
+
+# Similar-incident index: buffered inserts before the KD-tree is rebuilt,
+# and how many neighbours the dashboard shows per alert
+INCIDENT_INDEX_REBUILD_ROWS = 10_000
+INCIDENT_TOP_K = 5
+
+# Heatmap tiles: hourly buckets of quadtree cells from level 4 (~2,500 km)
+# down to level 18 (~150 m); a map zoom reads the level CELL_BITS finer
+# than its 256 px tiles, fixes above HOT_SCORE feed the heat, and the
+# dashboard shows the last HISTORY_H hours by default
+HEATMAP_BUCKET_S = 3600
+HEATMAP_MIN_LEVEL = 4
+HEATMAP_MAX_LEVEL = 18
+HEATMAP_CELL_BITS = 3
+HEATMAP_HOT_SCORE = 0.7
+HEATMAP_MERGE_ROWS = 50_000
+HEATMAP_HISTORY_H = 24
+# The ingest service keeps this much history and saves the tiles this often
+HEATMAP_RETENTION_H = 168
+HEATMAP_SAVE_S = 300
+
+# Model registry: "auto" serves new versions at once, "shadow" scores them
+# beside the live model until promoted
+REGISTRY_ROLLOUT = os.environ.get("BORDER_REGISTRY_ROLLOUT", "auto")
+REGISTRY_POLL_S = 5.0
+# Versions kept by publish(); the pinned version is always kept as well
+REGISTRY_KEEP_VERSIONS = 5
+
+
+def preprocess_workers():
+    """Processes used by parallel preprocessing (all cores by default)."""
+    return int(os.environ.get("BORDER_PREPROCESS_WORKERS", os.cpu_count() or 1))
+
+
+def instrumentation_enabled():
+    """Stage timers, counters and memory sampling; off unless BORDER_INSTRUMENT=1."""
+    return os.environ.get("BORDER_INSTRUMENT", "").lower() in ("1", "true", "yes", "on")
+
+
+def metrics_format():
+    """Export format of the instrumentation: "prometheus" or "jsonl"."""
+    return os.environ.get("BORDER_METRICS_FORMAT", "prometheus")
+
+
+def profile_stage():
+    """Stage to capture a profile of, and the profiler: "cprofile" or "pyinstrument"."""
+    return (os.environ.get("BORDER_PROFILE_STAGE") or None,
+            os.environ.get("BORDER_PROFILER", "cprofile"))
+
+
+def stage_cache_max_bytes():
+    """Size bound of the pipeline stage cache (BORDER_STAGE_CACHE_MB, default 2 GB)."""
+    return int(float(os.environ.get("BORDER_STAGE_CACHE_MB", 2048)) * 2 ** 20)
+
+
+def storage_format():
+    """Format of the default data files: "csv" or "parquet"."""
+    return os.environ.get("BORDER_STORAGE_FORMAT", "csv")
+
+
+def _data_file(stem):
+    return f"{stem}.{storage_format()}"
+
 
 def data_dir():
     return PROJECT_ROOT / "data"
 
 
-def raw_data_path(filename="border_data.csv"):
-    return data_dir() / "raw" / filename
+def raw_data_path(filename=None):
+    return data_dir() / "raw" / (filename or _data_file("border_data"))
 
 
-def processed_data_path(filename="featured_border_data.csv"):
-    return data_dir() / "processed" / filename
+def processed_data_path(filename=None):
+    return data_dir() / "processed" / (filename or _data_file("featured_border_data"))
+
+
+def ingest_feed_path(filename="live_feed.jsonl"):
+    return data_dir() / "live" / filename
 
 
 def models_dir():
@@ -25,5 +135,55 @@ def model_path(filename="border_intruder_model.pkl"):
     return models_dir() / filename
 
 
+def compiled_model_path(filename="border_intruder_model.npz"):
+    return models_dir() / filename
+
+
+def model_artifact_dir(name="border_intruder_model"):
+    return models_dir() / name
+
+
+def model_registry_dir():
+    return models_dir() / "registry"
+
+
+def incident_index_dir():
+    return models_dir() / "incident_index"
+
+
+def heatmap_tiles_dir():
+    return data_dir() / "tiles"
+
+
+def model_metadata_path(filename="border_intruder_model.json"):
+    return models_dir() / filename
+
+
 def visuals_dir():
     return PROJECT_ROOT / "visuals"
+
+
+def outputs_dir():
+    return PROJECT_ROOT / "outputs"
+
+
+def metrics_path(filename=None):
+    if filename is None:
+        filename = "metrics.jsonl" if metrics_format() == "jsonl" else "metrics.prom"
+    return Path(os.environ.get("BORDER_METRICS_PATH", outputs_dir() / filename))
+
+
+def profiles_dir():
+    return outputs_dir() / "profiles"
+
+
+def training_report_path(filename="training_report.json"):
+    return outputs_dir() / filename
+
+
+def cache_dir():
+    return Path(os.environ.get("BORDER_CACHE_DIR", PROJECT_ROOT / ".cache"))
+
+
+def stage_cache_dir():
+    return cache_dir() / "stages"
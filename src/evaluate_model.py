@@ -1,32 +1,52 @@
+import json
 import os
 from pathlib import Path
 
 import joblib
 import matplotlib.pyplot as plt
-import pandas as pd
+import numpy as np
 import seaborn as sns
 from sklearn.metrics import confusion_matrix
 from sklearn.model_selection import cross_val_score
 
-from src import config
+from src import config, storage
+from src.model_artifact import artifact_exists, load_artifact
+
+
+def training_cv_scores():
+    """CV scores recorded by the last training run, if it wrote a report."""
+    report_path = Path(config.training_report_path())
+    if not report_path.exists():
+        return None
+    with open(report_path) as f:
+        scores = json.load(f).get("cv_scores")
+    return np.array(scores) if scores else None
 
 
 def evaluate_elite_system():
     # 1. Load Model and Data
-    model_path = Path(config.model_path())
-    pipeline = joblib.load(model_path)
+    # The artifact predicts like the pipeline without unpickling sklearn
+    if artifact_exists():
+        pipeline = load_artifact()
+    else:
+        pipeline = joblib.load(Path(config.model_path()))
     raw_path = Path(config.raw_data_path())
     if not raw_path.exists():
         raise FileNotFoundError(f"Raw data not found: {raw_path}")
-    df = pd.read_csv(raw_path)
+    features = list(pipeline.feature_names_in_)
+    df = storage.read_table(raw_path, columns=features + ["label"])
 
-    X = df.drop(columns=["label", "timestamp"])
+    X = df.drop(columns=["label"])
     y = df["label"]
 
     print("--- 🛡️ Military Grade Validation ---")
 
     # 2. K-Fold Cross Validation (The Stress Test)
-    scores = cross_val_score(pipeline, X, y, cv=5)
+    # Training already cross-validated this configuration; reuse its folds
+    scores = training_cv_scores()
+    if scores is None:
+        estimator = joblib.load(Path(config.model_path()))
+        scores = cross_val_score(estimator, X, y, cv=5, n_jobs=-1)
     print("Cross-Validation Scores: {}".format(scores))
     mean = scores.mean()
     err = scores.std() * 2
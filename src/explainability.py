@@ -2,8 +2,14 @@
 SHAP-based model explainability module.
 
 Provides tools for generating SHAP explanations for model predictions.
+``ShapExplainer`` loads the model, the transformed background set and the
+TreeExplainer once and then explains batches of rows on demand. Batches use
+the trees' own cover statistics (path-dependent SHAP); only the force plot
+of a single prediction is explained against a background sample.
 """
 
+import json
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
@@ -12,10 +18,9 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import shap
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
 
-from src import config
+from src import config, instrumentation, storage
+from src.model_artifact import artifact_exists, read_input_features
 
 
 def load_model_and_preprocessor():
@@ -32,15 +37,140 @@ def load_training_data():
     raw_path = Path(config.raw_data_path())
     if not raw_path.exists():
         raise FileNotFoundError(f"Raw data not found: {raw_path}")
-    df = pd.read_csv(raw_path)
-    
-    numeric_features = ["speed", "angle_change", "sensor_confidence"]
-    categorical_features = ["object_type", "terrain", "visibility"]
-    
-    X = df[numeric_features + categorical_features]
+    if artifact_exists():
+        numeric_features, categorical_features = read_input_features()
+    else:
+        numeric_features = ["speed", "angle_change", "sensor_confidence"]
+        categorical_features = ["object_type", "terrain", "visibility"]
+
+    X = storage.read_table(raw_path, columns=numeric_features + categorical_features)
     return X, numeric_features, categorical_features
 
 
+class ShapExplainer:
+    """
+    Long-lived SHAP explainer for the trained pipeline.
+
+    Args:
+        pipeline: fitted pipeline; loaded from ``config.model_path()`` if None
+        background: untransformed rows for the background set; the training
+            data is used if None
+        background_size: rows of background kept. 0 (the default) uses the
+            trees' own cover statistics (path-dependent SHAP), which is
+            faster and needs no background at all.
+    """
+
+    def __init__(self, pipeline=None, background=None, background_size=0):
+        self.pipeline = pipeline if pipeline is not None else load_model_and_preprocessor()
+        self.preprocessor = self.pipeline.named_steps["preprocessor"]
+        self.classifier = self.pipeline.named_steps["classifier"]
+        self.feature_names = list(self.preprocessor.get_feature_names_out())
+
+        with instrumentation.timer("shap_explainer"):
+            if background_size:
+                if background is None:
+                    background, _, _ = load_training_data()
+                self.background = self.preprocessor.transform(background.iloc[:background_size])
+                self.explainer = shap.TreeExplainer(self.classifier, self.background)
+            else:
+                self.background = None
+                self.explainer = shap.TreeExplainer(self.classifier)
+
+        expected = np.atleast_1d(self.explainer.expected_value)
+        self.expected_value = float(expected[-1])
+
+    def transform(self, X: pd.DataFrame) -> np.ndarray:
+        return self.preprocessor.transform(X)
+
+    def shap_values(self, X: pd.DataFrame, transformed: bool = False,
+                    batch_size: int = 1000) -> np.ndarray:
+        """
+        SHAP values of the intrusion class, shape (n_rows, n_model_features).
+        Pass ``transformed=True`` if ``X`` is already a model matrix.
+        """
+        Xt = X if transformed else self.transform(X)
+        with instrumentation.timer("shap_values", rows=Xt.shape[0]):
+            parts = [
+                _positive_class(self.explainer.shap_values(Xt[i:i + batch_size]))
+                for i in range(0, Xt.shape[0], batch_size)
+            ]
+        if not parts:
+            return np.zeros((0, len(self.feature_names)))
+        return np.vstack(parts)
+
+    def explain(self, X: pd.DataFrame) -> dict:
+        """Threat scores and SHAP vectors for a batch of rows, as arrays."""
+        Xt = self.transform(X)
+        return {
+            "feature_names": self.feature_names,
+            "expected_value": self.expected_value,
+            "threat_score": self.classifier.predict_proba(Xt)[:, 1],
+            "shap_values": self.shap_values(Xt, transformed=True),
+        }
+
+    def explain_json(self, X: pd.DataFrame, top_k: Optional[int] = None) -> str:
+        """
+        One JSON record per row with its threat score and SHAP value per
+        feature, optionally only the ``top_k`` largest contributions.
+        """
+        result = self.explain(X)
+        records = []
+        for score, values in zip(result["threat_score"], result["shap_values"]):
+            order = np.argsort(-np.abs(values))
+            if top_k is not None:
+                order = order[:top_k]
+            records.append({
+                "threat_score": float(score),
+                "expected_value": result["expected_value"],
+                "contributions": {result["feature_names"][i]: float(values[i]) for i in order},
+            })
+        return json.dumps(records)
+
+
+# Background rows for the single-prediction force plot
+FORCE_PLOT_BACKGROUND_SIZE = 50
+
+# background_size -> (model stamp, explainer)
+_explainers = {}
+
+
+def _model_stamp():
+    """(path, size, mtime_ns) of the saved model, or None if there is none."""
+    path = Path(config.model_path())
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+
+
+def get_explainer(background_size: int = 0) -> ShapExplainer:
+    """
+    Shared explainer for this process; built on first use and rebuilt when
+    the saved model changes.
+    """
+    stamp = _model_stamp()
+    cached = _explainers.get(background_size)
+    if cached is None or cached[0] != stamp:
+        cached = _explainers[background_size] = (stamp, ShapExplainer(background_size=background_size))
+    return cached[1]
+
+
+@lru_cache(maxsize=1)
+def _reference_sample(sample_size: int = 100, model_stamp=None) -> np.ndarray:
+    """Transformed training rows used for the global plots."""
+    X, _, _ = load_training_data()
+    return get_explainer().transform(X.iloc[:sample_size])
+
+
+def _positive_class(shap_values):
+    # Older shap returns one array per class, newer a trailing class axis
+    if isinstance(shap_values, list):
+        return shap_values[1]
+    if shap_values.ndim == 3:
+        return shap_values[:, :, 1]
+    return shap_values
+
+
 def generate_shap_summary_plot(output_path: Optional[str] = None):
     """
     Generate SHAP summary plot (bar chart) showing global feature importance.
@@ -48,30 +178,18 @@ def generate_shap_summary_plot(output_path: Optional[str] = None):
     Args:
         output_path: Optional path to save the plot. If None, uses visuals/shap_summary.png
     """
-    pipeline = load_model_and_preprocessor()
-    X, numeric_features, categorical_features = load_training_data()
-    
-    # Transform data using the pipeline's preprocessor
-    X_transformed = pipeline.named_steps['preprocessor'].transform(X)
-    
+    explainer = get_explainer()
+
     # Use a sample for performance (SHAP can be slow on large datasets)
-    sample_size = min(100, len(X_transformed))
-    X_sample = X_transformed[:sample_size]
-    
-    # Create TreeExplainer for RandomForest
-    explainer = shap.TreeExplainer(pipeline.named_steps['classifier'])
-    shap_values = explainer.shap_values(X_sample)
-    
-    # For binary classification, use the positive class SHAP values
-    if isinstance(shap_values, list):
-        shap_values = shap_values[1]
+    X_sample = _reference_sample(100, _model_stamp())
+    shap_values = explainer.shap_values(X_sample, transformed=True)
     
     # Generate summary plot
     plt.figure(figsize=(10, 6))
     shap.summary_plot(
         shap_values,
         X_sample,
-        feature_names=(numeric_features + categorical_features),
+        feature_names=explainer.feature_names,
         plot_type="bar",
         show=False
     )
@@ -96,22 +214,11 @@ def generate_shap_dependence_plots(output_dir: Optional[str] = None):
     Args:
         output_dir: Optional directory to save plots. If None, uses visuals/
     """
-    pipeline = load_model_and_preprocessor()
-    X, numeric_features, categorical_features = load_training_data()
-    
-    # Transform data
-    X_transformed = pipeline.named_steps['preprocessor'].transform(X)
-    
+    explainer = get_explainer()
+
     # Use a sample
-    sample_size = min(100, len(X_transformed))
-    X_sample = X_transformed[:sample_size]
-    
-    # Create TreeExplainer
-    explainer = shap.TreeExplainer(pipeline.named_steps['classifier'])
-    shap_values = explainer.shap_values(X_sample)
-    
-    if isinstance(shap_values, list):
-        shap_values = shap_values[1]
+    X_sample = _reference_sample(100, _model_stamp())
+    shap_values = explainer.shap_values(X_sample, transformed=True)
     
     if output_dir is None:
         output_dir = config.visuals_dir()
@@ -120,7 +227,7 @@ def generate_shap_dependence_plots(output_dir: Optional[str] = None):
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Generate plots for top 3 features
-    all_feature_names = numeric_features + categorical_features
+    all_feature_names = explainer.feature_names
     feature_importance = np.abs(shap_values).mean(axis=0)
     top_features_idx = np.argsort(feature_importance)[-3:][::-1]
     
@@ -144,6 +251,8 @@ def generate_shap_dependence_plots(output_dir: Optional[str] = None):
 def explain_single_prediction(X_sample: pd.DataFrame) -> str:
     """
     Generate SHAP force plot for a single prediction (or small batch).
+    For many rows, use ``get_explainer().explain`` instead of one HTML file each.
+    Unlike that batch path, the values are against a background sample.
     
     Args:
         X_sample: DataFrame with 1 or few rows to explain
@@ -151,24 +260,10 @@ def explain_single_prediction(X_sample: pd.DataFrame) -> str:
     Returns:
         Path to saved HTML force plot
     """
-    pipeline = load_model_and_preprocessor()
-    X_all, numeric_features, categorical_features = load_training_data()
-    
-    # Transform sample
-    X_sample_transformed = pipeline.named_steps['preprocessor'].transform(X_sample)
-    X_all_transformed = pipeline.named_steps['preprocessor'].transform(X_all)
-    
-    # Create explainer with background data
-    background_sample = X_all_transformed[:min(50, len(X_all_transformed))]
-    explainer = shap.TreeExplainer(
-        pipeline.named_steps['classifier'],
-        background_sample
-    )
-    
-    shap_values = explainer.shap_values(X_sample_transformed)
-    
-    if isinstance(shap_values, list):
-        shap_values = shap_values[1]
+    explainer = get_explainer(FORCE_PLOT_BACKGROUND_SIZE)
+
+    X_sample_transformed = explainer.transform(X_sample)
+    shap_values = explainer.shap_values(X_sample_transformed, transformed=True)
     
     # Generate force plot (HTML)
     output_dir = Path(config.visuals_dir())
@@ -176,13 +271,14 @@ def explain_single_prediction(X_sample: pd.DataFrame) -> str:
     output_path = output_dir / "shap_force_plot.html"
     
     # Create force plot for first sample
-    shap.force_plot(
-        explainer.expected_value[1] if isinstance(explainer.expected_value, np.ndarray) else explainer.expected_value,
+    force_plot = shap.force_plot(
+        explainer.expected_value,
         shap_values[0],
         X_sample_transformed[0],
-        feature_names=(numeric_features + categorical_features),
+        feature_names=explainer.feature_names,
         matplotlib=False
-    ).save_html(str(output_path))
+    )
+    shap.save_html(str(output_path), force_plot)
     
     print(f"SHAP force plot saved to {output_path}")
     return str(output_path)
@@ -193,3 +289,4 @@ if __name__ == "__main__":
     generate_shap_summary_plot()
     generate_shap_dependence_plots()
     print("Done! Check visuals/ for plots.")
+    instrumentation.export()
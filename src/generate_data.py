@@ -1,10 +1,13 @@
+import argparse
 import random
 from datetime import datetime, timedelta
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 import config
+from src import storage
 
 
 def generate_scientific_data(n_points=1200):
@@ -74,12 +77,185 @@ def generate_scientific_data(n_points=1200):
 
     df = pd.DataFrame(data)
 
-    out = Path(config.raw_data_path())
-    out.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(out, index=False)
+    storage.write_table(df, config.raw_data_path())
 
     print("Dataset with HARD NEGATIVE SAMPLES generated")
 
 
+# --------------------------------------------------
+# Multi-agent simulation for load testing
+# --------------------------------------------------
+BASE_LAT, BASE_LON = 23.8, 69.5
+OBJECT_TYPES = ["Human", "Animal", "Vehicle", "Drone"]
+TERRAINS = ["Salt Flat", "Marshy", "Sandy"]
+VISIBILITIES = ["Clear", "Foggy", "Night"]
+
+# Same hard negative mix as generate_scientific_data:
+# (label, hard case) -> (speed range in m/s, turn range in degrees)
+BEHAVIOURS = {
+    (0, False): ((2.5, 4.5), (0.0, 20.0)),    # normal patrol
+    (0, True): ((6.0, 9.0), (50.0, 120.0)),   # patrol that looks like an intruder
+    (1, False): ((4.5, 8.5), (40.0, 130.0)),  # normal intruder
+    (1, True): ((1.0, 3.0), (0.0, 15.0)),     # stealth intruder
+}
+HARD_CASE_RATE = 0.3
+
+METRES_PER_DEGREE = 111_320.0
+# Position noise in metres of a fix with sensor_confidence 0
+SENSOR_NOISE_M = 50.0
+NIGHT_HOURS = (19, 6)
+
+
+def _agent_profiles(n_agents, rng):
+    """Fixed per-agent label, behaviour, object type, terrain and weather."""
+    label = (np.arange(n_agents) >= n_agents // 2).astype(np.int64)
+    hard = rng.random(n_agents) < HARD_CASE_RATE
+
+    speed_range = np.empty((n_agents, 2))
+    turn_range = np.empty((n_agents, 2))
+    for (lab, is_hard), (speeds, turns) in BEHAVIOURS.items():
+        mask = (label == lab) & (hard == is_hard)
+        speed_range[mask] = speeds
+        turn_range[mask] = turns
+
+    return {
+        "label": label,
+        "speed_range": speed_range,
+        "turn_range": turn_range,
+        "object_type": rng.integers(len(OBJECT_TYPES), size=n_agents),
+        "terrain": rng.integers(len(TERRAINS), size=n_agents),
+        "foggy": rng.random(n_agents) < 0.5,
+    }
+
+
+def simulate_agents(n_fixes, n_agents=1000, seed=None, interval_s=1.0,
+                    shard_rows=1_000_000, start="2025-01-01"):
+    """
+    Simulates many agents moving continuously and yields their fixes as
+    DataFrame shards.
+
+    Every agent reports one fix per ``interval_s`` seconds, so rows are in
+    timestamp order and each shard carries on from the previous one. An
+    agent keeps its label and behaviour for the whole run; speed and turn
+    of every step are drawn from the behaviour's range, with the same hard
+    negative mix as ``generate_scientific_data``. Measured positions are
+    the true positions (true_latitude, true_longitude) plus noise that
+    shrinks with sensor_confidence.
+
+    Args:
+        n_fixes: total number of rows
+        n_agents: agents reporting at every step
+        seed: seed of the random generator; the same seed, sizes and
+            shard_rows give the same data
+        interval_s: seconds between two fixes of an agent
+        shard_rows: approximate rows per yielded shard
+        start: timestamp of the first step
+    """
+    rng = np.random.default_rng(seed)
+    profile = _agent_profiles(n_agents, rng)
+    width = max(3, len(str(n_agents - 1)))
+    agent_ids = [f"ID_{i:0{width}d}" for i in range(n_agents)]
+
+    # Per-agent state carried between shards
+    lat = BASE_LAT + rng.uniform(-0.05, 0.05, n_agents)
+    lon = BASE_LON + rng.uniform(-0.05, 0.05, n_agents)
+    heading = rng.uniform(0.0, 2 * np.pi, n_agents)
+
+    start_ns = pd.Timestamp(start).value
+    interval_ns = int(interval_s * 1e9)
+    steps_per_shard = max(1, shard_rows // n_agents)
+    n_steps = -(-n_fixes // n_agents)
+
+    speed_lo, speed_hi = profile["speed_range"].T
+    turn_lo, turn_hi = profile["turn_range"].T
+
+    for step0 in range(0, n_steps, steps_per_shard):
+        k = min(steps_per_shard, n_steps - step0)
+        # Arrays are (step, agent), so flattening gives timestamp order
+        speed = speed_lo + (speed_hi - speed_lo) * rng.random((k, n_agents))
+        turn = turn_lo + (turn_hi - turn_lo) * rng.random((k, n_agents))
+        sign = np.where(rng.random((k, n_agents)) < 0.5, -1.0, 1.0)
+
+        headings = heading + np.cumsum(np.radians(turn * sign), axis=0)
+        step_m = speed * interval_s
+        true_lat = lat + np.cumsum(step_m * np.cos(headings), axis=0) / METRES_PER_DEGREE
+        true_lon = lon + np.cumsum(step_m * np.sin(headings), axis=0) / (
+            METRES_PER_DEGREE * np.cos(np.radians(lat)))
+        lat, lon, heading = true_lat[-1], true_lon[-1], headings[-1]
+
+        confidence = np.round(rng.uniform(0.55, 0.98, (k, n_agents)), 2)
+        noise_deg = SENSOR_NOISE_M * (1.0 - confidence) / METRES_PER_DEGREE
+        latitude = true_lat + rng.standard_normal((k, n_agents)) * noise_deg
+        longitude = true_lon + rng.standard_normal((k, n_agents)) * noise_deg / np.cos(np.radians(true_lat))
+
+        t_ns = start_ns + (step0 + np.arange(k, dtype=np.int64)) * interval_ns
+        hour = (t_ns // 3_600_000_000_000) % 24
+        night = (hour >= NIGHT_HOURS[0]) | (hour < NIGHT_HOURS[1])
+        visibility = np.where(night[:, None], 2, profile["foggy"].astype(np.int64))
+
+        agent = np.tile(np.arange(n_agents), k)
+        shard = pd.DataFrame(
+            {
+                "timestamp": np.repeat(t_ns, n_agents).view("datetime64[ns]"),
+                "agent_id": pd.Categorical.from_codes(agent, agent_ids),
+                "latitude": latitude.ravel(),
+                "longitude": longitude.ravel(),
+                "true_latitude": true_lat.ravel(),
+                "true_longitude": true_lon.ravel(),
+                "speed": speed.ravel(),
+                "angle_change": turn.ravel(),
+                "object_type": pd.Categorical.from_codes(profile["object_type"][agent], OBJECT_TYPES),
+                "terrain": pd.Categorical.from_codes(profile["terrain"][agent], TERRAINS),
+                "visibility": pd.Categorical.from_codes(visibility.ravel(), VISIBILITIES),
+                "sensor_confidence": confidence.ravel(),
+                "label": profile["label"][agent],
+            }
+        )
+
+        remaining = n_fixes - step0 * n_agents
+        yield shard.iloc[:remaining] if remaining < len(shard) else shard
+
+
+def write_agent_shards(out_dir, n_fixes, n_agents=1000, seed=None, shard_rows=1_000_000, **kwargs):
+    """
+    Writes a ``simulate_agents`` run as numbered shard files in ``out_dir``,
+    in the configured storage format. Returns the shard paths.
+    """
+    out_dir = Path(out_dir)
+    paths = []
+    shards = simulate_agents(n_fixes, n_agents=n_agents, seed=seed, shard_rows=shard_rows, **kwargs)
+    for i, shard in enumerate(shards):
+        path = out_dir / f"part-{i:05d}.{config.storage_format()}"
+        storage.write_table(shard, path)
+        paths.append(path)
+    return paths
+
+
+def generate_agent_data(n_fixes, n_agents=1000, seed=None, path=None, **kwargs):
+    """Writes a ``simulate_agents`` run as a single raw dataset."""
+    df = pd.concat(simulate_agents(n_fixes, n_agents=n_agents, seed=seed, **kwargs),
+                   ignore_index=True)
+    storage.write_table(df, path or config.raw_data_path())
+    print(f"Dataset with {n_agents} simulated agents generated")
+    return df
+
+
 if __name__ == "__main__":
-    generate_scientific_data()
+    parser = argparse.ArgumentParser(description="Synthetic border sensor data")
+    parser.add_argument("--agents", type=int,
+                        help="simulate this many agents with continuous tracks")
+    parser.add_argument("--fixes", type=int, default=1_000_000,
+                        help="rows to simulate with --agents")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--shard-rows", type=int, default=1_000_000)
+    parser.add_argument("--out-dir", help="write --agents output as shards in this directory")
+    args = parser.parse_args()
+
+    if args.agents is None:
+        generate_scientific_data()
+    elif args.out_dir:
+        write_agent_shards(args.out_dir, args.fixes, n_agents=args.agents, seed=args.seed,
+                           shard_rows=args.shard_rows)
+    else:
+        generate_agent_data(args.fixes, n_agents=args.agents, seed=args.seed,
+                            shard_rows=args.shard_rows)
@@ -0,0 +1,196 @@
+"""
+Border geofence queries on arrays of positions.
+
+``GeofenceIndex`` projects the border polylines onto a local metric plane
+and buckets their segments into a uniform grid. Every cell keeps only the
+segments that can be nearest to some point inside it, so a query checks a
+handful of segments per point instead of the whole border. The same index
+answers distance to the border, side of the border and warning-zone
+membership for preprocessing and the dashboard.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from src import config
+
+
+EARTH_RADIUS_M = 6371000.0
+METRES_PER_DEGREE = EARTH_RADIUS_M * np.pi / 180.0
+# Points handled per vectorised step of a query
+QUERY_CHUNK_ROWS = 65_536
+# (cell, segment) pairs handled per vectorised step of building the grid
+GRID_CHUNK_PAIRS = 1 << 22
+
+
+def _segment_distance2(px, py, ax, ay, dx, dy, inv_len2):
+    """
+    Squared distance from points to segments (start a, direction d), and
+    the cross product whose sign gives the side of the segment.
+    """
+    rx = px - ax
+    ry = py - ay
+    t = np.clip((rx * dx + ry * dy) * inv_len2, 0.0, 1.0)
+    ex = rx - t * dx
+    ey = ry - t * dy
+    return ex * ex + ey * ey, dx * ry - dy * rx
+
+
+class GeofenceIndex:
+    """
+    Grid index over border polylines and warning-zone polygons.
+
+    Args:
+        border_lines: list of polylines, each a list of [lat, lon] vertices
+        warning_zones: list of polygons, each a list of [lat, lon] vertices
+        cell_size_m: side of a grid cell in metres
+        margin_m: how far beyond the border's bounding box the grid reaches.
+            Points outside the grid are checked against every segment.
+    """
+
+    def __init__(self, border_lines, warning_zones=(), cell_size_m=1_000.0, margin_m=50_000.0):
+        self.border_lines = [np.asarray(line, dtype=float) for line in border_lines]
+        self.warning_zones = [np.asarray(zone, dtype=float) for zone in warning_zones]
+        if not self.border_lines:
+            raise ValueError("A geofence needs at least one border line")
+
+        vertices = np.concatenate(self.border_lines)
+        self.lat0 = float(vertices[:, 0].mean())
+        self.lon0 = float(vertices[:, 1].mean())
+        self._lon_scale = METRES_PER_DEGREE * np.cos(np.radians(self.lat0))
+
+        # Segments of every line, as start/end points on the metric plane
+        ax, ay, bx, by = [], [], [], []
+        for line in self.border_lines:
+            x, y = self.project(line[:, 0], line[:, 1])
+            ax.append(x[:-1])
+            ay.append(y[:-1])
+            bx.append(x[1:])
+            by.append(y[1:])
+        self._ax, self._ay = np.concatenate(ax), np.concatenate(ay)
+        self._dx = np.concatenate(bx) - self._ax
+        self._dy = np.concatenate(by) - self._ay
+        len2 = self._dx ** 2 + self._dy ** 2
+        self._inv_len2 = np.divide(1.0, len2, out=np.zeros_like(len2), where=len2 > 0)
+
+        self._zones = [self.project(zone[:, 0], zone[:, 1]) for zone in self.warning_zones]
+        self._build_grid(cell_size_m, margin_m)
+
+    def project(self, lat, lon):
+        """Local equirectangular projection to metres around the border."""
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        return (lon - self.lon0) * self._lon_scale, (lat - self.lat0) * METRES_PER_DEGREE
+
+    def _build_grid(self, cell_size_m, margin_m):
+        xs = np.r_[self._ax, self._ax + self._dx]
+        ys = np.r_[self._ay, self._ay + self._dy]
+        self.cell_size = float(cell_size_m)
+        self.x_min = xs.min() - margin_m
+        self.y_min = ys.min() - margin_m
+        self.nx = int(np.ceil((xs.max() + margin_m - self.x_min) / self.cell_size)) + 1
+        self.ny = int(np.ceil((ys.max() + margin_m - self.y_min) / self.cell_size)) + 1
+
+        # A segment can only be nearest to a point of a cell if it is within
+        # the cell centre's nearest distance plus the cell's diagonal. Cells
+        # are taken in chunks so no cells x segments matrix is ever built.
+        cx = self.x_min + (np.arange(self.nx) + 0.5) * self.cell_size
+        cy = self.y_min + (np.arange(self.ny) + 0.5) * self.cell_size
+        cx, cy = (c.ravel() for c in np.meshgrid(cx, cy))
+        step = max(1, GRID_CHUNK_PAIRS // len(self._ax))
+        parts = []
+        for i in range(0, len(cx), step):
+            dist2, _ = self._to_segments(cx[i:i + step], cy[i:i + step], slice(None))
+            dist = np.sqrt(dist2)
+            reach = dist.min(axis=1, keepdims=True) + self.cell_size * np.sqrt(2.0)
+            candidate = dist <= reach
+            order = np.argsort(~candidate, axis=1, kind="stable")[:, :candidate.sum(axis=1).max()]
+            taken = np.take_along_axis(candidate, order, axis=1)
+            parts.append((order, taken, dist.argmin(axis=1)))
+
+        # Pad every cell to the same number of candidates by repeating its nearest
+        width = max(order.shape[1] for order, _, _ in parts)
+        self._cells = np.concatenate([
+            np.where(np.pad(taken, ((0, 0), (0, width - taken.shape[1]))),
+                     np.pad(order, ((0, 0), (0, width - order.shape[1]))), nearest[:, None])
+            for order, taken, nearest in parts
+        ]).astype(np.intp)
+
+    def _to_segments(self, x, y, seg):
+        """Squared distance and cross product of every point with segments ``seg``."""
+        return _segment_distance2(x[:, None], y[:, None], self._ax[seg], self._ay[seg],
+                                  self._dx[seg], self._dy[seg], self._inv_len2[seg])
+
+    def _nearest(self, x, y):
+        """Distance to and cross product with the nearest segment of each point."""
+        ix = np.floor((x - self.x_min) / self.cell_size).astype(np.intp)
+        iy = np.floor((y - self.y_min) / self.cell_size).astype(np.intp)
+        in_grid = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        if in_grid.all():
+            return self._nearest_of(x, y, self._cells[iy * self.nx + ix])
+
+        dist = np.empty(len(x))
+        cross = np.empty(len(x))
+        dist[in_grid], cross[in_grid] = self._nearest_of(
+            x[in_grid], y[in_grid], self._cells[iy[in_grid] * self.nx + ix[in_grid]])
+        # Points off the grid are checked against every segment
+        off = ~in_grid
+        dist[off], cross[off] = self._nearest_of(x[off], y[off], np.arange(len(self._ax))[None, :])
+        return dist, cross
+
+    def _nearest_of(self, x, y, seg):
+        dist2, cross = self._to_segments(x, y, seg)
+        best = dist2.argmin(axis=1)[:, None]
+        return (np.sqrt(np.take_along_axis(dist2, best, axis=1)[:, 0]),
+                np.take_along_axis(cross, best, axis=1)[:, 0])
+
+    def _in_zones(self, x, y):
+        inside = np.zeros(len(x), dtype=bool)
+        for zx, zy in self._zones:
+            in_box = (x >= zx.min()) & (x <= zx.max()) & (y >= zy.min()) & (y <= zy.max())
+            px, py = x[in_box], y[in_box]
+            # Even-odd ray casting over the polygon's edges
+            crossings = np.zeros(len(px), dtype=bool)
+            for x1, y1, x2, y2 in zip(zx, zy, np.roll(zx, -1), np.roll(zy, -1)):
+                spans = (y1 > py) != (y2 > py)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    x_at = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+                crossings ^= spans & (px < x_at)
+            inside[np.flatnonzero(in_box)[crossings]] = True
+        return inside
+
+    def query(self, lat, lon):
+        """
+        Returns a dict of arrays for the given positions:
+            dist_to_border_m: distance to the nearest border segment in metres
+            border_side: +1 left of the border's drawing direction, -1 right
+                of it, 0 on the line
+            in_warning_zone: inside any warning-zone polygon
+        """
+        x, y = self.project(np.ravel(lat), np.ravel(lon))
+        n = len(x)
+        dist = np.empty(n)
+        side = np.empty(n, dtype=np.int8)
+        zone = np.empty(n, dtype=bool)
+        for i in range(0, n, QUERY_CHUNK_ROWS):
+            part = slice(i, i + QUERY_CHUNK_ROWS)
+            d, c = self._nearest(x[part], y[part])
+            dist[part] = d
+            side[part] = np.sign(c)
+            zone[part] = self._in_zones(x[part], y[part])
+        return {"dist_to_border_m": dist, "border_side": side, "in_warning_zone": zone}
+
+    def distance_to_border(self, lat, lon):
+        return self.query(lat, lon)["dist_to_border_m"]
+
+
+@lru_cache(maxsize=1)
+def get_geofence():
+    """The configured border geofence, built once per process."""
+    return GeofenceIndex(
+        config.BORDER_LINES,
+        config.WARNING_ZONES,
+        cell_size_m=config.GEOFENCE_CELL_M,
+        margin_m=config.GEOFENCE_MARGIN_M,
+    )
@@ -0,0 +1,317 @@
+"""
+Pre-aggregated threat heatmap tiles.
+
+Scored fixes are binned into Web Mercator quadtree cells per time bucket.
+Every level from ``config.HEATMAP_MIN_LEVEL`` to ``config.HEATMAP_MAX_LEVEL``
+keeps, per (cell, bucket), the fix count, the sum of threat scores and the
+count of "hot" fixes scoring above ``config.HEATMAP_HOT_SCORE``, so a heatmap
+at any zoom reads one level instead of the raw fixes.
+
+Within a level the aggregates are stored sorted by
+
+    key = ((y << level | x) << BUCKET_BITS) | bucket
+
+so the cells of one screen row (a run of x at one y) are one contiguous
+slice. A query does one pair of ``searchsorted`` per cell row on screen
+and then filters the slice by bucket, so its cost follows the occupied
+(cell, bucket) pairs in view, across every stored bucket of those cells,
+however many fixes went in. ``drop_before`` bounds the buckets kept.
+
+``add`` appends to a small pending buffer that queries scan directly; it
+is folded into the levels once it outgrows ``config.HEATMAP_MERGE_ROWS``.
+Safe to add from the ingestion thread while the dashboard queries.
+
+    store = TileStore()
+    store.add(lat, lon, timestamps, threat_scores)
+    cells = store.query(zoom=11, bbox=(south, west, north, east), start=t0, end=t1)
+"""
+
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import config
+
+FORMAT_VERSION = 1
+# Bits of the time bucket in a key; 24 bits of hour buckets cover ~1900 years
+BUCKET_BITS = 24
+MAX_LEVEL = (63 - BUCKET_BITS) // 2
+# Web Mercator stops short of the poles
+MAX_LAT = 85.05112878
+
+
+def _root(path):
+    return Path(path) if path is not None else Path(config.heatmap_tiles_dir())
+
+
+def cell_xy(lat, lon, level):
+    """Quadtree cell (x, y) of positions at ``level``; y grows southwards."""
+    n = 1 << level
+    lat = np.radians(np.clip(np.asarray(lat, dtype=float), -MAX_LAT, MAX_LAT))
+    lon = np.asarray(lon, dtype=float)
+    x = np.floor((lon + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def cell_center(x, y, level):
+    """(lat, lon) of the centres of cells at ``level``."""
+    n = float(1 << level)
+    lon = (np.asarray(x) + 0.5) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (np.asarray(y) + 0.5) / n))))
+    return lat, lon
+
+
+def _aggregate(keys, count, score, hot):
+    """Sorted unique keys with the summed count, score and hot count of each."""
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return {
+        "keys": keys,
+        "count": np.bincount(inverse, weights=count, minlength=len(keys)).astype(np.int64),
+        "score": np.bincount(inverse, weights=score, minlength=len(keys)),
+        "hot": np.bincount(inverse, weights=hot, minlength=len(keys)).astype(np.int64),
+    }
+
+
+def _merge_sorted(old, new):
+    """Adds ``new`` aggregates into a copy of ``old``; both sorted by unique key."""
+    pos = np.searchsorted(old["keys"], new["keys"])
+    hit = pos < len(old["keys"])
+    hit[hit] = old["keys"][pos[hit]] == new["keys"][hit]
+    merged = {}
+    for name, values in old.items():
+        values = values.copy()
+        if name != "keys":
+            values[pos[hit]] += new[name][hit]
+        merged[name] = np.insert(values, pos[~hit], new[name][~hit])
+    return merged
+
+
+def _empty_level():
+    return {"keys": np.zeros(0, dtype=np.int64), "count": np.zeros(0, dtype=np.int64),
+            "score": np.zeros(0), "hot": np.zeros(0, dtype=np.int64)}
+
+
+class TileStore:
+    """
+    Args:
+        bucket_s: length of a time bucket in seconds
+        min_level, max_level: quadtree levels kept (coarsest, finest)
+        hot_score: threat score above which a fix counts as hot
+        merge_rows: pending fixes that trigger a merge into the levels
+    """
+
+    def __init__(self, bucket_s=None, min_level=None, max_level=None, hot_score=None,
+                 merge_rows=None):
+        self.bucket_s = float(bucket_s if bucket_s is not None else config.HEATMAP_BUCKET_S)
+        self.min_level = int(min_level if min_level is not None else config.HEATMAP_MIN_LEVEL)
+        self.max_level = int(max_level if max_level is not None else config.HEATMAP_MAX_LEVEL)
+        if not 0 <= self.min_level <= self.max_level <= MAX_LEVEL:
+            raise ValueError(f"Levels must satisfy 0 <= min <= max <= {MAX_LEVEL}")
+        self.hot_score = float(hot_score if hot_score is not None else config.HEATMAP_HOT_SCORE)
+        self.merge_rows = int(merge_rows if merge_rows is not None else config.HEATMAP_MERGE_ROWS)
+        self.levels = {level: _empty_level() for level in self.levels_range()}
+        self.fixes = 0
+        # Aggregates plus pending fixes read by the last query
+        self.last_scanned = 0
+        self._pending = []
+        self._lock = threading.RLock()
+
+    def levels_range(self):
+        return range(self.min_level, self.max_level + 1)
+
+    def level_for_zoom(self, zoom):
+        """Level whose cells are ``config.HEATMAP_CELL_BITS`` finer than the map's tiles."""
+        return int(np.clip(int(zoom) + config.HEATMAP_CELL_BITS, self.min_level, self.max_level))
+
+    def bucket(self, timestamps):
+        """Time bucket of timestamps (anything ``pd.to_datetime`` reads)."""
+        t_ns = pd.to_datetime(np.atleast_1d(timestamps)).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        return np.floor(t_ns / (self.bucket_s * 1e9)).astype(np.int64)
+
+    def bucket_start(self, bucket):
+        return pd.to_datetime(np.asarray(bucket, dtype=np.int64) * int(self.bucket_s * 1e9))
+
+    # ---- inserts ----
+    def add(self, lat, lon, timestamps, scores):
+        """Adds scored fixes. Returns the number added."""
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        scores = np.asarray(scores, dtype=float)
+        bucket = self.bucket(timestamps)
+        if bucket.min(initial=0) < 0 or bucket.max(initial=0) >= 1 << BUCKET_BITS:
+            raise ValueError("Timestamps fall outside the bucket range of the tile store")
+        with self._lock:
+            self._pending.append((lat, lon, bucket, scores))
+            self.fixes += len(lat)
+            if sum(len(p[0]) for p in self._pending) >= self.merge_rows:
+                self.merge()
+        return len(lat)
+
+    def _pending_arrays(self):
+        if not self._pending:
+            return None
+        return [np.concatenate(parts) for parts in zip(*self._pending)]
+
+    def _keys(self, lat, lon, bucket, level):
+        x, y = cell_xy(lat, lon, level)
+        return (((y << level) | x) << BUCKET_BITS) | bucket
+
+    def merge(self):
+        """Folds the pending fixes into every level."""
+        with self._lock:
+            pending = self._pending_arrays()
+            self._pending = []
+            if pending is None:
+                return
+            lat, lon, bucket, scores = pending
+            ones = np.ones(len(lat))
+            hot = (scores > self.hot_score).astype(float)
+            for level in self.levels_range():
+                new = _aggregate(self._keys(lat, lon, bucket, level), ones, scores, hot)
+                self.levels[level] = _merge_sorted(self.levels[level], new)
+
+    def drop_before(self, timestamp):
+        """Removes every bucket that ends before ``timestamp``, e.g. to keep a week."""
+        first = int(self.bucket(timestamp)[0])
+        with self._lock:
+            self.merge()
+            for level, data in self.levels.items():
+                keep = (data["keys"] & ((1 << BUCKET_BITS) - 1)) >= first
+                self.levels[level] = {name: values[keep] for name, values in data.items()}
+
+    # ---- queries ----
+    def query(self, zoom, bbox=None, start=None, end=None):
+        """
+        Heatmap cells in view at a map zoom.
+
+        Args:
+            zoom: map zoom level; picks the stored level via ``level_for_zoom``
+            bbox: (south, west, north, east) in degrees; the whole world if None
+            start, end: time range, inclusive of the buckets they fall in
+
+        Returns:
+            DataFrame of lat, lon (cell centres), count, score_sum, score_mean
+            and hot (fixes above the hot score), one row per cell.
+        """
+        level = self.level_for_zoom(zoom)
+        n = 1 << level
+        b0 = int(self.bucket(start)[0]) if start is not None else 0
+        b1 = int(self.bucket(end)[0]) if end is not None else (1 << BUCKET_BITS) - 1
+        if bbox is None:
+            x0, y0, x1, y1 = 0, 0, n - 1, n - 1
+        else:
+            south, west, north, east = bbox
+            xs, ys = cell_xy([south, north], [west, east], level)
+            x0, x1 = int(xs.min()), int(xs.max())
+            y0, y1 = int(ys.min()), int(ys.max())
+
+        # Merges replace the level arrays rather than writing into them
+        with self._lock:
+            data = self.levels[level]
+            pending = self._pending_arrays()
+
+        cells, counts, scores, hots = [], [], [], []
+        scanned = 0
+        if len(data["keys"]):
+            # One slice per cell row on screen
+            rows = np.arange(y0, y1 + 1, dtype=np.int64)
+            lo = np.searchsorted(data["keys"], (((rows << level) | x0) << BUCKET_BITS) | b0)
+            hi = np.searchsorted(data["keys"], (((rows << level) | x1) << BUCKET_BITS) | b1, side="right")
+            sizes = hi - lo
+            idx = np.repeat(lo, sizes) + (np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes))
+            scanned += len(idx)
+            keys = data["keys"][idx]
+            bucket = keys & ((1 << BUCKET_BITS) - 1)
+            inside = (bucket >= b0) & (bucket <= b1)
+            idx = idx[inside]
+            cells.append(data["keys"][idx] >> BUCKET_BITS)
+            counts.append(data["count"][idx])
+            scores.append(data["score"][idx])
+            hots.append(data["hot"][idx])
+
+        if pending is not None:
+            lat, lon, bucket, score = pending
+            scanned += len(lat)
+            x, y = cell_xy(lat, lon, level)
+            inside = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1) & (bucket >= b0) & (bucket <= b1)
+            cells.append((y[inside] << level) | x[inside])
+            counts.append(np.ones(inside.sum(), dtype=np.int64))
+            scores.append(score[inside])
+            hots.append((score[inside] > self.hot_score).astype(np.int64))
+
+        self.last_scanned = scanned
+        cell = np.concatenate(cells) if cells else np.zeros(0, dtype=np.int64)
+        cell, inverse = np.unique(cell, return_inverse=True)
+        count = np.bincount(inverse, weights=np.concatenate(counts) if counts else None,
+                            minlength=len(cell))
+        score_sum = np.bincount(inverse, weights=np.concatenate(scores) if scores else None,
+                                minlength=len(cell))
+        hot = np.bincount(inverse, weights=np.concatenate(hots) if hots else None, minlength=len(cell))
+        lat, lon = cell_center(cell & (n - 1), cell >> level, level)
+        return pd.DataFrame({
+            "lat": lat,
+            "lon": lon,
+            "count": count.astype(np.int64),
+            "score_sum": score_sum,
+            "score_mean": np.divide(score_sum, count, out=np.zeros(len(cell)), where=count > 0),
+            "hot": hot.astype(np.int64),
+        })
+
+    # ---- persistence ----
+    def save(self, path=None):
+        """Writes the store as a directory, assembled aside and renamed into place."""
+        with self._lock:
+            self.merge()
+            levels = dict(self.levels)
+            fixes = self.fixes
+        path = _root(path)
+        tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for level, data in levels.items():
+            np.savez(tmp / f"level_{level:02d}.npz", **data)
+        with open(tmp / "manifest.json", "w") as f:
+            json.dump({
+                "format_version": FORMAT_VERSION,
+                "bucket_s": self.bucket_s,
+                "min_level": self.min_level,
+                "max_level": self.max_level,
+                "hot_score": self.hot_score,
+                "fixes": fixes,
+            }, f, indent=2)
+
+        old = path.with_name(f".{path.name}.old-{os.getpid()}")
+        if path.exists():
+            path.rename(old)
+        tmp.rename(path)
+        shutil.rmtree(old, ignore_errors=True)
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        path = _root(path)
+        manifest_path = path / "manifest.json"
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"Heatmap tiles not found at {path}")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["format_version"] > FORMAT_VERSION:
+            raise ValueError(f"Unsupported heatmap tile version {manifest['format_version']}")
+
+        store = cls(bucket_s=manifest["bucket_s"], min_level=manifest["min_level"],
+                    max_level=manifest["max_level"], hot_score=manifest["hot_score"])
+        store.fixes = manifest["fixes"]
+        for level in store.levels_range():
+            with np.load(path / f"level_{level:02d}.npz") as data:
+                store.levels[level] = {name: data[name] for name in data.files}
+        return store
+
+
+def tiles_exist(path=None):
+    return (_root(path) / "manifest.json").exists()
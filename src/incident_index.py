@@ -0,0 +1,318 @@
+"""
+Nearest-neighbour index of past tracks, for "similar past incidents".
+
+Every historical track becomes one vector: standardised motion aggregates
+(speed, turning, sensor confidence, border distance, warning-zone share)
+followed by the one-hot columns of the model's categorical inputs, with
+the categories the model artifact was trained on. An alert from the
+dashboard is turned into the same layout, so the closest vectors are the
+most similar past incidents.
+
+Vectors live in a KD-tree plus a small append buffer. ``add`` only appends
+to the buffer, queries search both, and the tree is rebuilt once the
+buffer outgrows ``config.INCIDENT_INDEX_REBUILD_ROWS`` (or a tenth of the
+tree), so inserts stay cheap and queries stay in the milliseconds.
+
+The index is saved as a directory next to the model:
+
+    incident_index/
+        manifest.json    feature layout, scaling, categories, sizes
+        vectors.npy      one row per incident, memory-mapped on load
+        incidents.csv    track id, source, label, time span and aggregates
+
+    python -m src.incident_index --build                 # from the featured data
+    python -m src.incident_index --add new_featured.csv
+"""
+
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from src import config, storage
+from src.model_artifact import artifact_exists, load_artifact
+
+FORMAT_VERSION = 1
+# Per-track aggregates, in vector order
+AGGREGATES = ["speed_mean", "speed_max", "angle_change_mean", "sensor_confidence_mean",
+              "dist_to_border_min", "warning_share"]
+CATEGORICAL = ["object_type", "terrain", "visibility"]
+# Columns the aggregates are read from
+TRACK_COLUMNS = ["agent_id", "timestamp", "speed", "angle_change", "sensor_confidence",
+                 "dist_to_border", "in_warning_zone", "label"] + CATEGORICAL
+
+
+def _root(path):
+    return Path(path) if path is not None else Path(config.incident_index_dir())
+
+
+def track_aggregates(df, source=None):
+    """
+    One row per track of a featured dataset: the ``AGGREGATES``, the most
+    common category of each categorical column, and the track's span.
+    """
+    df = df.copy()
+    for column in ["in_warning_zone", "label"]:
+        if column not in df.columns:
+            df[column] = 0
+    # Featured data holds the motion angle change in radians
+    df["angle_change_deg"] = np.degrees(df["angle_change"].astype(float))
+    df["in_warning_zone"] = df["in_warning_zone"].astype(float)
+    df["agent_id"] = df["agent_id"].astype(str)
+    grouped = df.groupby("agent_id", sort=True)
+
+    out = pd.DataFrame({
+        "speed_mean": grouped["speed"].mean(),
+        "speed_max": grouped["speed"].max(),
+        "angle_change_mean": grouped["angle_change_deg"].mean(),
+        "sensor_confidence_mean": grouped["sensor_confidence"].mean(),
+        "dist_to_border_min": grouped["dist_to_border"].min(),
+        "warning_share": grouped["in_warning_zone"].mean(),
+    })
+    for column in CATEGORICAL:
+        # Most common category per track, ties to the smallest
+        counts = df.groupby(["agent_id", df[column].astype(str)]).size().rename("n").reset_index()
+        counts = counts.sort_values(["agent_id", "n", column], ascending=[True, False, True])
+        out[column] = counts.drop_duplicates("agent_id").set_index("agent_id")[column]
+    out["label"] = grouped["label"].max().astype(int)
+    out["n_fixes"] = grouped.size()
+    out["first_seen"] = grouped["timestamp"].min().astype(str)
+    out["last_seen"] = grouped["timestamp"].max().astype(str)
+    out = out.rename_axis("track_id").reset_index()
+    out.insert(1, "source", str(source) if source is not None else "")
+    return out
+
+
+def alert_aggregates(alerts):
+    """
+    ``AGGREGATES`` of dashboard rows (the latest fix of live tracks), where
+    one fix stands in for its track's averages.
+    """
+    dist = alerts["dist_to_border_m"] if "dist_to_border_m" in alerts else alerts["dist_to_border"]
+    out = pd.DataFrame({
+        "speed_mean": alerts["speed"].to_numpy(dtype=float),
+        "speed_max": alerts["speed"].to_numpy(dtype=float),
+        "angle_change_mean": alerts["angle_change"].to_numpy(dtype=float),
+        "sensor_confidence_mean": alerts["sensor_confidence"].to_numpy(dtype=float),
+        "dist_to_border_min": np.asarray(dist, dtype=float),
+        "warning_share": alerts["in_warning_zone"].to_numpy(dtype=float),
+    })
+    for column in CATEGORICAL:
+        out[column] = alerts[column].astype(str).to_numpy()
+    return out
+
+
+def model_categories(model_dir=None):
+    """Category vocabularies of the model artifact's categorical inputs."""
+    if not artifact_exists(model_dir):
+        return None
+    model = load_artifact(model_dir)
+    return dict(zip(model.categorical_features, model.categories))
+
+
+class IncidentIndex:
+    """
+    Args:
+        mean, scale: standardisation of the ``AGGREGATES``
+        categories: column -> category list of the one-hot block
+        rebuild_rows: buffered inserts that trigger a tree rebuild
+    """
+
+    def __init__(self, mean, scale, categories, rebuild_rows=None):
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.where(np.asarray(scale, dtype=float) > 0, scale, 1.0)
+        self.categories = {column: [str(c) for c in categories[column]] for column in CATEGORICAL}
+        self.rebuild_rows = (rebuild_rows if rebuild_rows is not None
+                             else config.INCIDENT_INDEX_REBUILD_ROWS)
+        self.incidents = pd.DataFrame()
+        self._tree_vectors = np.zeros((0, self.dim))
+        self._tree = None
+        self._buffer = []
+
+    @classmethod
+    def from_tracks(cls, tracks, categories=None, **kwargs):
+        """Index fitted to ``track_aggregates`` rows: scaling from them, then all of them added."""
+        if categories is None:
+            categories = {c: sorted(tracks[c].astype(str).unique()) for c in CATEGORICAL}
+        values = tracks[AGGREGATES].to_numpy(dtype=float)
+        index = cls(values.mean(axis=0), values.std(axis=0), categories, **kwargs)
+        index.add(tracks)
+        return index
+
+    @property
+    def dim(self):
+        return len(AGGREGATES) + sum(len(c) for c in self.categories.values())
+
+    def feature_names(self):
+        names = list(AGGREGATES)
+        for column in CATEGORICAL:
+            names += [f"{column}_{c}" for c in self.categories[column]]
+        return names
+
+    def __len__(self):
+        return len(self._tree_vectors) + sum(len(b) for b in self._buffer)
+
+    # ---- vectors ----
+    def vectorize(self, rows):
+        """Vectors of rows holding the ``AGGREGATES`` and categorical columns."""
+        numeric = rows[AGGREGATES].to_numpy(dtype=float)
+        numeric = np.nan_to_num((numeric - self.mean) / self.scale)
+        blocks = [numeric]
+        for column in CATEGORICAL:
+            cats = self.categories[column]
+            codes = pd.Index(cats).get_indexer(rows[column].astype(str))
+            onehot = np.zeros((len(rows), len(cats)))
+            known = codes >= 0
+            onehot[np.flatnonzero(known), codes[known]] = 1.0
+            blocks.append(onehot)
+        return np.hstack(blocks)
+
+    # ---- inserts ----
+    def add(self, tracks):
+        """Appends ``track_aggregates`` rows; returns their incident ids."""
+        start = len(self)
+        tracks = tracks.reset_index(drop=True).copy()
+        tracks.insert(0, "incident_id", np.arange(start, start + len(tracks)))
+        self.incidents = pd.concat([self.incidents, tracks], ignore_index=True)
+        self._buffer.append(self.vectorize(tracks))
+        buffered = sum(len(b) for b in self._buffer)
+        if self._tree is None or buffered > max(self.rebuild_rows, len(self._tree_vectors) // 10):
+            self.rebuild()
+        return tracks["incident_id"].to_numpy()
+
+    def rebuild(self):
+        """Merges the buffer into the vectors and rebuilds the KD-tree."""
+        self._tree_vectors = np.vstack([self._tree_vectors] + self._buffer)
+        self._buffer = []
+        self._tree = cKDTree(self._tree_vectors) if len(self._tree_vectors) else None
+
+    # ---- queries ----
+    def query_vectors(self, vectors, k=5):
+        """(distances, incident ids) of the ``k`` nearest incidents, nearest first."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=float))
+        k = min(k, len(self))
+        n = len(vectors)
+        if k == 0:
+            return np.zeros((n, 0)), np.zeros((n, 0), dtype=np.int64)
+
+        dist, ids = [], []
+        if self._tree is not None:
+            k_tree = min(k, len(self._tree_vectors))
+            d, i = self._tree.query(vectors, k=k_tree)
+            dist.append(d.reshape(n, k_tree))
+            ids.append(i.reshape(n, k_tree))
+        if self._buffer:
+            buffer = np.vstack(self._buffer)
+            d = np.sqrt(((vectors[:, None, :] - buffer[None, :, :]) ** 2).sum(axis=2))
+            dist.append(d)
+            ids.append(np.broadcast_to(len(self._tree_vectors) + np.arange(len(buffer)), d.shape))
+        dist = np.hstack(dist)
+        ids = np.hstack(ids)
+        nearest = np.argsort(dist, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(dist, nearest, axis=1), np.take_along_axis(ids, nearest, axis=1)
+
+    def query(self, alerts, k=5):
+        """
+        Similar past incidents of every alert row, as one frame with the
+        alert's position (``query``), ``rank``, ``distance`` and the
+        incident's details.
+        """
+        dist, ids = self.query_vectors(self.vectorize(alert_aggregates(alerts)), k)
+        found = self.incidents.iloc[ids.ravel()].reset_index(drop=True)
+        found.insert(0, "query", np.repeat(np.arange(len(ids)), ids.shape[1]))
+        found.insert(1, "rank", np.tile(np.arange(1, ids.shape[1] + 1), len(ids)))
+        found.insert(2, "distance", dist.ravel())
+        return found
+
+    # ---- persistence ----
+    def save(self, path=None):
+        """Writes the index directory; it is assembled aside and renamed into place."""
+        self.rebuild()
+        path = _root(path)
+        tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        np.save(tmp / "vectors.npy", self._tree_vectors)
+        self.incidents.to_csv(tmp / "incidents.csv", index=False)
+        with open(tmp / "manifest.json", "w") as f:
+            json.dump({
+                "format_version": FORMAT_VERSION,
+                "aggregates": AGGREGATES,
+                "mean": self.mean.tolist(),
+                "scale": self.scale.tolist(),
+                "categories": self.categories,
+                "features": self.feature_names(),
+                "n_incidents": len(self),
+            }, f, indent=2)
+
+        old = path.with_name(f".{path.name}.old-{os.getpid()}")
+        if path.exists():
+            path.rename(old)
+        tmp.rename(path)
+        shutil.rmtree(old, ignore_errors=True)
+        return path
+
+    @classmethod
+    def load(cls, path=None, mmap=True):
+        path = _root(path)
+        manifest_path = path / "manifest.json"
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"Incident index not found at {path}")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["format_version"] > FORMAT_VERSION:
+            raise ValueError(f"Unsupported incident index version {manifest['format_version']}")
+
+        index = cls(manifest["mean"], manifest["scale"], manifest["categories"])
+        index.incidents = pd.read_csv(path / "incidents.csv", dtype={"track_id": str, "source": str},
+                                      keep_default_na=False)
+        index._tree_vectors = np.load(path / "vectors.npy", mmap_mode="r" if mmap else None)
+        index._tree = cKDTree(index._tree_vectors) if len(index._tree_vectors) else None
+        return index
+
+
+def index_exists(path=None):
+    return (_root(path) / "manifest.json").exists()
+
+
+def _read_featured(path):
+    return storage.read_table(path, columns=TRACK_COLUMNS)
+
+
+def build_incident_index(featured_path=None, path=None, model_dir=None):
+    """Indexes every track of the featured data, with the model's categories."""
+    featured_path = Path(featured_path) if featured_path is not None else Path(config.processed_data_path())
+    tracks = track_aggregates(_read_featured(featured_path), source=featured_path.name)
+    index = IncidentIndex.from_tracks(tracks, categories=model_categories(model_dir))
+    index.save(path)
+    return index
+
+
+def add_to_incident_index(featured_path, path=None):
+    """Adds the tracks of another featured dataset to the saved index."""
+    featured_path = Path(featured_path)
+    index = IncidentIndex.load(path, mmap=False)
+    index.add(track_aggregates(_read_featured(featured_path), source=featured_path.name))
+    index.save(path)
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or extend the similar-incident index")
+    parser.add_argument("--build", nargs="?", const=str(config.processed_data_path()),
+                        metavar="FEATURED", help="index every track of a featured dataset")
+    parser.add_argument("--add", metavar="FEATURED", help="add another dataset's tracks")
+    args = parser.parse_args()
+
+    if args.build:
+        index = build_incident_index(args.build)
+        print(f"Indexed {len(index):,} tracks in {config.incident_index_dir()}")
+    if args.add:
+        index = add_to_incident_index(args.add)
+        print(f"Index now holds {len(index):,} tracks")
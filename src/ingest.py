@@ -0,0 +1,323 @@
+"""
+Live sensor-feed ingestion.
+
+``IngestService`` reads fixes as JSON lines from a local socket and/or a
+file that another process appends to, groups them into micro-batches and
+scores each batch once with ``TrackScorer.score_batch``. Scored fixes go
+into a ``FixBuffer`` ring buffer that the dashboard polls for rows it has
+not seen yet, so a refresh only touches new data.
+
+    python -m src.ingest --port 8765 --file data/live/live_feed.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.scoring import TrackScorer
+
+
+FIX_FIELDS = ["agent_id", "timestamp", "latitude", "longitude", "sensor_confidence",
+              "object_type", "terrain", "visibility"]
+NUMERIC_FIELDS = ["latitude", "longitude", "sensor_confidence"]
+
+
+class FixBuffer:
+    """
+    Fixed-size ring buffer of the most recent scored fixes.
+
+    Every appended row gets a sequence number; ``since(seq)`` returns the
+    rows appended after ``seq`` that are still buffered. Safe to append
+    from the ingestion thread while the dashboard reads.
+    """
+
+    NUMERIC = ["latitude", "longitude", "lat_kalman", "lon_kalman", "speed_m_s",
+               "angle_change", "sensor_confidence", "threat_score"]
+    TEXT = ["agent_id", "object_type", "terrain", "visibility"]
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity or config.INGEST_BUFFER_ROWS
+        self.t_ns = np.zeros(self.capacity, dtype=np.int64)
+        self.numeric = np.zeros((len(self.NUMERIC), self.capacity))
+        self.text = np.empty((len(self.TEXT), self.capacity), dtype=object)
+        self.seq = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.seq, self.capacity)
+
+    def append(self, scored):
+        """Adds scored fixes; the oldest rows are overwritten when full."""
+        n = len(scored)
+        if n == 0:
+            return self.seq
+        scored = scored.iloc[-self.capacity:]
+        skipped = n - len(scored)
+
+        t_ns = pd.to_datetime(scored["timestamp"]).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        numeric = np.vstack([scored[name].to_numpy(dtype=float) for name in self.NUMERIC])
+        text = np.vstack([scored[name].astype(str).to_numpy(dtype=object) for name in self.TEXT])
+
+        with self._lock:
+            pos = (self.seq + skipped + np.arange(len(scored))) % self.capacity
+            self.t_ns[pos] = t_ns
+            self.numeric[:, pos] = numeric
+            self.text[:, pos] = text
+            self.seq += n
+            return self.seq
+
+    def since(self, seq=0):
+        """Returns (rows appended after ``seq`` in arrival order, current seq)."""
+        with self._lock:
+            start = max(seq, self.seq - self.capacity)
+            pos = np.arange(start, self.seq) % self.capacity
+            data = {"timestamp": self.t_ns[pos].view("datetime64[ns]")}
+            data.update({name: self.text[i, pos] for i, name in enumerate(self.TEXT)})
+            data.update({name: self.numeric[i, pos] for i, name in enumerate(self.NUMERIC)})
+            return pd.DataFrame(data), self.seq
+
+    def latest_tracks(self):
+        """Last buffered fix of every agent."""
+        rows, _ = self.since(0)
+        return rows.drop_duplicates("agent_id", keep="last").reset_index(drop=True)
+
+
+def parse_fix(line):
+    """One fix from a JSON line, or None if the line is not a valid fix."""
+    try:
+        fix = json.loads(line)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(fix, dict) or any(field not in fix for field in FIX_FIELDS):
+        return None
+    for field in NUMERIC_FIELDS:
+        value = fix[field]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return None
+    try:
+        if pd.isna(pd.Timestamp(fix["timestamp"])):
+            return None
+    except (TypeError, ValueError):
+        return None
+    return fix
+
+
+class IngestService:
+    """
+    Micro-batching scorer for a live feed.
+
+    A batch is scored when it reaches ``batch_rows`` fixes or when its
+    oldest fix has waited ``max_delay_s``, whichever comes first. A batch
+    that fails to score is counted in ``failed_batches``, its error kept in
+    ``error``, and the service moves on to the next one.
+    """
+
+    def __init__(self, scorer=None, buffer=None, batch_rows=None, max_delay_s=None, tiles=None,
+                 tiles_path=None):
+        self.scorer = scorer if scorer is not None else TrackScorer()
+        self.buffer = buffer if buffer is not None else FixBuffer()
+        # Optional heatmap_tiles.TileStore that keeps every scored fix
+        # after it has left the ring buffer. It is trimmed to
+        # HEATMAP_RETENTION_H and saved every HEATMAP_SAVE_S and on stop().
+        self.tiles = tiles
+        self.tiles_path = tiles_path if tiles_path is not None else config.heatmap_tiles_dir()
+        self._tiles_saved = time.monotonic()
+        # Newest fix time scored so far; retention and the dashboard's
+        # heatmap window count back from it rather than the wall clock
+        self.latest_t = None
+        self.batch_rows = batch_rows or config.INGEST_BATCH_ROWS
+        self.max_delay_s = max_delay_s if max_delay_s is not None else config.INGEST_MAX_DELAY_S
+        self.received = 0
+        self.rejected = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self._queue = None
+        self._loop = None
+        self._stopping = None
+        self._thread = None
+        self._ready = threading.Event()
+        self.address = None
+        self.error = None
+
+    # ---- producers ----
+    def submit(self, line):
+        """Queues one raw line; call from the service's event loop."""
+        fix = parse_fix(line)
+        if fix is None:
+            self.rejected += 1
+            return
+        try:
+            self._queue.put_nowait(fix)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return
+        self.received += 1
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while not reader.at_eof():
+                line = await reader.readline()
+                if line.strip():
+                    self.submit(line)
+        finally:
+            writer.close()
+
+    async def follow_file(self, path, poll_s=0.05, from_start=False):
+        """
+        Feeds lines appended to ``path``, like ``tail -f``.
+
+        Lines already in the file are skipped unless ``from_start``, so a
+        restart does not score the feed (and count it into the tiles) again;
+        a file that only appears later is read from its start.
+        """
+        path = Path(path)
+        existed = path.exists()
+        while not path.exists():
+            await asyncio.sleep(poll_s)
+        with open(path) as f:
+            if existed and not from_start:
+                f.seek(0, 2)
+            partial = ""
+            while True:
+                chunk = f.read()
+                if not chunk:
+                    await asyncio.sleep(poll_s)
+                    continue
+                lines = (partial + chunk).split("\n")
+                partial = lines.pop()
+                for line in lines:
+                    if line.strip():
+                        self.submit(line)
+
+    # ---- consumer ----
+    async def _batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay_s
+            while len(batch) < self.batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Drain what is already queued without waiting
+            while len(batch) < self.batch_rows and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Scoring runs off the loop so sockets keep being read meanwhile
+            try:
+                await loop.run_in_executor(None, self._score, batch)
+            except Exception as e:
+                self.failed_batches += 1
+                self.error = e
+
+    def _score(self, batch):
+        fixes = pd.DataFrame(batch)
+        fixes["timestamp"] = pd.to_datetime(fixes["timestamp"])
+        scored = self.scorer.score_batch(fixes)
+        self.buffer.append(scored)
+        self.batches += 1
+        latest = scored["timestamp"].max()
+        self.latest_t = latest if self.latest_t is None else max(self.latest_t, latest)
+        if self.tiles is not None:
+            self.tiles.add(scored["lat_kalman"], scored["lon_kalman"], scored["timestamp"],
+                           scored["threat_score"])
+            if time.monotonic() - self._tiles_saved >= config.HEATMAP_SAVE_S:
+                self.save_tiles()
+
+    def save_tiles(self):
+        """Drops tile buckets older than the retention window, then saves the tiles."""
+        if self.tiles is None:
+            return
+        if self.latest_t is not None:
+            self.tiles.drop_before(self.latest_t - pd.Timedelta(hours=config.HEATMAP_RETENTION_H))
+        self.tiles.save(self.tiles_path)
+        self._tiles_saved = time.monotonic()
+
+    async def serve(self, host=None, port=None, path=None):
+        """Runs until ``stop()``: a socket server, a file follower, or both."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=config.INGEST_QUEUE_ROWS)
+        self._stopping = asyncio.Event()
+
+        tasks = [asyncio.create_task(self._batches())]
+        server = None
+        if port is not None:
+            server = await asyncio.start_server(self._handle_client, host or config.INGEST_HOST, port)
+            self.address = server.sockets[0].getsockname()[:2]
+        if path is not None:
+            tasks.append(asyncio.create_task(self.follow_file(path)))
+            # Let the follower find the end of the file before start() returns
+            await asyncio.sleep(0)
+        self._ready.set()
+        try:
+            await self._stopping.wait()
+        finally:
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ---- background thread ----
+    def start(self, host=None, port=None, path=None):
+        """Runs ``serve`` on its own event loop in a daemon thread."""
+        def run():
+            try:
+                asyncio.run(self.serve(host, port, path))
+            except Exception as e:
+                self.error = e
+                self._ready.set()
+
+        self._thread = threading.Thread(target=run, daemon=True, name="ingest")
+        self._thread.start()
+        self._ready.wait()
+        if self.error is not None:
+            raise RuntimeError(f"Ingestion service failed to start: {self.error}") from self.error
+        return self
+
+    def stop(self, timeout=5.0):
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.save_tiles()
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "buffered": len(self.buffer),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a live feed of JSON-lines sensor fixes")
+    parser.add_argument("--host", default=config.INGEST_HOST)
+    parser.add_argument("--port", type=int, default=config.INGEST_PORT)
+    parser.add_argument("--file", help="also follow fixes appended to this file")
+    args = parser.parse_args()
+
+    service = IngestService().start(args.host, args.port, args.file)
+    print(f"Listening on {args.host}:{args.port}" + (f", following {args.file}" if args.file else ""))
+    try:
+        while True:
+            time.sleep(5)
+            print(service.stats())
+    except KeyboardInterrupt:
+        service.stop()
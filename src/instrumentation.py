@@ -0,0 +1,254 @@
+"""
+Stage timers, row counters and memory sampling for the pipeline.
+
+Disabled unless ``config.instrumentation_enabled()`` (``BORDER_INSTRUMENT=1``).
+While disabled, ``timer`` returns a shared no-op context manager and
+``count`` returns at once, so the hooks can stay on hot paths.
+
+    with instrumentation.timer("kalman", rows=len(df)):
+        df = apply_kalman_filter(df)
+
+    @instrumentation.timed("final_fit")
+    def fit(...): ...
+
+    instrumentation.export()   # Prometheus text file or JSON lines
+
+Each timed stage records its calls, total and longest wall time, rows and
+the process's peak RSS when it finished. Setting ``BORDER_PROFILE_STAGE``
+to a stage name also captures a cProfile (or pyinstrument) profile of that
+stage under ``config.profiles_dir()``.
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src import config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_enabled = config.instrumentation_enabled()
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+
+
+def configure(enabled=None):
+    """Turns instrumentation on or off for this process, e.g. from tests."""
+    global _enabled
+    _enabled = config.instrumentation_enabled() if enabled is None else bool(enabled)
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def peak_rss_mb():
+    """High-water mark of this process's resident memory, in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024.0
+
+
+class _NullTimer:
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Profile:
+    """cProfile or pyinstrument capture of one stage."""
+
+    def __init__(self, stage, profiler):
+        self.stage = stage
+        self.kind = profiler
+        if profiler == "pyinstrument":
+            from pyinstrument import Profiler
+
+            self.profiler = Profiler()
+        else:
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+
+    def start(self):
+        if self.kind == "pyinstrument":
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        out_dir = Path(config.profiles_dir())
+        out_dir.mkdir(parents=True, exist_ok=True)
+        if self.kind == "pyinstrument":
+            self.profiler.stop()
+            path = out_dir / f"{self.stage}.html"
+            path.write_text(self.profiler.output_html())
+        else:
+            self.profiler.disable()
+            path = out_dir / f"{self.stage}.prof"
+            self.profiler.dump_stats(path)
+        return path
+
+
+class _Timer:
+    __slots__ = ("name", "rows", "start", "profile")
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+        self.profile = None
+
+    def __enter__(self):
+        stage, profiler = config.profile_stage()
+        if stage == self.name:
+            self.profile = _Profile(self.name, profiler)
+            self.profile.start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.profile is not None:
+            self.profile.stop()
+        _record(self.name, elapsed, self.rows)
+        return False
+
+
+def _record(name, elapsed, rows):
+    peak = peak_rss_mb()
+    with _lock:
+        stage = _stages.setdefault(
+            name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "rows": 0, "peak_rss_mb": None}
+        )
+        stage["calls"] += 1
+        stage["seconds"] += elapsed
+        stage["max_seconds"] = max(stage["max_seconds"], elapsed)
+        if rows is not None:
+            stage["rows"] += int(rows)
+        stage["peak_rss_mb"] = peak
+
+
+def timer(name, rows=None):
+    """
+    Context manager timing a stage. ``rows`` (or ``.rows`` set inside the
+    block) is added to the stage's row count.
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name, rows)
+
+
+def timed(name=None):
+    """Decorator form of ``timer``; the stage defaults to the function name."""
+    def decorate(func):
+        stage = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Timer(stage, None):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def count(name, n=1):
+    """Adds ``n`` to a counter."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def snapshot():
+    """Copy of everything recorded so far."""
+    with _lock:
+        return {
+            "stages": {name: dict(stage) for name, stage in _stages.items()},
+            "counters": dict(_counters),
+        }
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text(data=None):
+    """Recorded metrics in the Prometheus text exposition format."""
+    data = data or snapshot()
+    stage_metrics = [
+        ("border_stage_calls_total", "counter", "calls", "Times the stage ran"),
+        ("border_stage_seconds_total", "counter", "seconds", "Wall time spent in the stage"),
+        ("border_stage_max_seconds", "gauge", "max_seconds", "Longest single run of the stage"),
+        ("border_stage_rows_total", "counter", "rows", "Rows processed by the stage"),
+        ("border_stage_peak_rss_megabytes", "gauge", "peak_rss_mb",
+         "Process peak RSS when the stage finished"),
+    ]
+    lines = []
+    for metric, kind, key, help_text in stage_metrics:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for name, stage in sorted(data["stages"].items()):
+            if stage[key] is not None:
+                lines.append(f'{metric}{{stage="{_label(name)}"}} {stage[key]}')
+    if data["counters"]:
+        lines += ["# HELP border_events_total Pipeline event counters",
+                  "# TYPE border_events_total counter"]
+        for name, value in sorted(data["counters"].items()):
+            lines.append(f'border_events_total{{name="{_label(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def export(path=None, fmt=None):
+    """
+    Writes the recorded metrics; does nothing while disabled.
+
+    "prometheus" replaces the file atomically, so a node-exporter textfile
+    collector never reads it half-written. "jsonl" appends one line per
+    export.
+    """
+    if not _enabled:
+        return None
+    fmt = fmt or config.metrics_format()
+    if path is None:
+        path = config.metrics_path("metrics.jsonl" if fmt == "jsonl" else "metrics.prom")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = snapshot()
+    if fmt == "jsonl":
+        record = {"time": datetime.now(timezone.utc).isoformat(), "pid": os.getpid(), **data}
+        with open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    elif fmt == "prometheus":
+        tmp = path.with_name(f".{path.name}.{os.getpid()}")
+        tmp.write_text(prometheus_text(data))
+        os.replace(tmp, path)
+    else:
+        raise ValueError(f"Unknown metrics format {fmt!r}; use 'prometheus' or 'jsonl'")
+    return path
@@ -1,11 +1,345 @@
 import numpy as np
 import pandas as pd
 
+from src import config
 
-def apply_kalman_filter(df):
+
+# Noise matrices of the constant velocity model
+MEASUREMENT_NOISE = 0.0001   # GPS noise
+PROCESS_NOISE = 0.00001      # Process noise
+INITIAL_COVARIANCE = 0.01
+
+# Adaptive noise (config.KALMAN_ADAPTIVE): position error of a fix with
+# sensor_confidence 0, shrinking linearly to MIN_SENSOR_NOISE_M at 1
+SENSOR_NOISE_M = 50.0
+MIN_SENSOR_NOISE_M = 1.0
+# Confidence assumed for fixes that do not report one
+DEFAULT_CONFIDENCE = 0.5
+# Standard deviation of the unmodelled acceleration
+ACCELERATION_NOISE_M_S2 = 1.0
+METRES_PER_DEGREE = 111_320.0
+
+
+def apply_kalman_filter(df, adaptive=None, smooth=None):
     """
     Applies Kalman filter to latitude & longitude per agent.
     Assumes constant velocity model.
+
+    All agents are filtered together: rows are ordered by agent and time,
+    and every step of the filter updates all agents that still have a fix
+    at that step in one set of array operations.
+
+    With ``adaptive`` (default ``config.KALMAN_ADAPTIVE``) the filter steps
+    by each fix's real time gap and weighs it by its sensor_confidence;
+    with ``smooth`` (default ``config.KALMAN_RTS``) a backward RTS pass
+    smooths every fix with the fixes after it.
+    """
+    adaptive = config.KALMAN_ADAPTIVE if adaptive is None else adaptive
+    smooth = config.KALMAN_RTS if smooth is None else smooth
+
+    df = df.copy()
+    df["lat_kalman"] = df["latitude"]
+    df["lon_kalman"] = df["longitude"]
+
+    codes, _ = pd.factorize(df["agent_id"])
+    valid = codes >= 0
+    if not valid.any():
+        return df
+
+    keys = pd.DataFrame({"agent": codes, "timestamp": df["timestamp"].to_numpy()})
+    keys = keys[valid]
+    order = keys.sort_values(["agent", "timestamp"], kind="stable").index.to_numpy()
+
+    lat = df["latitude"].to_numpy(dtype=float)
+    lon = df["longitude"].to_numpy(dtype=float)
+    starts, lengths = track_bounds(codes[order])
+
+    noise = {}
+    if adaptive:
+        t_ns = pd.to_datetime(df["timestamp"]).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        confidence = (df["sensor_confidence"].to_numpy(dtype=float)
+                      if "sensor_confidence" in df.columns else None)
+        noise = adaptive_noise(lat[order], t_ns[order], starts, lengths,
+                               None if confidence is None else confidence[order])
+
+    lat_k, lon_k, _, _ = kalman_smooth(lat[order], lon[order], starts, lengths, rts=smooth, **noise)
+
+    lat_out = lat.copy()
+    lon_out = lon.copy()
+    lat_out[order] = lat_k
+    lon_out[order] = lon_k
+    df["lat_kalman"] = lat_out
+    df["lon_kalman"] = lon_out
+
+    return df
+
+
+def track_bounds(sorted_codes):
+    """
+    Returns start offsets and lengths of the contiguous agent blocks in an
+    array of agent codes that is already grouped by agent.
+    """
+    sorted_codes = np.asarray(sorted_codes)
+    if len(sorted_codes) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    lengths = np.diff(np.r_[starts, len(sorted_codes)])
+    return starts, lengths
+
+
+def initial_state(lat, lon):
+    """
+    State [lat, lon, v_lat, v_lon] and covariance for tracks starting at
+    the given first fixes.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+
+    x = np.zeros((len(lat), 4))
+    x[:, 0] = lat
+    x[:, 1] = lon
+    P = np.broadcast_to(np.eye(4) * INITIAL_COVARIANCE, (len(lat), 4, 4)).copy()
+    return x, P
+
+
+def _degree_variance(lat, metres):
+    """(n, 2) variances in degrees of lat and lon for a spread in metres."""
+    lat_m = metres / METRES_PER_DEGREE
+    lon_m = lat_m / np.cos(np.radians(lat))
+    return np.stack([lat_m ** 2, lon_m ** 2], axis=1)
+
+
+def adaptive_noise(lat, t_ns, starts, lengths, confidence=None, prev_t_ns=None):
+    """
+    Per-fix time steps and noise for ``kalman_smooth``, from the fixes'
+    timestamps and sensor confidence.
+
+    Args:
+        lat, t_ns: fixes grouped by track and ordered in time
+        starts, lengths: offset and number of rows of each track
+        confidence: sensor_confidence of every fix; NaN or None for unknown
+        prev_t_ns: timestamp of each track's fix before these rows, for
+            tracks that continue; None (or NaN) for tracks that start here
+
+    Returns:
+        dict of ``dt``, ``measurement_noise`` and ``process_noise`` arrays
+    """
+    lat = np.asarray(lat, dtype=float)
+    t_ns = np.asarray(t_ns, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+
+    dt = np.r_[0.0, np.diff(t_ns) / 1e9]
+    first_dt = np.zeros(len(starts))
+    if prev_t_ns is not None:
+        prev = np.asarray(prev_t_ns, dtype=float)
+        has_prev = ~np.isnan(prev)
+        first_dt[has_prev] = (t_ns[starts[has_prev]] - prev[has_prev]) / 1e9
+    dt[starts] = first_dt
+    dt = np.maximum(dt, 0.0)
+
+    if confidence is None:
+        confidence = np.full(len(lat), DEFAULT_CONFIDENCE)
+    confidence = np.clip(np.nan_to_num(np.asarray(confidence, dtype=float), nan=DEFAULT_CONFIDENCE),
+                         0.0, 1.0)
+    sigma_m = np.maximum(SENSOR_NOISE_M * (1.0 - confidence), MIN_SENSOR_NOISE_M)
+
+    return {
+        "dt": dt,
+        "measurement_noise": _degree_variance(lat, sigma_m),
+        "process_noise": _degree_variance(lat, np.full(len(lat), ACCELERATION_NOISE_M_S2)),
+    }
+
+
+def _rows(values, rows):
+    """Per-row noise or time step for the given rows; scalars pass through."""
+    return values if np.ndim(values) == 0 else values[rows]
+
+
+def kalman_smooth(lat, lon, starts, lengths, x0=None, P0=None, dt=None,
+                  measurement_noise=MEASUREMENT_NOISE, process_noise=PROCESS_NOISE, rts=False):
+    """
+    Runs the constant velocity filter over many tracks at once.
+
+    Args:
+        lat, lon: measurements, grouped by track and ordered in time
+        starts, lengths: offset and number of rows of each track
+        x0, P0: optional state (n_tracks, 4) and covariance (n_tracks, 4, 4)
+            to continue from. Tracks start from their first fix otherwise.
+        dt: optional seconds from each row's previous fix (see
+            ``adaptive_noise``); one step per fix without it
+        measurement_noise, process_noise: scalars, or per row as in
+            ``kalman_step``
+        rts: run the backward Rauch-Tung-Striebel pass, so every fix is
+            smoothed with the whole track and not only the fixes before it
+
+    Returns:
+        (lat_kalman, lon_kalman, x, P) where x and P are the final state and
+        covariance of every track, in the order of ``starts``.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    n_tracks = len(starts)
+
+    if x0 is None:
+        x0, P0 = initial_state(lat[starts], lon[starts])
+
+    lat_out = np.empty_like(lat)
+    lon_out = np.empty_like(lon)
+    if n_tracks == 0:
+        return lat_out, lon_out, np.zeros((0, 4)), np.zeros((0, 4, 4))
+
+    # Longest tracks first, so the tracks alive at step k are a prefix
+    by_length = np.argsort(-lengths, kind="stable")
+    s = starts[by_length]
+    n_alive = np.searchsorted(-lengths[by_length], -np.arange(lengths.max()), side="left")
+
+    x = np.array(x0, dtype=float)[by_length]
+    P = np.array(P0, dtype=float)[by_length]
+    if rts:
+        # Predicted and filtered moments of every row, for the backward pass
+        xp_all, Pp_all = np.empty((len(lat), 4)), np.empty((len(lat), 4, 4))
+        xf_all, Pf_all = np.empty((len(lat), 4)), np.empty((len(lat), 4, 4))
+
+    for k, n in enumerate(n_alive):
+        rows = s[:n] + k
+        step_dt = None if dt is None else dt[rows]
+        xp, Pp = kalman_predict(x[:n], P[:n], _rows(process_noise, rows), step_dt)
+        x[:n], P[:n] = kalman_update(xp, Pp, lat[rows], lon[rows], _rows(measurement_noise, rows))
+        if rts:
+            xp_all[rows], Pp_all[rows] = xp, Pp
+            xf_all[rows], Pf_all[rows] = x[:n], P[:n]
+        lat_out[rows] = x[:n, 0]
+        lon_out[rows] = x[:n, 1]
+
+    if rts:
+        xs = xf_all
+        for k in range(len(n_alive) - 2, -1, -1):
+            # Tracks with a fix after step k
+            rows = s[:n_alive[k + 1]] + k
+            nxt = rows + 1
+            F = _transition(len(rows), None if dt is None else dt[nxt])
+            # C = P_f F^T Pp^-1, solved as Pp^T C^T = F P_f^T
+            C = np.linalg.solve(np.swapaxes(Pp_all[nxt], 1, 2),
+                                F @ np.swapaxes(Pf_all[rows], 1, 2))
+            C = np.swapaxes(C, 1, 2)
+            xs[rows] = xf_all[rows] + (C @ (xs[nxt] - xp_all[nxt])[:, :, None])[:, :, 0]
+        lat_out, lon_out = xs[:, 0].copy(), xs[:, 1].copy()
+
+    unsort = np.empty_like(by_length)
+    unsort[by_length] = np.arange(n_tracks)
+    return lat_out, lon_out, x[unsort], P[unsort]
+
+
+def kalman_step(x, P, lat, lon, process_noise=PROCESS_NOISE, measurement_noise=MEASUREMENT_NOISE,
+                dt=None):
+    """
+    One predict/update step of the constant velocity filter for n tracks.
+
+    Args:
+        x: states (n, 4) as [lat, lon, v_lat, v_lon]
+        P: covariances (n, 4, 4)
+        lat, lon: the new measurement of every track
+        process_noise, measurement_noise: variances of Q and R, as scalars
+            or per track, either (n,) or (n, 2) for lat and lon
+        dt: optional seconds since each track's last fix; see ``kalman_predict``
+
+    Returns:
+        (x, P) after the update. Inputs are not modified.
+    """
+    xp, Pp = kalman_predict(x, P, process_noise, dt)
+    return kalman_update(xp, Pp, lat, lon, measurement_noise)
+
+
+def _axis_noise(noise):
+    """Splits a scalar, (n,) or (n, 2) variance into its lat and lon parts."""
+    noise = np.asarray(noise, dtype=float)
+    if noise.ndim == 2:
+        return noise[:, 0], noise[:, 1]
+    return noise, noise
+
+
+def _transition(n, dt=None):
+    """Transition matrices for n tracks; a unit step without ``dt``."""
+    F = np.eye(4)
+    if dt is None:
+        F[0, 2] = 1
+        F[1, 3] = 1
+        return F
+    F = np.broadcast_to(F, (n, 4, 4)).copy()
+    F[:, 0, 2] = dt
+    F[:, 1, 3] = dt
+    return F
+
+
+def kalman_predict(x, P, process_noise=PROCESS_NOISE, dt=None):
+    """
+    Predicts states (n, 4) and covariances (n, 4, 4) one step ahead.
+
+    Without ``dt`` a step is one fix and Q is ``process_noise`` times the
+    identity. With ``dt`` (seconds, per track) velocities are per second,
+    and Q is the white-noise acceleration model with ``process_noise`` as
+    the acceleration variance, so uncertainty grows with the gap.
+    """
+    if dt is None:
+        # Transition matrix
+        F = _transition(len(x))
+        Q = np.eye(4) * process_noise
+        return x @ F.T, F @ P @ F.T + Q
+
+    # F = I + dt E with E moving velocity into position, so F P F^T is
+    # two row/column additions instead of batched matrix products
+    dt = np.asarray(dt, dtype=float)
+    xp = x.copy()
+    xp[:, :2] += dt[:, None] * x[:, 2:]
+    Pp = P.copy()
+    Pp[:, :2, :] += dt[:, None, None] * P[:, 2:, :]
+    Pp[:, :, :2] += dt[:, None, None] * Pp[:, :, 2:]
+
+    q_lat, q_lon = _axis_noise(process_noise)
+    for pos, vel, q in ((0, 2, q_lat), (1, 3, q_lon)):
+        Pp[:, pos, pos] += q * dt ** 4 / 4
+        Pp[:, pos, vel] += q * dt ** 3 / 2
+        Pp[:, vel, pos] += q * dt ** 3 / 2
+        Pp[:, vel, vel] += q * dt ** 2
+    return xp, Pp
+
+
+def kalman_update(xp, Pp, lat, lon, measurement_noise=MEASUREMENT_NOISE):
+    """Updates predicted states and covariances with one measurement each."""
+    r_lat, r_lon = _axis_noise(measurement_noise)
+    # Update, with the 2x2 innovation covariance inverted in closed form
+    s00 = Pp[:, 0, 0] + r_lat
+    s01 = Pp[:, 0, 1]
+    s10 = Pp[:, 1, 0]
+    s11 = Pp[:, 1, 1] + r_lon
+    det = s00 * s11 - s01 * s10
+
+    y0 = lat - xp[:, 0]
+    y1 = lon - xp[:, 1]
+    # S^-1 y, then x = xp + P H^T S^-1 y
+    w0 = (s11 * y0 - s01 * y1) / det
+    w1 = (s00 * y1 - s10 * y0) / det
+    x = xp + Pp[:, :, 0] * w0[:, None] + Pp[:, :, 1] * w1[:, None]
+
+    # K = P H^T S^-1, P = (I - K H) P
+    inv = np.empty((len(det), 2, 2))
+    inv[:, 0, 0] = s11 / det
+    inv[:, 0, 1] = -s01 / det
+    inv[:, 1, 0] = -s10 / det
+    inv[:, 1, 1] = s00 / det
+    K = Pp[:, :, :2] @ inv
+    P = Pp - K @ Pp[:, :2, :]
+
+    return x, P
+
+
+def apply_kalman_filter_reference(df):
+    """
+    Per-row implementation of ``apply_kalman_filter``.
+    Kept as the correctness and speed reference for the batched filter.
     """
 
     df = df.copy()
@@ -24,7 +358,7 @@ def apply_kalman_filter(df):
         ])
 
         # Covariance
-        P = np.eye(4) * 0.01
+        P = np.eye(4) * INITIAL_COVARIANCE
 
         # Transition matrix
         F = np.eye(4)
@@ -38,8 +372,8 @@ def apply_kalman_filter(df):
         ])
 
         # Noise matrices
-        R = np.eye(2) * 0.0001   # GPS noise
-        Q = np.eye(4) * 0.00001  # Process noise
+        R = np.eye(2) * MEASUREMENT_NOISE
+        Q = np.eye(4) * PROCESS_NOISE
 
         for idx in group.index:
             z = np.array([
@@ -0,0 +1,150 @@
+"""
+Folium layers for the surveillance map.
+
+The map is split into a static base (tiles, border, warning zones and
+legend) that only depends on the map style, and one track layer built from
+column arrays as a single GeoJSON layer. The dashboard caches the base map
+and hands the track layer to ``st_folium(feature_group_to_add=...)``, so a
+filter change only re-sends the tracks. The heatmap comes either from the
+rows on screen or from pre-aggregated ``heatmap_tiles`` cells, one weighted
+point per cell.
+"""
+
+import folium
+import numpy as np
+from folium.plugins import HeatMap
+
+from src import config
+
+
+TILES = {
+    "Dark Tactical": "CartoDB dark_matter",
+    "Satellite": "Esri.WorldImagery",
+}
+MAP_CENTER = [23.8, 68.7]
+INTRUDER_COLOR = "#FF0000"
+NORMAL_COLOR = "#00FF00"
+# Only tracks above this score feed the heatmap, to keep it clean
+HEAT_MIN_SCORE = config.HEATMAP_HOT_SCORE
+
+LEGEND_HTML = '''
+     <div style="position: fixed;
+     bottom: 50px; left: 50px; width: 200px; height: 170px;
+     background-color: rgba(14, 17, 23, 0.9); z-index:9999; font-size:14px;
+     color: white; border:1px solid #3e4451; border-radius:8px; padding: 12px;
+     font-family: sans-serif;">
+     <b style="color:#FF4B4B">Tactical Legend</b><br>
+     <hr style="margin: 5px 0; border-color: #3e4451;">
+     <span style="color:#FF4B4B"><b>--</b></span> Border Line<br>
+     <span style="color:#FFFF00"><b>--</b></span> Warning Zone<br>
+     <span style="color:#FF0000">●</span> Intruder (Confirmed)<br>
+     <span style="color:#00FF00">●</span> Normal Activity<br>
+     <span style="color:orange">🔥</span> Threat Density
+     </div>
+     '''
+
+
+def base_map(map_style="Dark Tactical", location=None, zoom_start=11):
+    """Map with the tiles, geofences and legend; nothing here depends on the tracks."""
+    m = folium.Map(location=location or MAP_CENTER, zoom_start=zoom_start,
+                   tiles=TILES.get(map_style, map_style))
+
+    # The Warning Zone (Yellow)
+    for warning_zone in config.WARNING_ZONES:
+        folium.Polygon(
+            locations=warning_zone,
+            color="#FFFF00",
+            weight=2,
+            fill=True,
+            fill_opacity=0.2,
+            opacity=0.3,
+            tooltip="Warning Zone: Entry Detected",
+        ).add_to(m)
+
+    # The Main Border (Red)
+    for border_line in config.BORDER_LINES:
+        folium.PolyLine(
+            locations=border_line,
+            color="#FF4B4B",
+            weight=6,
+            opacity=0.9,
+            dash_array="10, 10",
+            tooltip="International Border (RESTRICTED)",
+        ).add_to(m)
+
+    m.get_root().html.add_child(folium.Element(LEGEND_HTML))
+    return m
+
+
+def tracks_geojson(df):
+    """
+    GeoJSON FeatureCollection of track points, built column-wise from
+    track_id, lat, lon, object_type, threat_score, is_intruder,
+    dist_to_border_m and in_warning_zone.
+    """
+    intruder = df["is_intruder"].to_numpy() == 1
+    properties = {
+        "track_id": df["track_id"].astype(str).tolist(),
+        "object_type": df["object_type"].astype(str).tolist(),
+        "threat_score": np.round(df["threat_score"].to_numpy(dtype=float), 2).tolist(),
+        "status": np.where(intruder, "⚠️ INTRUDER", "✅ NORMAL").tolist(),
+        "border_m": np.round(df["dist_to_border_m"].to_numpy(dtype=float)).astype(int).tolist(),
+        "warning_zone": np.where(df["in_warning_zone"].to_numpy(dtype=bool), "YES", "no").tolist(),
+        "color": np.where(intruder, INTRUDER_COLOR, NORMAL_COLOR).tolist(),
+    }
+    coordinates = np.column_stack([df["lon"].to_numpy(dtype=float),
+                                   df["lat"].to_numpy(dtype=float)]).tolist()
+
+    names = list(properties)
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": xy},
+            "properties": dict(zip(names, values)),
+        }
+        for xy, *values in zip(coordinates, *properties.values())
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _track_style(feature):
+    color = feature["properties"]["color"]
+    return {"color": color, "fillColor": color, "fillOpacity": 0.8}
+
+
+def heat_points(cells):
+    """[lat, lon, weight] per ``TileStore.query`` cell, weighted by hot fixes."""
+    cells = cells[cells["hot"] > 0]
+    if not len(cells):
+        return []
+    weight = cells["hot"].to_numpy(dtype=float)
+    return np.column_stack([cells["lat"].to_numpy(), cells["lon"].to_numpy(),
+                            weight / weight.max()]).tolist()
+
+
+def track_layer(df, name="Tracks", heat_cells=None):
+    """
+    Feature group with every track as one GeoJSON layer plus the threat
+    heatmap, from ``heat_cells`` (tile cells) when given, else from ``df``.
+    """
+    group = folium.FeatureGroup(name=name)
+
+    if heat_cells is not None:
+        heat = heat_points(heat_cells)
+    else:
+        heat = df.loc[df["threat_score"] > HEAT_MIN_SCORE, ["lat", "lon"]].to_numpy().tolist()
+    if len(heat):
+        HeatMap(heat, radius=15, blur=18, min_opacity=0.4).add_to(group)
+
+    if len(df):
+        folium.GeoJson(
+            tracks_geojson(df),
+            marker=folium.CircleMarker(radius=7, fill=True),
+            style_function=_track_style,
+            popup=folium.GeoJsonPopup(
+                fields=["track_id", "object_type", "threat_score", "border_m", "warning_zone", "status"],
+                aliases=["Track ID", "Type", "Threat Score", "Border Distance (m)", "Warning Zone",
+                         "Status"],
+            ),
+        ).add_to(group)
+    return group
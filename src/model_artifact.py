@@ -0,0 +1,189 @@
+"""
+Directory format for the trained model.
+
+``save_artifact`` writes a compiled forest as a directory:
+
+    border_intruder_model/
+        manifest.json   format version, sklearn version, metrics, data
+                        windows, feature importances, array index
+        schema.json     input columns with their kind and dtype, classes
+        encoders.json   scaler mean/scale and one-hot vocabularies
+        feature.npy  threshold.npy  children.npy  value.npy  roots.npy
+
+The tree arrays are stored in the dtypes the tree walk uses, so
+``load_artifact`` memory-maps them and hands them to ``CompiledForest``
+without a copy. Loading needs only NumPy and JSON, never sklearn, and
+every process serving the same artifact shares one copy of the trees
+through the page cache.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from src import config
+from src.compiled_model import CompiledForest, compile_pipeline
+from src.schema import SCHEMA
+
+FORMAT_VERSION = 1
+ARRAYS = ["feature", "threshold", "children", "value", "roots"]
+
+
+def _write_json(data, path):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def encoded_feature_names(compiled):
+    """Model-matrix column names, ``<feature>_<category>`` for one-hot columns."""
+    names = list(compiled.numeric_features)
+    for feature, cats in zip(compiled.categorical_features, compiled.categories):
+        names.extend(f"{feature}_{c}" for c in cats)
+    return names
+
+
+def input_importances(compiled, importances):
+    """Sums model-matrix importances back onto the input columns."""
+    importances = np.asarray(importances, dtype=float)
+    n_numeric = len(compiled.numeric_features)
+    out = dict(zip(compiled.numeric_features, importances[:n_numeric].tolist()))
+    offset = n_numeric
+    for feature, cats in zip(compiled.categorical_features, compiled.categories):
+        out[feature] = float(importances[offset:offset + len(cats)].sum())
+        offset += len(cats)
+    return out
+
+
+def feature_importances(model):
+    """
+    Importance of each input column for a loaded model: read from the
+    artifact manifest, or computed from a fitted pipeline. None for a bare
+    compiled model, which does not record them.
+    """
+    manifest = getattr(model, "manifest", None)
+    if manifest is not None:
+        return manifest["feature_importances"]
+    if hasattr(model, "named_steps"):
+        return input_importances(compile_pipeline(model),
+                                 model.named_steps["classifier"].feature_importances_)
+    return None
+
+
+def save_artifact(pipeline, path=None, metrics=None, windows=None):
+    """
+    Compiles a fitted pipeline and writes it as an artifact directory.
+
+    The directory is assembled next to ``path`` and renamed into place, so
+    readers never see a half-written artifact.
+    """
+    import sklearn
+
+    path = Path(path) if path is not None else Path(config.model_artifact_dir())
+    compiled = compile_pipeline(pipeline)
+    forest = pipeline.named_steps["classifier"]
+
+    tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    arrays = {
+        "feature": compiled._feature,
+        "threshold": compiled.threshold,
+        "children": compiled._children,
+        "value": compiled.value,
+        "roots": compiled._roots,
+    }
+    for name, array in arrays.items():
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(array))
+
+    inputs = [{"name": name, "kind": "numeric", "dtype": SCHEMA.get(name, "float64")}
+              for name in compiled.numeric_features]
+    inputs += [{"name": name, "kind": "categorical", "dtype": SCHEMA.get(name, "category")}
+               for name in compiled.categorical_features]
+    _write_json({"inputs": inputs, "encoded": encoded_feature_names(compiled),
+                 "classes": compiled.classes_.tolist()}, tmp / "schema.json")
+    _write_json({
+        "numeric": {"features": compiled.numeric_features,
+                    "mean": compiled.mean.tolist(), "scale": compiled.scale.tolist()},
+        "categorical": {"features": compiled.categorical_features,
+                        "categories": compiled.categories},
+    }, tmp / "encoders.json")
+
+    importances = forest.feature_importances_
+    _write_json({
+        "format_version": FORMAT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "sklearn_version": sklearn.__version__,
+        "model": {"type": type(forest).__name__, "n_trees": len(forest.estimators_),
+                  "depth": compiled.depth, "n_nodes": int(len(compiled.threshold))},
+        "metrics": metrics or {},
+        "windows": windows or [],
+        "feature_importances": input_importances(compiled, importances),
+        "encoded_importances": dict(zip(encoded_feature_names(compiled), importances.tolist())),
+        "arrays": {name: {"dtype": str(a.dtype), "shape": list(a.shape)}
+                   for name, a in arrays.items()},
+    }, tmp / "manifest.json")
+
+    # Swap the finished directory in; the old one is removed only afterwards
+    old = path.with_name(f".{path.name}.old-{os.getpid()}")
+    if path.exists():
+        path.rename(old)
+    tmp.rename(path)
+    shutil.rmtree(old, ignore_errors=True)
+    return compiled
+
+
+def read_manifest(path=None):
+    path = Path(path) if path is not None else Path(config.model_artifact_dir())
+    return _read_json(path / "manifest.json")
+
+
+def read_input_features(path=None):
+    """(numeric, categorical) input columns recorded in an artifact's schema."""
+    path = Path(path) if path is not None else Path(config.model_artifact_dir())
+    inputs = _read_json(path / "schema.json")["inputs"]
+    return ([c["name"] for c in inputs if c["kind"] == "numeric"],
+            [c["name"] for c in inputs if c["kind"] == "categorical"])
+
+
+def artifact_exists(path=None):
+    path = Path(path) if path is not None else Path(config.model_artifact_dir())
+    return (path / "manifest.json").exists()
+
+
+def load_artifact(path=None, mmap=True):
+    """
+    Loads an artifact directory as a ``CompiledForest``.
+
+    With ``mmap`` the tree arrays are read-only memory maps of the files.
+    """
+    path = Path(path) if path is not None else Path(config.model_artifact_dir())
+    manifest_path = path / "manifest.json"
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Model artifact not found at {path}")
+    manifest = _read_json(manifest_path)
+    if manifest["format_version"] > FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact version {manifest['format_version']}")
+
+    schema = _read_json(path / "schema.json")
+    encoders = _read_json(path / "encoders.json")
+    arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r" if mmap else None)
+              for name in ARRAYS}
+
+    model = CompiledForest(
+        encoders["numeric"]["features"], encoders["numeric"]["mean"], encoders["numeric"]["scale"],
+        encoders["categorical"]["features"], encoders["categorical"]["categories"],
+        arrays["feature"], arrays["threshold"], None, None, arrays["value"], arrays["roots"],
+        manifest["model"]["depth"], schema["classes"], children=arrays["children"],
+    )
+    model.manifest = manifest
+    return model
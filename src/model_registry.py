@@ -0,0 +1,386 @@
+"""
+Versioned model serving with hot swaps and shadow scoring.
+
+Model versions are artifact directories (see ``model_artifact``) under
+``config.model_registry_dir()``, named ``v0001``, ``v0002``, ... A
+``LIVE`` file in the registry pins the version to serve; without it the
+newest version is served. ``publish`` keeps the newest
+``config.REGISTRY_KEEP_VERSIONS`` versions plus the pinned one and deletes
+the rest.
+
+``ModelRegistry`` scores with the live version and watches the registry
+from a background thread. A new version is loaded in that thread and then
+swapped in with a single reference assignment, so a batch in flight
+finishes on the model it started with and no request waits on a load.
+With ``rollout="shadow"`` a new version is not served but scored as a
+candidate next to the live model on the same batches, collecting latency
+and agreement stats until it is promoted.
+
+    python -m src.model_registry --publish models/border_intruder_model
+    python -m src.model_registry --promote v0002
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from src import config
+from src.model_artifact import artifact_exists, load_artifact
+
+VERSION_RE = re.compile(r"^v(\d+)$")
+PIN_FILE = "LIVE"
+
+
+def _root(root):
+    return Path(root) if root is not None else Path(config.model_registry_dir())
+
+
+def list_versions(root=None):
+    """Complete versions in the registry, oldest first."""
+    root = _root(root)
+    if not root.exists():
+        return []
+    found = []
+    for path in root.iterdir():
+        match = VERSION_RE.match(path.name)
+        if match and artifact_exists(path):
+            found.append((int(match.group(1)), path.name))
+    return [name for _, name in sorted(found)]
+
+
+def publish(artifact_dir=None, root=None, keep=None):
+    """
+    Copies an artifact directory into the registry as the next version,
+    then prunes it to the newest ``keep`` versions (see ``prune_versions``).
+
+    The copy is made under a hidden name and renamed into place, so a
+    watcher never sees a partial version. Returns the version name.
+    """
+    artifact_dir = Path(artifact_dir) if artifact_dir is not None else Path(config.model_artifact_dir())
+    if not artifact_exists(artifact_dir):
+        raise FileNotFoundError(f"Model artifact not found at {artifact_dir}")
+    root = _root(root)
+    root.mkdir(parents=True, exist_ok=True)
+
+    tmp = root / f".publish-{os.getpid()}-{threading.get_ident()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    shutil.copytree(artifact_dir, tmp)
+    while True:
+        versions = list_versions(root)
+        number = int(VERSION_RE.match(versions[-1]).group(1)) + 1 if versions else 1
+        version = f"v{number:04d}"
+        try:
+            # Fails if another publisher took this number first
+            tmp.rename(root / version)
+            break
+        except OSError:
+            if not (root / version).exists():
+                raise
+    prune_versions(root, keep)
+    return version
+
+
+def prune_versions(root=None, keep=None):
+    """
+    Deletes all but the newest ``keep`` versions (default
+    ``config.REGISTRY_KEEP_VERSIONS``), never the pinned one. A version is
+    renamed to a hidden name before it is deleted, so watchers never see it
+    half removed. Registries already serving a deleted version keep it in
+    memory. Returns the deleted version names.
+    """
+    root = _root(root)
+    keep = keep if keep is not None else config.REGISTRY_KEEP_VERSIONS
+    if keep < 1:
+        raise ValueError("keep must be at least 1")
+    pinned = pinned_version(root)
+    removed = []
+    for version in list_versions(root)[:-keep]:
+        if version == pinned:
+            continue
+        doomed = root / f".prune-{version}-{os.getpid()}"
+        try:
+            (root / version).rename(doomed)
+        except OSError:
+            # Another publisher pruned it first
+            continue
+        shutil.rmtree(doomed, ignore_errors=True)
+        removed.append(version)
+    return removed
+
+
+def pinned_version(root=None):
+    path = _root(root) / PIN_FILE
+    if not path.exists():
+        return None
+    return path.read_text().strip() or None
+
+
+def pin_version(version, root=None):
+    """Makes ``version`` the live version of every registry watching ``root``."""
+    root = _root(root)
+    if version not in list_versions(root):
+        raise ValueError(f"Unknown model version {version!r}")
+    tmp = root / f".{PIN_FILE}.{os.getpid()}"
+    tmp.write_text(version + "\n")
+    os.replace(tmp, root / PIN_FILE)
+
+
+class Deployment:
+    """A loaded model version."""
+
+    __slots__ = ("version", "model", "loaded_at")
+
+    def __init__(self, version, model):
+        self.version = version
+        self.model = model
+        self.loaded_at = time.time()
+
+
+class ShadowStats:
+    """Latency and agreement of a candidate against the live model."""
+
+    def __init__(self, version, window=1_000):
+        self.version = version
+        self.batches = 0
+        self.rows = 0
+        self.agreed = 0
+        self.abs_diff_sum = 0.0
+        self.max_abs_diff = 0.0
+        self.errors = 0
+        self.live_ms = deque(maxlen=window)
+        self.candidate_ms = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record(self, live_proba, candidate_proba, live_ms, candidate_ms):
+        diff = np.abs(candidate_proba[:, -1] - live_proba[:, -1])
+        agreed = int((candidate_proba.argmax(axis=1) == live_proba.argmax(axis=1)).sum())
+        with self._lock:
+            self.batches += 1
+            self.rows += len(diff)
+            self.agreed += agreed
+            self.abs_diff_sum += float(diff.sum())
+            self.max_abs_diff = max(self.max_abs_diff, float(diff.max(initial=0.0)))
+            self.live_ms.append(live_ms)
+            self.candidate_ms.append(candidate_ms)
+
+    def summary(self):
+        with self._lock:
+            def pct(values, q):
+                return float(np.percentile(values, q)) if values else None
+
+            return {
+                "version": self.version,
+                "batches": self.batches,
+                "rows": self.rows,
+                "errors": self.errors,
+                "agreement": self.agreed / self.rows if self.rows else None,
+                "mean_abs_score_diff": self.abs_diff_sum / self.rows if self.rows else None,
+                "max_abs_score_diff": self.max_abs_diff,
+                "live_p50_ms": pct(self.live_ms, 50),
+                "live_p95_ms": pct(self.live_ms, 95),
+                "candidate_p50_ms": pct(self.candidate_ms, 50),
+                "candidate_p95_ms": pct(self.candidate_ms, 95),
+            }
+
+
+class ModelRegistry:
+    """
+    Serves the live model version of a registry and follows its changes.
+
+    Quacks like a model (``predict_proba``, ``predict``), so it can be
+    passed to ``TrackScorer`` in place of one.
+
+    Args:
+        root: registry directory; ``config.model_registry_dir()`` if None
+        rollout: "auto" serves each new version as soon as it is loaded;
+            "shadow" scores it as a candidate until it is promoted
+        poll_s: how often the watcher thread rescans the registry
+    """
+
+    def __init__(self, root=None, rollout=None, poll_s=None, loader=load_artifact):
+        self.root = _root(root)
+        self.rollout = rollout or config.REGISTRY_ROLLOUT
+        if self.rollout not in ("auto", "shadow"):
+            raise ValueError(f"Unknown rollout {self.rollout!r}; use 'auto' or 'shadow'")
+        self.poll_s = poll_s if poll_s is not None else config.REGISTRY_POLL_S
+        self.loader = loader
+        self.swaps = 0
+        self.load_errors = {}
+        self._live = None
+        self._candidate = None
+        self._shadow = None
+        self._refresh_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    # ---- serving ----
+    @property
+    def live(self):
+        return self._live
+
+    @property
+    def candidate(self):
+        return self._candidate
+
+    @property
+    def version(self):
+        live = self._live
+        return live.version if live is not None else None
+
+    @property
+    def manifest(self):
+        live = self._live
+        return getattr(live.model, "manifest", None) if live is not None else None
+
+    def _current(self):
+        live = self._live
+        if live is None:
+            raise RuntimeError(f"No model version loaded from {self.root}")
+        return live
+
+    def predict_proba(self, X):
+        # Read both references once, so a swap mid-call cannot mix versions
+        live, candidate, shadow = self._current(), self._candidate, self._shadow
+        start = time.perf_counter()
+        proba = live.model.predict_proba(X)
+        live_ms = (time.perf_counter() - start) * 1e3
+
+        if candidate is not None and shadow is not None:
+            start = time.perf_counter()
+            try:
+                candidate_proba = candidate.model.predict_proba(X)
+            except Exception:
+                # A broken candidate must never fail live scoring
+                shadow.record_error()
+            else:
+                shadow.record(proba, candidate_proba, live_ms, (time.perf_counter() - start) * 1e3)
+        return proba
+
+    def predict(self, X):
+        # Scored on the live model only: callers that also ask for
+        # predict_proba would otherwise shadow-score the batch twice
+        live = self._current()
+        return live.model.classes_[np.argmax(live.model.predict_proba(X), axis=1)]
+
+    # ---- versions ----
+    def _load(self, version):
+        return Deployment(version, self.loader(self.root / version))
+
+    def refresh(self):
+        """
+        Rescans the registry and loads what changed. Returns True if the
+        live model was swapped.
+        """
+        with self._refresh_lock:
+            versions = list_versions(self.root)
+            if not versions:
+                return False
+            live = self._live
+            pinned = pinned_version(self.root)
+            if pinned in versions:
+                target = pinned
+            elif self.rollout == "auto" or live is None:
+                target = versions[-1]
+            else:
+                target = live.version
+
+            swapped = False
+            if live is None or live.version != target:
+                candidate = self._candidate
+                if candidate is not None and candidate.version == target:
+                    deployment = candidate
+                else:
+                    deployment = self._try_load(target)
+                if deployment is not None:
+                    self._live = deployment
+                    self.swaps += 1
+                    swapped = True
+
+            newest = versions[-1]
+            serving = self._live.version if self._live is not None else None
+            if self.rollout == "shadow" and newest != serving:
+                if self._candidate is None or self._candidate.version != newest:
+                    candidate = self._try_load(newest)
+                    if candidate is not None:
+                        self._shadow = ShadowStats(newest)
+                        self._candidate = candidate
+            else:
+                self._candidate = None
+            return swapped
+
+    def _try_load(self, version):
+        if version in self.load_errors:
+            return None
+        try:
+            return self._load(version)
+        except Exception as e:
+            # A version that fails to load is skipped until the registry restarts
+            self.load_errors[version] = repr(e)
+            return None
+
+    def promote(self, version=None):
+        """Pins ``version`` (default: the candidate) as live and swaps it in."""
+        if version is None:
+            if self._candidate is None:
+                raise ValueError("No candidate to promote")
+            version = self._candidate.version
+        pin_version(version, self.root)
+        self.refresh()
+
+    # ---- watcher thread ----
+    def start(self):
+        """Loads the live version, then follows the registry in a daemon thread."""
+        self.refresh()
+        self._current()
+
+        def watch():
+            while not self._stopping.wait(self.poll_s):
+                self.refresh()
+
+        self._thread = threading.Thread(target=watch, daemon=True, name="model-registry")
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        shadow = self._shadow if self._candidate is not None else None
+        return {
+            "live": self.version,
+            "candidate": self._candidate.version if self._candidate is not None else None,
+            "rollout": self.rollout,
+            "swaps": self.swaps,
+            "versions": list_versions(self.root),
+            "load_errors": dict(self.load_errors),
+            "shadow": shadow.summary() if shadow is not None else None,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage model versions")
+    parser.add_argument("--publish", nargs="?", const=str(config.model_artifact_dir()),
+                        metavar="ARTIFACT_DIR", help="add an artifact as the next version")
+    parser.add_argument("--promote", metavar="VERSION", help="pin this version as live")
+    args = parser.parse_args()
+
+    if args.publish:
+        print(f"Published {publish(args.publish)}")
+    if args.promote:
+        pin_version(args.promote)
+        print(f"Pinned {args.promote} as live")
+    print(json.dumps({"versions": list_versions(), "pinned": pinned_version()}, indent=2))
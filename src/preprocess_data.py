@@ -1,25 +1,81 @@
-from math import atan2, cos, radians, sin, sqrt
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
-from src.kalman_filter import apply_kalman_filter
+from src import config, instrumentation, storage
+from src.geofence import get_geofence
+from src.schema import apply_schema
+from src.tracker import MultiTargetTracker, assign_tracks
+from src.kalman_filter import (adaptive_noise, apply_kalman_filter, initial_state, kalman_smooth,
+                               track_bounds)
+from src.window_features import WINDOW_INPUTS, add_window_features, window_features
 
 
 def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres. Works on scalars and NumPy arrays."""
     R = 6371000.0
-    phi1 = radians(lat1)
-    phi2 = radians(lat2)
-    dphi = radians(lat2 - lat1)
-    dlambda = radians(lon2 - lon1)
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = np.radians(lat2 - lat1)
+    dlambda = np.radians(lon2 - lon1)
 
-    a = sin(dphi / 2.0) ** 2 + cos(phi1) * cos(phi2) * sin(dlambda / 2.0) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    a = np.sin(dphi / 2.0) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2.0) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
     return R * c
 
 
-def calculate_features(df):
+def motion_features(lat, lon, t_ns, new_track, start_direction=0.0):
+    """
+    Motion features between consecutive fixes of the same agent.
+
+    Args:
+        lat, lon: smoothed positions, grouped by agent and ordered in time
+        t_ns: timestamps as int64 nanoseconds
+        new_track: boolean mask of the first fix of every agent
+        start_direction: heading assumed on the ``new_track`` rows, used for
+            the angle change of the following fix (0.0 for a fresh track)
+
+    Returns:
+        dict of dist_moved_m, time_delta_s, speed_m_s, direction and
+        angle_change arrays. All are 0.0 on the first fix of an agent.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    t_ns = np.asarray(t_ns, dtype=np.int64)
+    new_track = np.asarray(new_track, dtype=bool)
+
+    prev_lat = np.r_[lat[:1], lat[:-1]]
+    prev_lon = np.r_[lon[:1], lon[:-1]]
+    prev_t = np.r_[t_ns[:1], t_ns[:-1]]
+
+    dist = np.where(new_track, 0.0, haversine(prev_lat, prev_lon, lat, lon))
+    td = np.where(new_track, 0.0, (t_ns - prev_t) / 1e9)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(td > 0, dist / td, 0.0)
+
+    dx = np.radians(lat - prev_lat)
+    dy = np.radians(lon - prev_lon)
+    direction = np.where(new_track, start_direction, np.arctan2(dx, dy))
+
+    diff = direction - np.r_[direction[:1], direction[:-1]]
+    diff = (diff + np.pi) % (2 * np.pi) - np.pi
+    angle_change = np.where(new_track, 0.0, np.abs(diff))
+    direction = np.where(new_track, 0.0, direction)
+
+    return {
+        "dist_moved_m": dist,
+        "time_delta_s": td,
+        "speed_m_s": speed,
+        "direction": direction,
+        "angle_change": angle_change,
+    }
+
+
+def _prepare_tracks(df, tracker=None):
     # -------------------------------
     # 1. Timestamp handling
     # -------------------------------
@@ -29,83 +85,318 @@ def calculate_features(df):
     # 2. Agent ID safety (CRITICAL)
     # -------------------------------
     if "agent_id" not in df.columns:
-        df["agent_id"] = "ID_000"
+        # Anonymous detections: link them into tracks first
+        with instrumentation.timer("tracking", rows=len(df)):
+            df = assign_tracks(df, tracker)
+    elif isinstance(df["agent_id"].dtype, pd.CategoricalDtype):
+        # Keep the codes, but order categories by name so rows sort as strings do
+        agents = df["agent_id"].cat.rename_categories(df["agent_id"].cat.categories.astype(str))
+        df["agent_id"] = agents.cat.reorder_categories(sorted(agents.cat.categories))
     else:
         df["agent_id"] = df["agent_id"].astype(str)
 
     # -------------------------------
     # 3. Sort temporally per agent
     # -------------------------------
-    df = df.sort_values(["agent_id", "timestamp"]).reset_index(drop=True)
+    return df.sort_values(["agent_id", "timestamp"]).reset_index(drop=True)
+
 
+def _confidence(df):
+    """sensor_confidence as floats for the adaptive Kalman filter; None if absent."""
+    if "sensor_confidence" not in df.columns:
+        return None
+    return pd.to_numeric(df["sensor_confidence"], errors="coerce").to_numpy(dtype=float)
+
+
+def _add_spatial_features(df):
     # -------------------------------
-    # 4. Kalman smoothing
+    # 6. Spatial risk feature
     # -------------------------------
-    df = apply_kalman_filter(df)
+    with instrumentation.timer("geofence", rows=len(df)):
+        fence = get_geofence().query(df["latitude"].to_numpy(), df["longitude"].to_numpy())
+    df["dist_to_border"] = fence["dist_to_border_m"]
+    df["border_side"] = fence["border_side"]
+    df["in_warning_zone"] = fence["in_warning_zone"]
+    return apply_schema(df)
+
+
+def _add_window_features(df):
+    # -------------------------------
+    # 7. Rolling trajectory windows
+    # -------------------------------
+    with instrumentation.timer("window_features", rows=len(df)):
+        return add_window_features(df)
+
+
+def calculate_features(df):
+    df = _prepare_tracks(df)
 
     # -------------------------------
-    # 5. Feature columns
+    # 4. Kalman smoothing
     # -------------------------------
-    df["dist_moved_m"] = 0.0
-    df["time_delta_s"] = 0.0
-    df["speed_m_s"] = 0.0
-    df["direction"] = 0.0
-    df["angle_change"] = 0.0
+    with instrumentation.timer("kalman", rows=len(df)):
+        df = apply_kalman_filter(df)
 
     # -------------------------------
-    # 6. Motion features per agent
+    # 5. Motion features per agent
     # -------------------------------
-    for agent, idx in df.groupby("agent_id").groups.items():
-        idx = list(idx)
-        if len(idx) < 2:
-            continue
+    # Rows are sorted by agent, so each agent is one contiguous block
+    new_track = (df["agent_id"] != df["agent_id"].shift()).to_numpy()
+    t_ns = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
 
-        for i in range(1, len(idx)):
-            cur = idx[i]
-            prev = idx[i - 1]
+    with instrumentation.timer("motion_features", rows=len(df)):
+        features = motion_features(df["lat_kalman"], df["lon_kalman"], t_ns, new_track)
+    for name, values in features.items():
+        df[name] = values
 
-            lat1, lon1 = df.at[prev, "lat_kalman"], df.at[prev, "lon_kalman"]
-            lat2, lon2 = df.at[cur, "lat_kalman"], df.at[cur, "lon_kalman"]
+    return _add_window_features(_add_spatial_features(df))
 
-            dist = haversine(lat1, lon1, lat2, lon2)
-            df.at[cur, "dist_moved_m"] = dist
 
-            td = (df.at[cur, "timestamp"] - df.at[prev, "timestamp"]).total_seconds()
-            df.at[cur, "time_delta_s"] = td
+# Columns of the shared arrays used by calculate_features_parallel
+_SHARED_INPUTS = ["latitude", "longitude", "t_ns", "sensor_confidence"]
+_SHARED_OUTPUTS = ["lat_kalman", "lon_kalman", "dist_moved_m", "time_delta_s",
+                   "speed_m_s", "direction", "angle_change"]
 
-            if td > 0:
-                df.at[cur, "speed_m_s"] = dist / td
 
-            dx = radians(lat2 - lat1)
-            dy = radians(lon2 - lon1)
-            df.at[cur, "direction"] = atan2(dx, dy) if (dx or dy) else 0.0
+def _features_shard(shm_name, n_rows, starts, lengths, adaptive=False, smooth=False):
+    """
+    Worker of ``calculate_features_parallel``: filters the given tracks and
+    writes their features straight into the shared output rows.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        columns = _SHARED_INPUTS + _SHARED_OUTPUTS
+        shared = np.ndarray((len(columns), n_rows), dtype=np.float64, buffer=shm.buf)
+        lat, lon = shared[0], shared[1]
+        t_ns = shared[2].view(np.int64)
+        confidence = shared[3]
 
-        for i in range(1, len(idx)):
-            cur = idx[i]
-            prev = idx[i - 1]
-            diff = df.at[cur, "direction"] - df.at[prev, "direction"]
-            diff = (diff + np.pi) % (2 * np.pi) - np.pi
-            df.at[cur, "angle_change"] = abs(diff)
+        # Rows of this shard's tracks, and where each track starts within them
+        local_starts = np.cumsum(lengths) - lengths
+        rows = np.repeat(starts - local_starts, lengths) + np.arange(lengths.sum())
+        new_track = np.zeros(len(rows), dtype=bool)
+        new_track[local_starts] = True
 
-    # -------------------------------
-    # 7. Spatial risk feature
-    # -------------------------------
-    df["dist_to_border"] = (df["longitude"] - 70.0).abs()
+        noise = {}
+        if adaptive:
+            noise = adaptive_noise(lat[rows], t_ns[rows], local_starts, lengths, confidence[rows])
+        lat_k, lon_k, _, _ = kalman_smooth(lat[rows], lon[rows], local_starts, lengths,
+                                           rts=smooth, **noise)
+        out = {"lat_kalman": lat_k, "lon_kalman": lon_k}
+        out.update(motion_features(lat_k, lon_k, t_ns[rows], new_track))
+        for i, name in enumerate(_SHARED_OUTPUTS, start=len(_SHARED_INPUTS)):
+            shared[i, rows] = out[name]
+        del shared, lat, lon, t_ns, confidence
+    finally:
+        shm.close()
+    return len(rows)
+
+
+def calculate_features_parallel(df, n_workers=None):
+    """
+    ``calculate_features`` with agents spread over a process pool.
+
+    Agents are hash-partitioned into one shard per worker. Workers read the
+    positions from, and write the features into, one shared memory block,
+    so nothing but track offsets is pickled and every row lands at the
+    position ``calculate_features`` would give it.
+    """
+    n_workers = n_workers or config.preprocess_workers()
+    df = _prepare_tracks(df)
+    n_rows = len(df)
+    if n_workers <= 1 or n_rows == 0:
+        return calculate_features(df)
+
+    agents = df["agent_id"].to_numpy()
+    starts, lengths = track_bounds(agents)
+    shards = storage.agent_buckets(agents[starts], n_buckets=n_workers)
 
-    return df
+    columns = _SHARED_INPUTS + _SHARED_OUTPUTS
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(columns) * n_rows * 8))
+    try:
+        shared = np.ndarray((len(columns), n_rows), dtype=np.float64, buffer=shm.buf)
+        shared[0] = df["latitude"].to_numpy(dtype=float)
+        shared[1] = df["longitude"].to_numpy(dtype=float)
+        shared[2] = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64).view(np.float64)
+        confidence = _confidence(df)
+        shared[3] = np.nan if confidence is None else confidence
+
+        with instrumentation.timer("features_parallel", rows=n_rows), \
+                ProcessPoolExecutor(max_workers=n_workers) as pool:
+            jobs = [
+                pool.submit(_features_shard, shm.name, n_rows, starts[shards == i], lengths[shards == i],
+                            config.KALMAN_ADAPTIVE, config.KALMAN_RTS)
+                for i in range(n_workers)
+                if (shards == i).any()
+            ]
+            for job in jobs:
+                job.result()
+
+        for i, name in enumerate(_SHARED_OUTPUTS, start=len(_SHARED_INPUTS)):
+            df[name] = shared[i].copy()
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return _add_window_features(_add_spatial_features(df))
+
+
+class StreamingPreprocessor:
+    """
+    Computes the same features as ``calculate_features`` one chunk at a time.
+
+    Chunks must arrive in timestamp order. Each agent's Kalman state and
+    last smoothed fix are carried over to the next chunk, so the output is
+    continuous across chunk boundaries while memory only holds one chunk
+    plus a few numbers per agent.
+
+    For the rolling window features, the fixes of the longest window
+    before the chunk (and each agent's last fix) are kept and prepended.
+    Chunks without an agent_id column are linked into tracks by one
+    ``MultiTargetTracker`` that lives across chunks. The RTS smoother
+    (``config.KALMAN_RTS``) needs whole tracks, so it is batch-only.
+    """
+
+    def __init__(self):
+        # agent_id -> (x, P, lat_kalman, lon_kalman, t_ns, direction)
+        self.tracks = {}
+        self._last_t_ns = None
+        # Recent featured fixes: the longest window, plus each agent's last fix
+        self.history = None
+        # Links chunks of detections without agent_id into tracks
+        self.tracker = MultiTargetTracker()
+
+    def process(self, chunk):
+        df = _prepare_tracks(chunk, self.tracker)
+        if df.empty:
+            return calculate_features(df)
+
+        t_ns = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        if self._last_t_ns is not None and t_ns.min() < self._last_t_ns:
+            raise ValueError("Chunks must be in timestamp order for streaming preprocessing")
+        self._last_t_ns = t_ns.max()
+
+        agents = df["agent_id"].to_numpy()
+        starts, lengths = track_bounds(agents)
+        lat = df["latitude"].to_numpy(dtype=float)
+        lon = df["longitude"].to_numpy(dtype=float)
+
+        # Kalman smoothing, resuming agents seen in earlier chunks
+        x0, P0 = initial_state(lat[starts], lon[starts])
+        carried = [self.tracks.get(agent) for agent in agents[starts]]
+        has_prev = np.array([c is not None for c in carried])
+        for i in np.flatnonzero(has_prev):
+            x0[i], P0[i] = carried[i][0], carried[i][1]
+
+        noise = {}
+        if config.KALMAN_ADAPTIVE:
+            prev_t_ns = np.array([c[4] if c is not None else np.nan for c in carried], dtype=float)
+            noise = adaptive_noise(lat, t_ns, starts, lengths, _confidence(df), prev_t_ns)
+
+        with instrumentation.timer("kalman", rows=len(df)):
+            lat_k, lon_k, x, P = kalman_smooth(lat, lon, starts, lengths, x0, P0, **noise)
+        df["lat_kalman"] = lat_k
+        df["lon_kalman"] = lon_k
+
+        # Motion features, with each resumed agent's last fix prepended
+        prev = [carried[i] for i in np.flatnonzero(has_prev)]
+        at = starts[has_prev]
+        new_track = np.zeros(len(df), dtype=bool)
+        new_track[starts[~has_prev]] = True
+
+        features = motion_features(
+            np.insert(lat_k, at, [c[2] for c in prev]),
+            np.insert(lon_k, at, [c[3] for c in prev]),
+            np.insert(t_ns, at, np.array([c[4] for c in prev], dtype=np.int64)),
+            np.insert(new_track, at, True),
+            np.insert(np.zeros(len(df)), at, [c[5] for c in prev]),
+        )
+        keep = np.insert(np.ones(len(df), dtype=bool), at, False)
+        for name, values in features.items():
+            df[name] = values[keep]
+
+        ends = starts + lengths - 1
+        direction = df["direction"].to_numpy()
+        for i, agent in enumerate(agents[starts]):
+            end = ends[i]
+            self.tracks[agent] = (x[i], P[i], lat_k[end], lon_k[end], t_ns[end], direction[end])
+
+        return self._add_window_features(_add_spatial_features(df))
+
+    def _add_window_features(self, df):
+        new = df[WINDOW_INPUTS].assign(agent_id=df["agent_id"].astype(str).to_numpy())
+        rows = new if self.history is None else pd.concat([self.history, new], ignore_index=True)
+        is_new = np.r_[np.zeros(len(rows) - len(new), dtype=bool), np.ones(len(new), dtype=bool)]
+
+        # Stable, so history stays in front and new rows keep their order
+        order = np.lexsort((rows["timestamp"].to_numpy(), rows["agent_id"].to_numpy()))
+        rows = rows.iloc[order].reset_index(drop=True)
+        is_new = is_new[order]
+
+        agents = rows["agent_id"].to_numpy()
+        t_ns = rows["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        with instrumentation.timer("window_features", rows=len(df)):
+            features = window_features(
+                t_ns, np.r_[True, agents[1:] != agents[:-1]],
+                rows["lat_kalman"], rows["lon_kalman"], rows["speed_m_s"], rows["direction"],
+                rows["dist_moved_m"], rows["time_delta_s"], rows["dist_to_border"],
+            )
+        for name, values in features.items():
+            df[name] = values[is_new]
+
+        horizon = self._last_t_ns - int(max(config.FEATURE_WINDOWS_S) * 1e9)
+        last_of_agent = np.r_[agents[1:] != agents[:-1], True]
+        self.history = rows[(t_ns > horizon) | last_of_agent].reset_index(drop=True)
+        return df
+
+
+def preprocess_streaming(raw_path, out_path, chunksize=100_000):
+    """
+    Reads a timestamp-ordered raw dataset in chunks and appends the featured
+    rows to ``out_path`` as each chunk is processed. Both go through
+    ``storage``, so either may be CSV or Parquet.
+
+    Returns the number of rows written.
+    """
+    streamer = StreamingPreprocessor()
+    rows = 0
+    for chunk in storage.read_chunks(raw_path, chunksize):
+        with instrumentation.timer("stream_chunk", rows=len(chunk)):
+            processed = streamer.process(chunk)
+        instrumentation.count("stream_chunks")
+        storage.append_table(processed, out_path, start_row=rows)
+        rows += len(processed)
+    return rows
 
 
 if __name__ == "__main__":
-    raw_path = Path("data/raw/border_data.csv")
+    parser = argparse.ArgumentParser(description="Kalman smoothing and motion features")
+    parser.add_argument("--stream", action="store_true",
+                        help="process the raw file in timestamp-ordered chunks")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--workers", type=int,
+                        help="spread agents over this many processes")
+    args = parser.parse_args()
+    if args.stream and args.workers:
+        parser.error("--stream and --workers cannot be combined")
+
+    raw_path = Path(config.raw_data_path())
 
     if not raw_path.exists():
         raise FileNotFoundError("Run generate_data.py first")
 
-    df = pd.read_csv(raw_path)
-    processed_df = calculate_features(df)
-
-    out_dir = Path("data/processed")
-    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = Path(config.processed_data_path())
+    out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    processed_df.to_csv(out_dir / "featured_border_data.csv", index=False)
+    if args.stream:
+        preprocess_streaming(raw_path, out_path, chunksize=args.chunksize)
+    else:
+        df = storage.read_table(raw_path)
+        if args.workers:
+            processed_df = calculate_features_parallel(df, n_workers=args.workers)
+        else:
+            processed_df = calculate_features(df)
+        storage.write_table(processed_df, out_path)
     print("Kalman-smoothed features saved")
+    instrumentation.export()
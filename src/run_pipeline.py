@@ -2,45 +2,130 @@
 This is a convenience script for demoing the full pipeline locally.
 """
 
+import argparse
+from pathlib import Path
+from typing import Optional
+
 from src import (
+    compiled_model,
+    config,
     evaluate_model,
     generate_data,
+    geofence,
+    incident_index,
+    instrumentation,
+    kalman_filter,
+    model_artifact,
     preprocess_data,
+    schema,
+    storage,
+    tracker,
     train_model,
     visualize_data,
+    window_features,
 )
+from src.stage_cache import StageCache
+
+
+def run_all(n_points: int = 500, chunksize: Optional[int] = None, workers: Optional[int] = None,
+            use_cache: bool = True):
+    """Run every stage. With ``chunksize`` set, preprocessing streams the raw
+    file in timestamp-ordered chunks instead of loading it whole; with
+    ``workers`` set, it spreads agents over that many processes.
 
+    With ``use_cache``, a stage whose inputs, parameters and code match an
+    earlier run restores that run's outputs instead of running again.
+    With instrumentation enabled, stage metrics are exported at the end."""
+    cache = StageCache() if use_cache else None
+    raw_paths = [config.raw_data_path("synthetic_border_data.csv"), config.raw_data_path()]
+    processed_paths = [config.processed_data_path()]
+    model_paths = [config.model_path(), config.compiled_model_path(), config.model_artifact_dir()]
+    visuals = config.visuals_dir()
 
-def run_all(n_points: int = 500):
     print("1/5: Generating data...")
-    generate_data.generate_scientific_data(n_points=n_points)
+    _run_stage(cache, "generate", lambda: generate_data.generate_scientific_data(n_points=n_points),
+               outputs=[config.raw_data_path()], params={"n_points": n_points}, code=[generate_data],
+               rows=n_points)
 
     print("2/5: Preprocessing data...")
-    # The preprocess script can be imported and used programmatically
-    import pandas as pd
-
-    raw_candidates = [
-        "data/raw/synthetic_border_data.csv",
-        "data/raw/border_data.csv",
-    ]
-    for p in raw_candidates:
-        try:
-            df = pd.read_csv(p)
-            processed = preprocess_data.calculate_features(df)
-            processed.to_csv("data/processed/featured_border_data.csv", index=False)
-            break
-        except Exception:
-            continue
+    # Worker count does not change the features, so it is not part of the key
+    _run_stage(cache, "preprocess", lambda: _preprocess(chunksize, workers),
+               inputs=raw_paths, outputs=processed_paths,
+               params={"chunksize": chunksize, "kalman_adaptive": config.KALMAN_ADAPTIVE,
+                       "kalman_rts": config.KALMAN_RTS},
+               code=[preprocess_data, kalman_filter, geofence, schema, storage, config,
+                     tracker, window_features])
 
     print("3/5: Training model...")
-    train_model.train_elite_model()
+    _run_stage(cache, "train", train_model.train_elite_model,
+               inputs=[config.raw_data_path(), config.processed_data_path()],
+               outputs=model_paths + [
+                   config.incident_index_dir(),
+                   config.model_metadata_path(),
+                   config.training_report_path(),
+                   visuals / "feature_importance.png",
+                   visuals / "confusion_matrix.png",
+                   config.outputs_dir() / "decision_output.csv",
+               ],
+               code=[train_model, compiled_model, model_artifact, incident_index, storage, config])
 
     print("4/5: Evaluating model...")
-    evaluate_model.evaluate_elite_system()
+    _run_stage(cache, "evaluate", evaluate_model.evaluate_elite_system,
+               inputs=model_paths + [config.raw_data_path(), config.training_report_path()],
+               outputs=[visuals / "confusion_matrix.png"],
+               code=[evaluate_model, compiled_model, model_artifact])
 
     print("5/5: Visualizing results...")
-    visualize_data.plot_movements()
+    _run_stage(cache, "visualize", visualize_data.plot_movements,
+               inputs=[config.processed_data_path()], outputs=[visuals / "movement_map.png"],
+               code=[visualize_data, config])
+
+    metrics_path = instrumentation.export()
+    if metrics_path is not None:
+        print(f"Stage metrics saved to: {metrics_path}")
+
+
+def _run_stage(cache, name, fn, inputs=(), outputs=(), params=None, code=(), rows=None):
+    with instrumentation.timer(name, rows=rows):
+        if cache is None:
+            fn()
+        elif cache.run(name, fn, inputs=inputs, outputs=outputs, params=params, code=code):
+            instrumentation.count("stage_cache_hits")
+            print(f"   {name}: inputs unchanged, restored from cache")
+        else:
+            instrumentation.count("stage_cache_misses")
+
+
+def _preprocess(chunksize, workers):
+    # The preprocess script can be imported and used programmatically
+    raw_candidates = [
+        config.raw_data_path("synthetic_border_data.csv"),
+        config.raw_data_path(),
+    ]
+    # Only a missing candidate is skipped; processing errors propagate
+    for p in raw_candidates:
+        if not Path(p).exists():
+            continue
+        if chunksize:
+            preprocess_data.preprocess_streaming(p, config.processed_data_path(),
+                                                 chunksize=chunksize)
+        else:
+            df = storage.read_table(p)
+            if workers:
+                processed = preprocess_data.calculate_features_parallel(df, n_workers=workers)
+            else:
+                processed = preprocess_data.calculate_features(df)
+            storage.write_table(processed, config.processed_data_path())
+        return
+    raise FileNotFoundError(f"No raw data at {' or '.join(str(p) for p in raw_candidates)}")
 
 
 if __name__ == "__main__":
-    run_all(n_points=500)
+    parser = argparse.ArgumentParser(description="Run the whole pipeline")
+    parser.add_argument("--points", type=int, default=500)
+    parser.add_argument("--chunksize", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--no-cache", action="store_true", help="run every stage")
+    args = parser.parse_args()
+    run_all(n_points=args.points, chunksize=args.chunksize, workers=args.workers,
+            use_cache=not args.no_cache)
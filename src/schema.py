@@ -0,0 +1,104 @@
+"""
+Column dtypes of the track tables.
+
+Every stage loads data through ``storage.read_table``, which passes it to
+``apply_schema``: known columns are validated and cast to compact dtypes
+once, right after load. Positions and the model's input columns stay
+float64 so smoothing and model outputs are unchanged; derived motion
+features are float32, strings are categoricals and timestamps are
+datetime64.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.window_features import window_columns
+
+
+FLOAT64 = "float64"
+FLOAT32 = "float32"
+CATEGORY = "category"
+TIMESTAMP = "datetime64[ns]"
+
+SCHEMA = {
+    "timestamp": TIMESTAMP,
+    # Categorical codes are int8/int16/int32, sized to the number of agents
+    "agent_id": CATEGORY,
+    "object_type": CATEGORY,
+    "terrain": CATEGORY,
+    "visibility": CATEGORY,
+    # Degrees need float64: float32 resolves only ~1 m at these coordinates
+    "latitude": FLOAT64,
+    "longitude": FLOAT64,
+    "true_latitude": FLOAT64,
+    "true_longitude": FLOAT64,
+    "lat_kalman": FLOAT64,
+    "lon_kalman": FLOAT64,
+    # Model inputs keep full precision so scores are identical
+    "speed": FLOAT64,
+    "angle_change": FLOAT64,
+    "sensor_confidence": FLOAT64,
+    # Derived features
+    "dist_moved_m": FLOAT32,
+    "time_delta_s": FLOAT32,
+    "speed_m_s": FLOAT32,
+    "direction": FLOAT32,
+    "dist_to_border": FLOAT32,
+    "border_side": "int8",
+    "in_warning_zone": "bool",
+    "label": "int8",
+}
+# Rolling trajectory-window features
+SCHEMA.update({name: FLOAT32 for name in window_columns()})
+
+# (min, max) of columns checked on load; missing values are not checked
+# (e.g. kalman_filter reads a NaN sensor_confidence as DEFAULT_CONFIDENCE)
+VALID_RANGES = {
+    "latitude": (-90.0, 90.0),
+    "longitude": (-180.0, 180.0),
+    "sensor_confidence": (0.0, 1.0),
+}
+
+
+def apply_schema(df, required=()):
+    """
+    Validates ``df`` and casts the columns it knows to their schema dtype.
+    Unknown columns are left as they are.
+
+    Raises:
+        KeyError: a ``required`` column is missing
+        ValueError: a column is out of its valid range
+    """
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise KeyError(f"Missing columns: {missing}")
+
+    df = df.copy()
+    for col, dtype in SCHEMA.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        if dtype == TIMESTAMP:
+            df[col] = pd.to_datetime(df[col]).astype(TIMESTAMP)
+        elif dtype == CATEGORY:
+            # Labels are normalised to strings, but missing values stay NaN
+            # rather than becoming a "nan" category
+            values = df[col]
+            df[col] = values.where(values.isna(), values.astype(str)).astype(CATEGORY)
+        else:
+            df[col] = df[col].astype(dtype)
+
+    problems = []
+    for col, (low, high) in VALID_RANGES.items():
+        if col in df.columns and len(df):
+            values = df[col].to_numpy(dtype=float)
+            bad = ~np.isnan(values) & ~((values >= low) & (values <= high))
+            if bad.any():
+                problems.append(f"{col}: {int(bad.sum())} value(s) outside [{low}, {high}]")
+    if problems:
+        raise ValueError("Invalid data: " + "; ".join(problems))
+    return df
+
+
+def memory_mb(df):
+    """Resident size of a frame in MB, including string contents."""
+    return df.memory_usage(deep=True).sum() / 2 ** 20
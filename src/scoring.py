@@ -0,0 +1,293 @@
+"""
+Online threat scoring, one sensor fix at a time.
+
+Each agent keeps its Kalman state and last smoothed fix in a compact,
+array-backed store, so a new fix only costs one filter step and one
+motion-feature update before it is scored by the trained pipeline.
+"""
+
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.compiled_model import CompiledForest, load_compiled_model
+from src.kalman_filter import adaptive_noise, initial_state, kalman_smooth, kalman_step, track_bounds
+from src.model_artifact import artifact_exists, load_artifact
+from src.preprocess_data import motion_features
+
+
+NUMERIC_FEATURES = ["speed", "angle_change", "sensor_confidence"]
+CATEGORICAL_FEATURES = ["object_type", "terrain", "visibility"]
+
+
+def load_model():
+    """
+    Load the model artifact if it was written, else the compiled model,
+    else the trained pipeline.
+    """
+    if artifact_exists():
+        return load_artifact()
+    if Path(config.compiled_model_path()).exists():
+        return load_compiled_model()
+    model_path = Path(config.model_path())
+    if not model_path.exists():
+        raise FileNotFoundError(f"Model not found at {model_path}")
+    return joblib.load(model_path)
+
+
+class TrackStore:
+    """
+    Per-agent track state held in preallocated NumPy arrays.
+
+    Agents map to slots; slots of evicted agents are reused, and the arrays
+    double in size when every slot is taken.
+    """
+
+    __slots__ = ("slots", "free", "x", "P", "lat", "lon", "t_ns", "direction", "active")
+
+    def __init__(self, capacity=1024):
+        self.slots = {}
+        self.free = list(range(capacity - 1, -1, -1))
+        self.x = np.zeros((capacity, 4))
+        self.P = np.zeros((capacity, 4, 4))
+        self.lat = np.zeros(capacity)
+        self.lon = np.zeros(capacity)
+        self.t_ns = np.zeros(capacity, dtype=np.int64)
+        self.direction = np.zeros(capacity)
+        self.active = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, agent_id):
+        return agent_id in self.slots
+
+    def slot(self, agent_id):
+        """Returns (slot, is_new) for an agent, allocating a slot if needed."""
+        slot = self.slots.get(agent_id)
+        if slot is not None:
+            return slot, False
+
+        if not self.free:
+            self._grow()
+        slot = self.free.pop()
+        self.slots[agent_id] = slot
+        self.active[slot] = True
+        return slot, True
+
+    def evict_before(self, t_ns):
+        """Drops every track whose last fix is older than ``t_ns``."""
+        stale = np.flatnonzero(self.active & (self.t_ns < t_ns))
+        if len(stale) == 0:
+            return []
+
+        stale_set = set(stale.tolist())
+        evicted = [agent for agent, slot in self.slots.items() if slot in stale_set]
+        for agent in evicted:
+            del self.slots[agent]
+        self.active[stale] = False
+        self.free.extend(stale.tolist())
+        return evicted
+
+    def _grow(self):
+        capacity = len(self.active)
+        for name in ("x", "P", "lat", "lon", "t_ns", "direction", "active"):
+            arr = getattr(self, name)
+            grown = np.zeros((capacity * 2,) + arr.shape[1:], dtype=arr.dtype)
+            grown[:capacity] = arr
+            setattr(self, name, grown)
+        self.free.extend(range(capacity * 2 - 1, capacity - 1, -1))
+
+
+class TrackScorer:
+    """
+    Incremental scorer for a live stream of sensor fixes.
+
+    A fix is a mapping with agent_id, timestamp, latitude, longitude,
+    sensor_confidence, object_type, terrain and visibility. Fixes of an
+    agent must arrive in time order. Tracks with no fix for
+    ``stale_after_s`` seconds of sensor time are evicted.
+    """
+
+    def __init__(self, model=None, stale_after_s=300.0, capacity=1024):
+        self.model = model if model is not None else load_model()
+        self.tracks = TrackStore(capacity)
+        self.stale_after_ns = int(stale_after_s * 1e9)
+        self._next_sweep_ns = None
+
+    def update(self, agent_id, timestamp, latitude, longitude, sensor_confidence=None):
+        """
+        Advances one agent's track with a new fix.
+
+        Returns the motion features of the fix, computed exactly as
+        ``calculate_features`` would for the same track.
+        """
+        t_ns = pd.Timestamp(timestamp).value
+        self._maybe_evict(t_ns)
+
+        store = self.tracks
+        slot, is_new = store.slot(agent_id)
+
+        if is_new:
+            x, P = initial_state([latitude], [longitude])
+        else:
+            x, P = store.x[slot:slot + 1], store.P[slot:slot + 1]
+        noise = {}
+        if config.KALMAN_ADAPTIVE:
+            noise = adaptive_noise(
+                [latitude], [t_ns], [0], [1],
+                None if sensor_confidence is None else [sensor_confidence],
+                [np.nan if is_new else store.t_ns[slot]])
+        x, P = kalman_step(x, P, np.array([latitude]), np.array([longitude]), **noise)
+
+        features = motion_features(
+            [store.lat[slot], x[0, 0]],
+            [store.lon[slot], x[0, 1]],
+            [store.t_ns[slot], t_ns],
+            [True, is_new],
+            [store.direction[slot], 0.0],
+        )
+        features = {name: float(values[1]) for name, values in features.items()}
+
+        store.x[slot] = x[0]
+        store.P[slot] = P[0]
+        store.lat[slot] = x[0, 0]
+        store.lon[slot] = x[0, 1]
+        store.t_ns[slot] = t_ns
+        store.direction[slot] = features["direction"]
+
+        features["lat_kalman"] = x[0, 0]
+        features["lon_kalman"] = x[0, 1]
+        return features
+
+    def score(self, fix):
+        """Updates the agent's track with ``fix`` and returns its threat score."""
+        features = self.update(fix["agent_id"], fix["timestamp"], fix["latitude"], fix["longitude"],
+                               fix.get("sensor_confidence"))
+        X = [model_inputs(features, fix)]
+        if not isinstance(self.model, CompiledForest):
+            X = pd.DataFrame(X)
+        return float(self.model.predict_proba(X)[0, 1])
+
+    def update_batch(self, fixes):
+        """
+        Advances the tracks with every row of ``fixes`` at once.
+
+        Rows of each agent must be in time order. Returns the motion
+        features and lat_kalman/lon_kalman of every row, in the order of
+        ``fixes``, matching what calling ``update`` row by row would give.
+        Staleness is checked once, at the batch's first timestamp.
+        """
+        n = len(fixes)
+        t_ns = pd.to_datetime(fixes["timestamp"]).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        self._maybe_evict(t_ns.min())
+
+        # Group rows by agent, keeping each agent's rows in arrival order
+        codes, agents = pd.factorize(fixes["agent_id"])
+        order = np.argsort(codes, kind="stable")
+        starts, lengths = track_bounds(codes[order])
+        lat = fixes["latitude"].to_numpy(dtype=float)[order]
+        lon = fixes["longitude"].to_numpy(dtype=float)[order]
+        t_ns = t_ns[order]
+
+        store = self.tracks
+        slots, is_new = zip(*(store.slot(agent) for agent in agents[codes[order][starts]]))
+        slots = np.array(slots, dtype=np.intp)
+        is_new = np.array(is_new, dtype=bool)
+        resumed = slots[~is_new]
+
+        x0, P0 = initial_state(lat[starts], lon[starts])
+        x0[~is_new] = store.x[resumed]
+        P0[~is_new] = store.P[resumed]
+        noise = {}
+        if config.KALMAN_ADAPTIVE:
+            confidence = None
+            if "sensor_confidence" in fixes.columns:
+                confidence = fixes["sensor_confidence"].to_numpy(dtype=float)[order]
+            prev_t_ns = np.full(len(starts), np.nan)
+            prev_t_ns[~is_new] = store.t_ns[resumed]
+            noise = adaptive_noise(lat, t_ns, starts, lengths, confidence, prev_t_ns)
+        lat_k, lon_k, x, P = kalman_smooth(lat, lon, starts, lengths, x0, P0, **noise)
+
+        # Resumed tracks get their last stored fix prepended, as in update()
+        at = starts[~is_new]
+        new_track = np.zeros(n, dtype=bool)
+        new_track[starts[is_new]] = True
+        features = motion_features(
+            np.insert(lat_k, at, store.lat[resumed]),
+            np.insert(lon_k, at, store.lon[resumed]),
+            np.insert(t_ns, at, store.t_ns[resumed]),
+            np.insert(new_track, at, True),
+            np.insert(np.zeros(n), at, store.direction[resumed]),
+        )
+        keep = np.insert(np.ones(n, dtype=bool), at, False)
+        features = {name: values[keep] for name, values in features.items()}
+        features["lat_kalman"] = lat_k
+        features["lon_kalman"] = lon_k
+
+        ends = starts + lengths - 1
+        store.x[slots] = x
+        store.P[slots] = P
+        store.lat[slots] = lat_k[ends]
+        store.lon[slots] = lon_k[ends]
+        store.t_ns[slots] = t_ns[ends]
+        store.direction[slots] = features["direction"][ends]
+
+        unsort = np.empty_like(order)
+        unsort[order] = np.arange(n)
+        return pd.DataFrame({name: values[unsort] for name, values in features.items()},
+                            index=fixes.index)
+
+    def score_batch(self, fixes):
+        """
+        Updates tracks with every row of ``fixes`` and scores them with a
+        single model call.
+
+        Returns a copy of ``fixes`` with the motion features and threat_score.
+        """
+        out = fixes.copy()
+        if fixes.empty:
+            out["threat_score"] = pd.Series(dtype=float)
+            return out
+
+        features = self.update_batch(fixes)
+        for name, values in features.items():
+            out[name] = values
+        out["threat_score"] = self.model.predict_proba(model_inputs(features, fixes))[:, 1]
+        return out
+
+    def evict_stale(self, now=None):
+        """Evicts tracks idle for longer than the staleness window."""
+        now_ns = pd.Timestamp(now).value if now is not None else self.tracks.t_ns.max()
+        return self.tracks.evict_before(now_ns - self.stale_after_ns)
+
+    def _maybe_evict(self, t_ns):
+        # Sweeping is O(capacity), so do it at most once per staleness window
+        if self._next_sweep_ns is None:
+            self._next_sweep_ns = t_ns + self.stale_after_ns
+        elif t_ns >= self._next_sweep_ns:
+            self.tracks.evict_before(t_ns - self.stale_after_ns)
+            self._next_sweep_ns = t_ns + self.stale_after_ns
+
+
+def model_inputs(features, fix):
+    """
+    Model input row for one fix, or a DataFrame of inputs when given the
+    feature and fix frames of a batch. The model was trained on speed in
+    m/s and angle change in degrees, while the motion features use radians.
+    """
+    inputs = {
+        "speed": features["speed_m_s"],
+        "angle_change": np.degrees(features["angle_change"]),
+        "sensor_confidence": fix["sensor_confidence"],
+        "object_type": fix["object_type"],
+        "terrain": fix["terrain"],
+        "visibility": fix["visibility"],
+    }
+    if isinstance(fix, pd.DataFrame):
+        return pd.DataFrame({name: np.asarray(values) for name, values in inputs.items()},
+                            index=fix.index)
+    return inputs
@@ -0,0 +1,201 @@
+"""
+Content-addressed cache of pipeline stage outputs.
+
+A stage's key hashes its name, the contents of its input files, its
+parameters and the source of the modules that implement it. When a key is
+already cached, the stage's output files are restored from the cache
+instead of running the stage. Because a stage's inputs are the outputs of
+the stages before it, a change only reruns the stages downstream of it.
+
+Entries live under ``config.stage_cache_dir()``, one directory per key.
+Each hit refreshes the entry's timestamp, and the least recently used
+entries are evicted once the cache grows past ``config.stage_cache_max_bytes()``.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+from pathlib import Path
+
+from src import config
+
+ENTRY_FILE = "entry.json"
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def _sha256_file(path, digest):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+
+
+def _tree_size(path):
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _copy(src, dst):
+    """Copies a file or directory over ``dst``, keeping modification times."""
+    src, dst = Path(src), Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if src.is_dir():
+        tmp = dst.with_name(f".{dst.name}.restore-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(src, tmp)
+        if dst.is_dir():
+            shutil.rmtree(dst)
+        elif dst.exists():
+            dst.unlink()
+        tmp.rename(dst)
+    else:
+        if dst.is_dir():
+            shutil.rmtree(dst)
+        shutil.copy2(src, dst)
+
+
+class StageCache:
+    """
+    Args:
+        root: cache directory; ``config.stage_cache_dir()`` if None
+        max_bytes: size the cache is trimmed to after every store
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root) if root is not None else Path(config.stage_cache_dir())
+        self.max_bytes = max_bytes if max_bytes is not None else config.stage_cache_max_bytes()
+        self.hits = 0
+        self.misses = 0
+        # (path, size, mtime_ns) -> digest, so unchanged inputs are hashed once
+        self._digests = {}
+
+    # ---- keys ----
+    def file_digest(self, path):
+        """SHA-256 of a file, or of every file under a directory; None if missing."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        if path.is_dir():
+            digest = hashlib.sha256()
+            for child in sorted(p for p in path.rglob("*") if p.is_file()):
+                digest.update(str(child.relative_to(path)).encode())
+                digest.update(self.file_digest(child).encode())
+            return digest.hexdigest()
+
+        stat = path.stat()
+        memo = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        if memo not in self._digests:
+            digest = hashlib.sha256()
+            _sha256_file(path, digest)
+            self._digests[memo] = digest.hexdigest()
+        return self._digests[memo]
+
+    def key(self, stage, inputs=(), params=None, code=()):
+        """Hash of the stage name, input contents, parameters and module sources."""
+        digest = hashlib.sha256(stage.encode())
+        for path in inputs:
+            digest.update(f"input:{Path(path).name}:{self.file_digest(path)}".encode())
+        digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+        for module in code:
+            digest.update(f"code:{module.__name__}".encode())
+            _sha256_file(inspect.getsourcefile(module), digest)
+        return digest.hexdigest()[:32]
+
+    # ---- entries ----
+    def _entry(self, stage, key):
+        return self.root / f"{stage}-{key}"
+
+    def restore(self, stage, key, outputs):
+        """Copies a cached entry's files to ``outputs``; False if not cached."""
+        entry = self._entry(stage, key)
+        meta_path = entry / ENTRY_FILE
+        if not meta_path.exists():
+            return False
+        with open(meta_path) as f:
+            stored = json.load(f)["outputs"]
+        for i, target in enumerate(outputs):
+            if str(i) in stored:
+                _copy(entry / str(i), target)
+        os.utime(meta_path)
+        return True
+
+    def store(self, stage, key, outputs):
+        """Saves the ``outputs`` that exist, then evicts down to the size bound."""
+        entry = self._entry(stage, key)
+        tmp = entry.with_name(f".{entry.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        stored = {}
+        for i, path in enumerate(outputs):
+            if Path(path).exists():
+                _copy(path, tmp / str(i))
+                stored[str(i)] = str(path)
+        size = _tree_size(tmp)
+        if size > self.max_bytes:
+            # Would evict everything else and still not fit
+            shutil.rmtree(tmp)
+            return False
+
+        with open(tmp / ENTRY_FILE, "w") as f:
+            json.dump({"stage": stage, "key": key, "bytes": size, "outputs": stored}, f, indent=2)
+        shutil.rmtree(entry, ignore_errors=True)
+        tmp.rename(entry)
+        self.evict(keep=entry)
+        return True
+
+    def entries(self):
+        """(last used, bytes, path) of every complete entry, least recently used first."""
+        if not self.root.exists():
+            return []
+        found = []
+        for entry in self.root.iterdir():
+            meta_path = entry / ENTRY_FILE
+            if entry.name.startswith(".") or not meta_path.exists():
+                continue
+            with open(meta_path) as f:
+                size = json.load(f)["bytes"]
+            found.append((meta_path.stat().st_mtime_ns, size, entry))
+        return sorted(found)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """Removes least recently used entries until the cache fits ``max_bytes``."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed.append(entry.name)
+        return removed
+
+    # ---- stages ----
+    def run(self, stage, fn, inputs=(), outputs=(), params=None, code=()):
+        """
+        Restores ``stage``'s outputs if its key is cached, else runs ``fn``
+        and caches the outputs. Returns True on a cache hit.
+
+        Raises FileNotFoundError, caching nothing, if ``fn`` returns
+        without writing every one of ``outputs``.
+        """
+        key = self.key(stage, inputs, params, code)
+        if self.restore(stage, key, outputs):
+            self.hits += 1
+            return True
+        fn()
+        missing = [str(path) for path in outputs if not Path(path).exists()]
+        if missing:
+            raise FileNotFoundError(f"Stage {stage!r} did not write {', '.join(missing)}")
+        self.store(stage, key, outputs)
+        self.misses += 1
+        return False
@@ -0,0 +1,173 @@
+"""
+Table storage for raw and processed datasets.
+
+Stages read and write through ``read_table``/``write_table``; the backend
+is picked from the path suffix (``.csv`` or ``.parquet``), and
+``config.storage_format()`` decides which suffix the default data paths use.
+Parquet datasets are written as a directory partitioned by date and agent
+bucket, with the string columns stored as dictionary-encoded categoricals.
+``read_chunks``/``append_table`` stream a dataset in row order for
+chunked preprocessing; a Parquet dataset is read one date partition at a
+time, so a chunk never needs more than one day in memory.
+"""
+
+import shutil
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.schema import apply_schema
+
+
+CATEGORICAL_COLUMNS = ["object_type", "terrain", "visibility", "agent_id"]
+PARTITION_COLUMNS = ["date", "agent_bucket"]
+
+
+class CsvBackend:
+    suffix = ".csv"
+
+    @staticmethod
+    def read(path, columns=None):
+        if columns is None:
+            return pd.read_csv(path)
+        header = set(pd.read_csv(path, nrows=0).columns)
+        columns = [c for c in columns if c in header]
+        return pd.read_csv(path, usecols=columns)[columns]
+
+    @staticmethod
+    def write(df, path):
+        df.to_csv(path, index=False)
+
+    @staticmethod
+    def read_chunks(path, chunksize):
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+    @staticmethod
+    def append(df, path, start_row):
+        df.to_csv(path, mode="w" if start_row == 0 else "a", header=start_row == 0, index=False)
+
+
+class ParquetBackend:
+    suffix = ".parquet"
+
+    @staticmethod
+    def read(path, columns=None):
+        if columns is not None:
+            import pyarrow.dataset as ds
+
+            names = set(ds.dataset(path, partitioning="hive").schema.names)
+            columns = [c for c in columns if c in names]
+        df = pd.read_parquet(path, columns=columns)
+        # The stored index is the original row order, which partitioning loses
+        df = df.sort_index().reset_index(drop=True)
+        return df.drop(columns=[c for c in PARTITION_COLUMNS if c in df.columns and
+                                (columns is None or c not in columns)])
+
+    @classmethod
+    def read_chunks(cls, path, chunksize):
+        path = Path(path)
+        dates = sorted(p for p in path.glob("date=*") if p.is_dir())
+        # Date partitions hold whole days in order; read them one at a time
+        for part in dates or [path]:
+            df = cls.read(part)
+            for start in range(0, len(df), chunksize):
+                yield df.iloc[start:start + chunksize]
+
+    @classmethod
+    def write(cls, df, path):
+        cls.append(df, path, start_row=0)
+
+    @staticmethod
+    def append(df, path, start_row):
+        """
+        Adds ``df`` as new files in the dataset, rows numbered from
+        ``start_row`` so reads keep the order; 0 replaces the dataset.
+        """
+        path = Path(path)
+        if start_row == 0:
+            if path.is_dir():
+                shutil.rmtree(path)
+            elif path.exists():
+                path.unlink()
+
+        df = df.reset_index(drop=True)
+        df.index = df.index + start_row
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                values = df[col]
+                df[col] = values.where(values.isna(), values.astype(str)).astype("category")
+
+        partition_cols = []
+        if "timestamp" in df.columns:
+            df["timestamp"] = pd.to_datetime(df["timestamp"])
+            df["date"] = df["timestamp"].dt.strftime("%Y-%m-%d")
+            partition_cols.append("date")
+        if "agent_id" in df.columns:
+            df["agent_bucket"] = agent_buckets(df["agent_id"])
+            partition_cols.append("agent_bucket")
+
+        if partition_cols:
+            df.to_parquet(path, index=True, partition_cols=partition_cols,
+                          existing_data_behavior="overwrite_or_ignore")
+        elif start_row == 0:
+            df.to_parquet(path, index=True)
+        else:
+            raise ValueError(f"Cannot append to unpartitioned Parquet file {path}")
+
+
+BACKENDS = {
+    "csv": CsvBackend,
+    "parquet": ParquetBackend,
+}
+
+
+def backend_for(path):
+    suffix = Path(path).suffix.lower()
+    for backend in BACKENDS.values():
+        if backend.suffix == suffix:
+            return backend
+    raise ValueError(f"No storage backend for {path}")
+
+
+def read_table(path, columns=None):
+    """
+    Loads a dataset, optionally only the given columns, validated and cast
+    to the schema dtypes. Columns missing from the file are skipped rather
+    than raising.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Data not found: {path}")
+    return apply_schema(backend_for(path).read(path, columns=columns))
+
+
+def write_table(df, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    backend_for(path).write(df, path)
+
+
+def read_chunks(path, chunksize):
+    """Yields the raw rows of a dataset in order, about ``chunksize`` at a time."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Data not found: {path}")
+    yield from backend_for(path).read_chunks(path, chunksize)
+
+
+def append_table(df, path, start_row):
+    """Appends rows to a dataset; ``start_row`` 0 starts a new one."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    backend_for(path).append(df, path, start_row)
+
+
+def agent_buckets(agent_ids, n_buckets=None):
+    """Stable hash bucket of each agent id, used as a Parquet partition key."""
+    n_buckets = n_buckets or config.PARQUET_AGENT_BUCKETS
+    codes, uniques = pd.factorize(pd.Series(agent_ids).astype(str))
+    buckets = np.array([zlib.crc32(u.encode()) % n_buckets for u in uniques], dtype=np.int16)
+    return buckets[codes]
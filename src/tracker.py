@@ -0,0 +1,286 @@
+"""
+Multi-target tracking of anonymous detections.
+
+``MultiTargetTracker`` assigns detections that carry no agent id to
+tracks, one frame (timestamp) at a time:
+
+1. every live track is predicted to the frame's time with the constant
+   velocity model of ``kalman_filter``, on a local metric plane so noise is
+   in metres and the gate widens with the gap since the previous frame;
+2. candidate pairs come from a uniform grid of the predicted positions:
+   a detection only looks at tracks in its own and the 8 neighbouring
+   cells, then pairs outside the Mahalanobis gate are dropped;
+3. a pair whose track and detection have no other candidate is matched
+   directly; the contested rest is solved as one sparse assignment
+   problem (``min_weight_full_bipartite_matching``), so no dense cost
+   matrix is ever built, however crowded the frame;
+4. matched tracks are updated, unmatched tracks coast and are dropped once
+   ``max_coast_s`` seconds pass without a detection, and unmatched
+   detections start new tracks.
+
+Every step works on arrays of all tracks and detections of a frame, so the
+cost per frame grows with the number of detections, not with its square.
+
+    df = assign_tracks(detections)   # adds agent_id = "TRK_000001", ...
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+from src import config
+from src.geofence import METRES_PER_DEGREE
+from src.kalman_filter import kalman_predict, kalman_update
+
+TRACK_ID_PREFIX = "TRK_"
+
+
+def track_label(track_id):
+    return f"{TRACK_ID_PREFIX}{track_id:06d}"
+
+
+class MultiTargetTracker:
+    """
+    Args:
+        gate_m: largest distance between a predicted track and a detection
+            that can be paired; also the grid cell size
+        gate_chi2: Mahalanobis gate on the innovation (2 degrees of freedom)
+        measurement_noise_m: standard deviation of a detection's position
+        acceleration_noise_m_s2: standard deviation of the white-noise
+            acceleration driving the process noise
+        initial_speed_m_s: standard deviation of a new track's velocity
+        max_coast_s: seconds a track may go without a detection
+    """
+
+    def __init__(self, gate_m=None, gate_chi2=None, measurement_noise_m=None,
+                 acceleration_noise_m_s2=None, initial_speed_m_s=None, max_coast_s=None):
+        self.gate_m = float(gate_m if gate_m is not None else config.TRACK_GATE_M)
+        self.gate_chi2 = float(gate_chi2 if gate_chi2 is not None else config.TRACK_GATE_CHI2)
+        self.measurement_noise = float(
+            measurement_noise_m if measurement_noise_m is not None
+            else config.TRACK_MEASUREMENT_NOISE_M) ** 2
+        self.process_noise = float(
+            acceleration_noise_m_s2 if acceleration_noise_m_s2 is not None
+            else config.TRACK_ACCELERATION_NOISE_M_S2) ** 2
+        self.initial_speed = float(
+            initial_speed_m_s if initial_speed_m_s is not None else config.TRACK_INITIAL_SPEED_M_S)
+        self.max_coast_s = float(
+            max_coast_s if max_coast_s is not None else config.TRACK_MAX_COAST_S)
+
+        # Live tracks: state [north, east, v_north, v_east] in metres
+        self.x = np.zeros((0, 4))
+        self.P = np.zeros((0, 4, 4))
+        self.ids = np.zeros(0, dtype=np.int64)
+        # Seconds since each track's last detection
+        self.coast_s = np.zeros(0)
+        self.next_id = 1
+        self.origin = None
+        self.frames = 0
+        self.last_t_ns = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---- projection ----
+    def _project(self, lat, lon):
+        if self.origin is None:
+            self.origin = (float(np.mean(lat)), float(np.mean(lon)))
+        lat0, lon0 = self.origin
+        north = (lat - lat0) * METRES_PER_DEGREE
+        east = (lon - lon0) * METRES_PER_DEGREE * np.cos(np.radians(lat0))
+        return north, east
+
+    def positions(self):
+        """(lat, lon) of every live track's current estimate."""
+        if self.origin is None:
+            return np.zeros(0), np.zeros(0)
+        lat0, lon0 = self.origin
+        lat = lat0 + self.x[:, 0] / METRES_PER_DEGREE
+        lon = lon0 + self.x[:, 1] / (METRES_PER_DEGREE * np.cos(np.radians(lat0)))
+        return lat, lon
+
+    # ---- gating ----
+    def _cells(self, north, east):
+        return (np.floor(north / self.gate_m).astype(np.int64),
+                np.floor(east / self.gate_m).astype(np.int64))
+
+    @staticmethod
+    def _cell_key(row, col):
+        # Cells stay far below 2**31 for any plane that fits on the Earth
+        return (row << 32) + col
+
+    def _candidates(self, xp, Pp, north, east):
+        """Gated (track, detection, squared Mahalanobis distance) triples."""
+        empty = np.zeros(0, dtype=np.int64)
+        if len(xp) == 0 or len(north) == 0:
+            return empty, empty, np.zeros(0)
+
+        t_row, t_col = self._cells(xp[:, 0], xp[:, 1])
+        t_key = self._cell_key(t_row, t_col)
+        by_cell = np.argsort(t_key, kind="stable")
+        sorted_key = t_key[by_cell]
+
+        d_row, d_col = self._cells(north, east)
+        tracks, dets = [], []
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                key = self._cell_key(d_row + dr, d_col + dc)
+                lo = np.searchsorted(sorted_key, key, side="left")
+                hi = np.searchsorted(sorted_key, key, side="right")
+                n = hi - lo
+                if not n.any():
+                    continue
+                det = np.repeat(np.arange(len(north)), n)
+                # Offsets lo[d], lo[d] + 1, ... for every detection
+                offset = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+                tracks.append(by_cell[np.repeat(lo, n) + offset])
+                dets.append(det)
+        if not tracks:
+            return empty, empty, np.zeros(0)
+        t = np.concatenate(tracks)
+        d = np.concatenate(dets)
+
+        y0 = north[d] - xp[t, 0]
+        y1 = east[d] - xp[t, 1]
+        near = y0 * y0 + y1 * y1 <= self.gate_m ** 2
+        t, d, y0, y1 = t[near], d[near], y0[near], y1[near]
+
+        s00 = Pp[t, 0, 0] + self.measurement_noise
+        s01 = Pp[t, 0, 1]
+        s11 = Pp[t, 1, 1] + self.measurement_noise
+        det = s00 * s11 - s01 * s01
+        d2 = (s11 * y0 * y0 - 2 * s01 * y0 * y1 + s00 * y1 * y1) / det
+        inside = d2 <= self.gate_chi2
+        return t[inside], d[inside], d2[inside]
+
+    # ---- assignment ----
+    def _assign(self, t, d, cost, n_tracks, n_dets):
+        """
+        Minimum cost one-to-one matching of the gated pairs, where leaving a
+        track or a detection unmatched costs half the gate.
+        """
+        if len(t) == 0:
+            return t, d
+        # A pair whose track and detection have no other candidate is final
+        single = (np.bincount(t, minlength=n_tracks)[t] == 1) & (
+            np.bincount(d, minlength=n_dets)[d] == 1)
+        match_t, match_d = t[single], d[single]
+        t, d, cost = t[~single], d[~single], cost[~single]
+        if len(t) == 0:
+            return match_t, match_d
+
+        # Sparse assignment over the contested tracks and detections. Each
+        # gets a dummy partner for "unmatched", and dummies pair up along
+        # the real pairs, so a full matching always exists.
+        tracks, t = np.unique(t, return_inverse=True)
+        dets, d = np.unique(d, return_inverse=True)
+        nt, nd = len(tracks), len(dets)
+        miss = self.gate_chi2 / 2
+        rows = np.r_[t, np.arange(nt), nt + np.arange(nd), nt + d]
+        cols = np.r_[d, nd + np.arange(nt), np.arange(nd), nd + t]
+        # Every full matching has nt + nd edges, so the +1 keeping weights
+        # non-zero does not change which one is cheapest
+        weights = 1.0 + np.r_[cost, np.full(nt + nd, miss), np.zeros(len(t))]
+        graph = csr_matrix((weights, (rows, cols)), shape=(nt + nd, nd + nt))
+        row, col = min_weight_full_bipartite_matching(graph)
+        real = (row < nt) & (col < nd)
+        return np.r_[match_t, tracks[row[real]]], np.r_[match_d, dets[col[real]]]
+
+    # ---- frames ----
+    def step(self, lat, lon, dt=1.0, same_frame=False):
+        """
+        Assigns the detections of one frame, ``dt`` seconds after the
+        previous one, to tracks. Returns the track id of every detection.
+
+        With ``same_frame`` the detections are more of the previous frame
+        (a frame split across chunks): only tracks that found no detection
+        in it yet are candidates, and they are not predicted again.
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        north, east = self._project(lat, lon)
+        n_dets = len(north)
+
+        if same_frame:
+            xp, Pp = self.x.copy(), self.P.copy()
+            open_tracks = np.flatnonzero(self.coast_s > 0)
+        else:
+            xp, Pp = kalman_predict(self.x, self.P, self.process_noise,
+                                    np.full(len(self.ids), float(dt)))
+            open_tracks = np.arange(len(self.ids))
+        t, d, d2 = self._candidates(xp[open_tracks], Pp[open_tracks], north, east)
+        match_t, match_d = self._assign(t, d, d2, len(open_tracks), n_dets)
+        match_t = open_tracks[match_t]
+
+        x, P = xp, Pp
+        if len(match_t):
+            x[match_t], P[match_t] = kalman_update(
+                xp[match_t], Pp[match_t], north[match_d], east[match_d], self.measurement_noise)
+        coast_s = self.coast_s if same_frame else self.coast_s + dt
+        coast_s = coast_s.copy()
+        coast_s[match_t] = 0
+
+        det_ids = np.empty(n_dets, dtype=np.int64)
+        det_ids[match_d] = self.ids[match_t]
+
+        # Unmatched detections start tracks at rest, with a wide velocity prior
+        born = np.ones(n_dets, dtype=bool)
+        born[match_d] = False
+        born = np.flatnonzero(born)
+        new_ids = np.arange(self.next_id, self.next_id + len(born), dtype=np.int64)
+        self.next_id += len(born)
+        det_ids[born] = new_ids
+        new_x = np.zeros((len(born), 4))
+        new_x[:, 0] = north[born]
+        new_x[:, 1] = east[born]
+        new_P = np.zeros((len(born), 4, 4))
+        new_P[:, 0, 0] = new_P[:, 1, 1] = self.measurement_noise
+        new_P[:, 2, 2] = new_P[:, 3, 3] = self.initial_speed ** 2
+
+        alive = coast_s <= self.max_coast_s
+        self.x = np.concatenate([x[alive], new_x])
+        self.P = np.concatenate([P[alive], new_P])
+        self.ids = np.concatenate([self.ids[alive], new_ids])
+        self.coast_s = np.concatenate([coast_s[alive], np.zeros(len(born))])
+        self.frames += 1
+        return det_ids
+
+    def assign(self, df):
+        """
+        Track ids for the detections of ``df``, aligned with its rows.
+
+        Rows are grouped into frames by timestamp; frames must not go back
+        in time across calls. Rows at the previous call's last timestamp
+        continue that frame.
+        """
+        t_ns = pd.to_datetime(df["timestamp"]).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        ids = np.empty(len(df), dtype=np.int64)
+        if len(df) == 0:
+            return ids
+        if self.last_t_ns is not None and t_ns.min() < self.last_t_ns:
+            raise ValueError("Detections must arrive in timestamp order for tracking")
+
+        lat = df["latitude"].to_numpy(dtype=float)
+        lon = df["longitude"].to_numpy(dtype=float)
+        order = np.argsort(t_ns, kind="stable")
+        frame_starts = np.flatnonzero(np.r_[True, np.diff(t_ns[order]) != 0])
+        for rows in np.split(order, frame_starts[1:]):
+            t = int(t_ns[rows[0]])
+            last_t = self.last_t_ns if self.last_t_ns is not None else t
+            ids[rows] = self.step(lat[rows], lon[rows], dt=(t - last_t) / 1e9,
+                                  same_frame=t == self.last_t_ns)
+            self.last_t_ns = t
+        return ids
+
+
+def assign_tracks(df, tracker=None):
+    """
+    Returns ``df`` with an ``agent_id`` column naming the track of every
+    detection. Pass a ``tracker`` to carry tracks over between calls.
+    """
+    tracker = tracker if tracker is not None else MultiTargetTracker()
+    ids = tracker.assign(df)
+    df = df.copy()
+    df["agent_id"] = [track_label(i) for i in ids]
+    return df
@@ -1,5 +1,9 @@
+import argparse
+import json
+import time
 from pathlib import Path
 import joblib
+from joblib import Memory
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -8,23 +12,27 @@ from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.model_selection import train_test_split, cross_val_score # Added cross_val_score
+from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV # Added cross_val_score
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingGridSearchCV
 
 
 import config
+from src import instrumentation, storage
+from src.compiled_model import export_pipeline
+from src.incident_index import build_incident_index
+from src.model_artifact import save_artifact
+from src.model_registry import publish
 
-def train_elite_model():
-    # 1. Load data
-    raw_path = Path(config.raw_data_path())
-    df = pd.read_csv(raw_path)
+# RandomForest grid explored by --search
+PARAM_GRID = {
+    "classifier__n_estimators": [100, 200],
+    "classifier__max_depth": [6, 10, None],
+    "classifier__min_samples_leaf": [1, 5, 10],
+}
 
-    # 2. Define features
-    numeric_features = ["speed", "angle_change", "sensor_confidence"]
-    categorical_features = ["object_type", "terrain", "visibility"]
-    X = df[numeric_features + categorical_features]
-    y = df["label"]
 
-    # 3. Pipeline Setup
+def build_pipeline(numeric_features, categorical_features, memory=None):
     preprocessor = ColumnTransformer(
         transformers=[
             ("num", StandardScaler(), numeric_features),
@@ -33,7 +41,8 @@ def train_elite_model():
     )
 
     # UPDATED CLASSIFIER: Added constraints to fix 1.00 training accuracy
-    pipeline = Pipeline(
+    return Pipeline(
+        memory=memory,
         steps=[
             ("preprocessor", preprocessor),
             (
@@ -46,9 +55,190 @@ def train_elite_model():
                     n_jobs=-1,
                 ),
             ),
-        ]
+        ],
     )
 
+
+def search_hyperparameters(X, y, numeric_features, categorical_features,
+                           method="grid", param_grid=None, cv=5, n_jobs=-1, memory=None):
+    """
+    Cross-validates every RandomForest configuration of ``param_grid``.
+
+    Folds and configurations run across a process pool. With ``memory``
+    set, the ColumnTransformer fitted on each fold is cached and reused by
+    every configuration instead of being refitted. ``method="halving"``
+    uses successive halving: all configurations start on a small sample
+    and only the best third moves on to three times more data.
+
+    Returns (search, report) where report is JSON-serialisable.
+    """
+    pipeline = build_pipeline(numeric_features, categorical_features, memory=memory)
+    # The pool parallelises folds; trees are grown on one core per worker
+    pipeline.set_params(classifier__n_jobs=1)
+
+    param_grid = param_grid or PARAM_GRID
+    if method == "halving":
+        search = HalvingGridSearchCV(pipeline, param_grid, cv=cv, factor=3,
+                                     n_jobs=n_jobs, random_state=42)
+    elif method == "grid":
+        search = GridSearchCV(pipeline, param_grid, cv=cv, n_jobs=n_jobs)
+    else:
+        raise ValueError(f"Unknown search method: {method}")
+
+    start = time.perf_counter()
+    search.fit(X, y)
+    wall_s = time.perf_counter() - start
+
+    results = search.cv_results_
+    configurations = []
+    for i, params in enumerate(results["params"]):
+        entry = {
+            "params": {k.split("__", 1)[1]: v for k, v in params.items()},
+            "mean_score": float(results["mean_test_score"][i]),
+            "std_score": float(results["std_test_score"][i]),
+            "fit_time_s": float(results["mean_fit_time"][i] * cv),
+            "score_time_s": float(results["mean_score_time"][i] * cv),
+            "rank": int(results["rank_test_score"][i]),
+        }
+        if "n_resources" in results:
+            entry["n_samples"] = int(results["n_resources"][i])
+        configurations.append(entry)
+
+    report = {
+        "method": method,
+        "cv_folds": cv,
+        "wall_time_s": wall_s,
+        "best_params": {k.split("__", 1)[1]: v for k, v in search.best_params_.items()},
+        "best_score": float(search.best_score_),
+        "configurations": configurations,
+    }
+    return search, report
+
+
+def write_training_report(report, path=None):
+    path = Path(path) if path is not None else Path(config.training_report_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
+
+
+def data_window(df, source, n_trees):
+    """Metadata entry describing the data a batch of trees was grown on."""
+    window = {"source": str(source), "rows": int(len(df)), "n_trees": int(n_trees),
+              "start": None, "end": None}
+    if "timestamp" in df.columns and len(df):
+        timestamps = pd.to_datetime(df["timestamp"])
+        window["start"] = timestamps.min().isoformat()
+        window["end"] = timestamps.max().isoformat()
+    return window
+
+
+def load_model_metadata(path=None):
+    path = Path(path) if path is not None else Path(config.model_metadata_path())
+    if not path.exists():
+        return {"windows": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_model_metadata(metadata, path=None):
+    path = Path(path) if path is not None else Path(config.model_metadata_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(metadata, f, indent=2)
+    return path
+
+
+def prune_windows(windows, n_dropped):
+    """Removes ``n_dropped`` trees from the oldest data windows first."""
+    windows = [dict(w) for w in windows]
+    while n_dropped > 0 and windows:
+        take = min(n_dropped, windows[0]["n_trees"])
+        windows[0]["n_trees"] -= take
+        n_dropped -= take
+        if windows[0]["n_trees"] == 0:
+            windows.pop(0)
+    return windows
+
+
+def retrain_incremental(new_data_path, n_new_trees=20, max_trees=None):
+    """
+    Grows ``n_new_trees`` trees on a new data partition and adds them to
+    the saved forest, then drops the oldest trees beyond ``max_trees``
+    (default: the current forest size).
+
+    The fitted preprocessor is kept as is, so the cost depends only on the
+    size of the new partition. The data window of every tree batch is
+    kept in the model metadata.
+    """
+    numeric_features = ["speed", "angle_change", "sensor_confidence"]
+    categorical_features = ["object_type", "terrain", "visibility"]
+
+    pipeline = joblib.load(config.model_path())
+    forest = pipeline.named_steps["classifier"]
+    n_old = len(forest.estimators_)
+    max_trees = max_trees or n_old
+
+    df = storage.read_table(
+        new_data_path, columns=numeric_features + categorical_features + ["label", "timestamp"]
+    )
+    X = df[numeric_features + categorical_features]
+    y = df["label"]
+    missing = set(forest.classes_) - set(y.unique())
+    if missing:
+        raise ValueError(f"New partition has no samples of class(es) {sorted(missing)}")
+
+    # Only the new trees are fitted; the existing ones are kept untouched
+    Xt = pipeline.named_steps["preprocessor"].transform(X)
+    forest.set_params(warm_start=True, n_estimators=n_old + n_new_trees)
+    start = time.perf_counter()
+    with instrumentation.timer("incremental_fit", rows=len(df)):
+        forest.fit(Xt, y)
+    fit_s = time.perf_counter() - start
+
+    n_dropped = max(0, len(forest.estimators_) - max_trees)
+    forest.estimators_ = forest.estimators_[n_dropped:]
+    forest.set_params(warm_start=False, n_estimators=len(forest.estimators_))
+
+    metadata = load_model_metadata()
+    if not metadata["windows"]:
+        metadata["windows"] = [{"source": "initial", "rows": None, "n_trees": n_old,
+                                "start": None, "end": None}]
+    windows = metadata["windows"] + [data_window(df, new_data_path, n_new_trees)]
+    metadata["windows"] = prune_windows(windows, n_dropped)
+
+    joblib.dump(pipeline, config.model_path())
+    export_pipeline(pipeline, config.compiled_model_path())
+    save_model_metadata(metadata)
+    save_artifact(pipeline, config.model_artifact_dir(),
+                  metrics={"incremental_rows": int(len(df)), "incremental_fit_s": fit_s},
+                  windows=metadata["windows"])
+    version = publish(config.model_artifact_dir(), config.model_registry_dir())
+
+    print(f"Added {n_new_trees} trees on {len(df)} new rows in {fit_s:.1f}s, "
+          f"dropped {n_dropped} oldest; forest has {len(forest.estimators_)} trees; "
+          f"published as {version}")
+    return pipeline, metadata
+
+
+def train_elite_model(search=None, n_jobs=-1):
+    # 1. Define features
+    numeric_features = ["speed", "angle_change", "sensor_confidence"]
+    categorical_features = ["object_type", "terrain", "visibility"]
+
+    # 2. Load only the columns the model needs
+    raw_path = Path(config.raw_data_path())
+    df = storage.read_table(
+        raw_path, columns=numeric_features + categorical_features + ["label", "timestamp"]
+    )
+    X = df[numeric_features + categorical_features]
+    y = df["label"]
+
+    # 3. Pipeline Setup (fold preprocessing is cached on disk)
+    memory = str(Path(config.cache_dir()) / "pipeline")
+    pipeline = build_pipeline(numeric_features, categorical_features, memory=memory)
+
     # 4. Split Data
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.20, shuffle=True, random_state=42, stratify=y
@@ -57,15 +247,41 @@ def train_elite_model():
     # --------------------------------------------------
     # 5. NEW: CROSS-VALIDATION (5-Fold)
     # --------------------------------------------------
-    print("\n--- Running 5-Fold Cross-Validation ---")
-    # We run this on the training set to see how stable the model is
-    cv_scores = cross_val_score(pipeline, X_train, y_train, cv=5)
-    
+    if search:
+        print(f"\n--- Running {search} search with 5-Fold Cross-Validation ---")
+        with instrumentation.timer("search", rows=len(X_train)):
+            result, report = search_hyperparameters(
+                X_train, y_train, numeric_features, categorical_features,
+                method=search, n_jobs=n_jobs, memory=memory,
+            )
+        print(f"Best params: {report['best_params']} (CV {report['best_score']:.3f}) "
+              f"in {report['wall_time_s']:.1f}s")
+        pipeline.set_params(**result.best_params_)
+        best = result.best_index_
+        cv_scores = np.array([result.cv_results_[f"split{k}_test_score"][best] for k in range(5)])
+    else:
+        print("\n--- Running 5-Fold Cross-Validation ---")
+        # We run this on the training set to see how stable the model is
+        start = time.perf_counter()
+        # The pool parallelises folds; trees are grown on one core per
+        # worker, then the final fit gets every core back
+        pipeline.set_params(classifier__n_jobs=1)
+        with instrumentation.timer("cv", rows=len(X_train)):
+            cv_scores = cross_val_score(pipeline, X_train, y_train, cv=5, n_jobs=n_jobs)
+        pipeline.set_params(classifier__n_jobs=-1)
+        report = {"method": "cv", "cv_folds": 5, "wall_time_s": time.perf_counter() - start}
+
     print(f"CV Individual Scores: {cv_scores}")
     print(f"CV Mean Accuracy: {cv_scores.mean():.3f} (+/- {cv_scores.std() * 2:.3f})")
+    report["cv_scores"] = cv_scores.tolist()
 
     # 6. Final Fit and Evaluation
-    pipeline.fit(X_train, y_train)
+    start = time.perf_counter()
+    with instrumentation.timer("final_fit", rows=len(X_train)):
+        pipeline.fit(X_train, y_train)
+    report["final_fit_time_s"] = time.perf_counter() - start
+    # Cached fold transformers are only reused within this run
+    Memory(memory, verbose=0).clear(warn=False)
     
     train_acc = pipeline.score(X_train, y_train)
     test_acc = pipeline.score(X_test, y_test)
@@ -133,8 +349,50 @@ def train_elite_model():
     # --------------------------------------------------
     # 10. Save model
     # --------------------------------------------------
+    # The fold cache is only useful during training
+    pipeline.set_params(memory=None)
     joblib.dump(pipeline, config.model_path())
     print(f"Model saved successfully to: {config.model_path()}")
 
+    # Flat-array copy of the model for low-latency scoring
+    export_pipeline(pipeline, config.compiled_model_path())
+    print(f"Compiled model saved to: {config.compiled_model_path()}")
+
+    rf_model = pipeline.named_steps["classifier"]
+    windows = [data_window(df, raw_path, len(rf_model.estimators_))]
+    save_model_metadata({"windows": windows})
+
+    report["train_accuracy"] = train_acc
+    report["test_accuracy"] = test_acc
+
+    # Self-describing copy of the model that loads without sklearn
+    save_artifact(pipeline, config.model_artifact_dir(),
+                  metrics={"train_accuracy": float(train_acc), "test_accuracy": float(test_acc),
+                           "cv_scores": report["cv_scores"]},
+                  windows=windows)
+    print(f"Model artifact saved to: {config.model_artifact_dir()}")
+    version = publish(config.model_artifact_dir(), config.model_registry_dir())
+    print(f"Published to the model registry as {version}")
+
+    # Past tracks for the dashboard's similar-incident lookup
+    if Path(config.processed_data_path()).exists():
+        index = build_incident_index(config.processed_data_path(), config.incident_index_dir(),
+                                     config.model_artifact_dir())
+        print(f"Indexed {len(index):,} past tracks in {config.incident_index_dir()}")
+    print(f"Training report saved to: {write_training_report(report)}")
+
 if __name__ == "__main__":
-    train_elite_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the intrusion classifier")
+    parser.add_argument("--search", choices=["grid", "halving"],
+                        help="tune the RandomForest before the final fit")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="worker processes for CV")
+    parser.add_argument("--incremental", metavar="NEW_DATA",
+                        help="add trees grown on this partition to the saved model")
+    parser.add_argument("--new-trees", type=int, default=20)
+    parser.add_argument("--max-trees", type=int, help="forest size to prune back to")
+    args = parser.parse_args()
+    if args.incremental:
+        retrain_incremental(args.incremental, n_new_trees=args.new_trees, max_trees=args.max_trees)
+    else:
+        train_elite_model(search=args.search, n_jobs=args.n_jobs)
+    instrumentation.export()
\ No newline at end of file
@@ -1,9 +1,8 @@
 from pathlib import Path
 
 import matplotlib.pyplot as plt
-import pandas as pd
 
-from src import config
+from src import config, storage
 
 
 def plot_movements():
@@ -11,12 +10,17 @@ def plot_movements():
     file_path = Path(config.processed_data_path())
     if not file_path.exists():
         raise FileNotFoundError(f"Processed featured data not found: {file_path}")
-    df = pd.read_csv(file_path)
+    df = storage.read_table(file_path, columns=["agent_id", "latitude", "longitude", "label"])
 
     plt.figure(figsize=(12, 8))
 
-    # Draw a vertical line for the "Border" at Lon 70.0
-    plt.axvline(x=70.0, color="black", linestyle="--", label="Border Line")
+    # Draw the configured border lines and warning zones
+    for i, line in enumerate(config.BORDER_LINES):
+        lats, lons = zip(*line)
+        plt.plot(lons, lats, color="black", linestyle="--", label="Border Line" if i == 0 else None)
+    for i, zone in enumerate(config.WARNING_ZONES):
+        lats, lons = zip(*zone)
+        plt.fill(lons, lats, color="gold", alpha=0.3, label="Warning Zone" if i == 0 else None)
 
     # Plot each agent's path
     for agent_id in df["agent_id"].unique():
@@ -0,0 +1,165 @@
+"""
+Rolling time-window features of each agent's trajectory.
+
+For every fix and every window length ``w`` the statistics cover the same
+agent's fixes with timestamps in ``(t - w, t]``. Window starts are found
+with one ``searchsorted`` over a key that is monotonic across agents, and
+sums come from differences of cumulative sums, so the cost does not depend
+on how many fixes a window holds. Window maxima use a sparse table queried
+level by level.
+
+Per window, e.g. ``speed_mean_60s``:
+    speed_mean, speed_max      speed over the window's fixes (m/s)
+    accel                      net change of speed over the window (m/s^2)
+    heading_var                circular variance of the heading of moving
+                               fixes, 0 (straight) to 1 (no preferred heading)
+    tortuosity                 path length over straight-line displacement
+    dwell_near_border_s        time spent within ``config.BORDER_DWELL_M``
+                               of the border
+    approach_rate              decrease of border distance per second (m/s)
+"""
+
+import numpy as np
+
+from src import config
+
+WINDOW_STATS = ["speed_mean", "speed_max", "accel", "heading_var", "tortuosity",
+                "dwell_near_border_s", "approach_rate"]
+# Columns the window features are computed from
+WINDOW_INPUTS = ["timestamp", "lat_kalman", "lon_kalman", "speed_m_s", "direction",
+                 "dist_moved_m", "time_delta_s", "dist_to_border"]
+
+
+def window_columns(windows=None):
+    windows = windows or config.FEATURE_WINDOWS_S
+    return ["accel_m_s2"] + [f"{stat}_{w}s" for w in windows for stat in WINDOW_STATS]
+
+
+def _window_starts(t_ns, new_track, window_ns):
+    """Index of the first fix of each fix's window, never before its track start."""
+    n = len(t_ns)
+    track_start = np.maximum.accumulate(np.where(new_track, np.arange(n), 0))
+    # Times since track start and window starts are replaced by their dense
+    # rank, which keeps their order, so track_no * n_ranks + rank increases
+    # across tracks and stays far below int64 however long the tracks are
+    t_rel = t_ns - t_ns[track_start]
+    ranks = np.unique(np.r_[t_rel, t_rel - window_ns])
+    track_no = (np.cumsum(new_track) - 1).astype(np.int64) * len(ranks)
+    key = track_no + np.searchsorted(ranks, t_rel)
+    query = track_no + np.searchsorted(ranks, t_rel - window_ns)
+    left = np.searchsorted(key, query, side="right")
+    return np.maximum(left, track_start)
+
+
+def _range_max(values, left, right):
+    """max(values[left[i]:right[i] + 1]) for every i, with a sparse table."""
+    out = np.empty(len(left), dtype=values.dtype)
+    if len(left) == 0:
+        return out
+    length = right - left + 1
+    level_of = np.floor(np.log2(length)).astype(np.intp)
+    level = values
+    for k in range(int(level_of.max()) + 1):
+        if k:
+            half = 1 << (k - 1)
+            level = np.r_[np.maximum(level[:-half], level[half:]), level[-half:]]
+        rows = np.flatnonzero(level_of == k)
+        if len(rows):
+            out[rows] = np.maximum(level[left[rows]], level[right[rows] - (1 << k) + 1])
+    return out
+
+
+def _window_sum(cumsum, left, right):
+    """Sum of the values behind ``cumsum`` (with a leading 0) over left..right."""
+    return cumsum[right + 1] - cumsum[left]
+
+
+def window_features(t_ns, new_track, lat, lon, speed, direction, dist_moved, time_delta,
+                    dist_to_border, windows=None, dwell_m=None):
+    """
+    Rolling features for fixes grouped by agent and ordered in time.
+
+    Returns a dict of float32 arrays named as in ``window_columns``.
+    """
+    # preprocess_data imports this module, so its helper is imported late
+    from src.preprocess_data import haversine
+
+    windows = windows or config.FEATURE_WINDOWS_S
+    dwell_m = config.BORDER_DWELL_M if dwell_m is None else dwell_m
+    t_ns = np.asarray(t_ns, dtype=np.int64)
+    new_track = np.asarray(new_track, dtype=bool)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    speed = np.asarray(speed, dtype=np.float64)
+    direction = np.asarray(direction, dtype=np.float64)
+    dist_moved = np.asarray(dist_moved, dtype=np.float64)
+    time_delta = np.asarray(time_delta, dtype=np.float64)
+    dist_to_border = np.asarray(dist_to_border, dtype=np.float64)
+    n = len(t_ns)
+    idx = np.arange(n)
+
+    # Per-fix acceleration from the previous fix of the same agent
+    prev_speed = np.r_[speed[:1], speed[:-1]]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accel = np.where(new_track | (time_delta <= 0), 0.0, (speed - prev_speed) / time_delta)
+    out = {"accel_m_s2": accel.astype(np.float32)}
+
+    # Running sums; step quantities of a fix describe the step that ends at it
+    moving = (dist_moved > 0) & ~new_track
+    near = (dist_to_border <= dwell_m) & ~new_track
+
+    def cumsum(values):
+        return np.r_[0.0, np.cumsum(values)]
+
+    cs_speed = cumsum(speed)
+    cs_cos = cumsum(np.where(moving, np.cos(direction), 0.0))
+    cs_sin = cumsum(np.where(moving, np.sin(direction), 0.0))
+    cs_moving = cumsum(moving)
+    cs_path = cumsum(np.where(new_track, 0.0, dist_moved))
+    cs_dwell = cumsum(np.where(near, time_delta, 0.0))
+
+    for w in windows:
+        left = _window_starts(t_ns, new_track, int(w * 1e9))
+        count = idx - left + 1
+        dt = (t_ns - t_ns[left]) / 1e9
+        has_dt = dt > 0
+
+        # Steps inside the window are those ending at left + 1 .. i
+        steps = np.minimum(left + 1, idx)
+        n_moving = _window_sum(cs_moving, steps, idx) * (left < idx)
+        sum_cos = _window_sum(cs_cos, steps, idx) * (left < idx)
+        sum_sin = _window_sum(cs_sin, steps, idx) * (left < idx)
+        path = _window_sum(cs_path, steps, idx) * (left < idx)
+        dwell = _window_sum(cs_dwell, steps, idx) * (left < idx)
+        displacement = haversine(lat[left], lon[left], lat, lon)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stats = {
+                "speed_mean": _window_sum(cs_speed, left, idx) / count,
+                "speed_max": _range_max(speed, left, idx),
+                "accel": np.where(has_dt, (speed - speed[left]) / dt, 0.0),
+                "heading_var": np.where(
+                    n_moving > 0, 1.0 - np.hypot(sum_cos, sum_sin) / n_moving, 0.0),
+                "tortuosity": np.where(path > 0, path / np.maximum(displacement, 1.0), 1.0),
+                "dwell_near_border_s": dwell,
+                "approach_rate": np.where(
+                    has_dt, (dist_to_border[left] - dist_to_border) / dt, 0.0),
+            }
+        for stat in WINDOW_STATS:
+            out[f"{stat}_{w}s"] = stats[stat].astype(np.float32)
+    return out
+
+
+def add_window_features(df, windows=None):
+    """Adds the window features to a frame sorted by agent and timestamp."""
+    new_track = (df["agent_id"] != df["agent_id"].shift()).to_numpy()
+    features = window_features(
+        df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+        new_track,
+        df["lat_kalman"], df["lon_kalman"], df["speed_m_s"], df["direction"],
+        df["dist_moved_m"], df["time_delta_s"], df["dist_to_border"],
+        windows=windows,
+    )
+    for name, values in features.items():
+        df[name] = values
+    return df
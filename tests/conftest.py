@@ -0,0 +1,19 @@
+import pytest
+
+from src import config, train_model
+
+
+@pytest.fixture
+def project_root(tmp_path, monkeypatch):
+    """
+    Points every config path at ``tmp_path`` and runs there, so training
+    writes its models, registry versions and outputs outside the repo.
+    """
+    # train_model imports config as a top-level module, a second copy
+    for module in {config, train_model.config}:
+        monkeypatch.setattr(module, "PROJECT_ROOT", tmp_path)
+    monkeypatch.delenv("BORDER_CACHE_DIR", raising=False)
+    monkeypatch.chdir(tmp_path)
+    for name in ("data", "models", "visuals", "outputs"):
+        (tmp_path / name).mkdir()
+    return tmp_path
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from src.compiled_model import CompiledForest, compile_pipeline
+from src.train_model import build_pipeline
+
+NUMERIC = ["speed", "angle_change", "sensor_confidence"]
+CATEGORICAL = ["object_type", "terrain", "visibility"]
+
+
+def _data(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        {
+            "speed": rng.uniform(1, 9, n),
+            "angle_change": rng.uniform(0, 130, n),
+            "sensor_confidence": rng.uniform(0.55, 0.98, n),
+            "object_type": rng.choice(["Human", "Animal", "Vehicle", "Drone"], n),
+            "terrain": rng.choice(["Salt Flat", "Marshy", "Sandy"], n),
+            "visibility": rng.choice(["Clear", "Foggy", "Night"], n),
+        }
+    )
+    y = ((X["speed"] > 5) ^ (X["angle_change"] < 30)).astype(int)
+    return X, y
+
+
+def test_compiled_forest_reproduces_pipeline(tmp_path):
+    X, y = _data()
+    pipeline = build_pipeline(NUMERIC, CATEGORICAL)
+    pipeline.set_params(classifier__n_estimators=20)
+    pipeline.fit(X, y)
+
+    test, _ = _data(seed=1)
+    test.loc[0, "terrain"] = "Mountain"  # unseen category is ignored, as in OneHotEncoder
+
+    compiled = compile_pipeline(pipeline)
+    np.testing.assert_array_equal(compiled.predict_proba(test), pipeline.predict_proba(test))
+    np.testing.assert_array_equal(compiled.predict(test), pipeline.predict(test))
+
+    # Records score the same as a DataFrame, and the saved form loads back intact
+    path = tmp_path / "model.npz"
+    compiled.save(path)
+    loaded = CompiledForest.load(path)
+    records = test.iloc[:5].to_dict("records")
+    np.testing.assert_array_equal(loaded.predict_proba(records), compiled.predict_proba(test.iloc[:5]))
@@ -0,0 +1,79 @@
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.explainability import ShapExplainer, get_explainer
+from src.train_model import build_pipeline
+
+NUMERIC = ["speed", "angle_change", "sensor_confidence"]
+CATEGORICAL = ["object_type", "terrain", "visibility"]
+
+
+def _data(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        {
+            "speed": rng.uniform(1, 9, n),
+            "angle_change": rng.uniform(0, 130, n),
+            "sensor_confidence": rng.uniform(0.55, 0.98, n),
+            "object_type": rng.choice(["Human", "Drone"], n),
+            "terrain": rng.choice(["Sandy", "Marshy"], n),
+            "visibility": rng.choice(["Clear", "Night"], n),
+        }
+    )
+    return X, (X["speed"] > 5).astype(int)
+
+
+def _fit(X, y, n_estimators=10):
+    pipeline = build_pipeline(NUMERIC, CATEGORICAL)
+    pipeline.set_params(classifier__n_estimators=n_estimators, classifier__n_jobs=1)
+    return pipeline.fit(X, y)
+
+
+def test_batch_explanations_add_up_to_scores():
+    X, y = _data()
+    pipeline = _fit(X, y)
+
+    explainer = ShapExplainer(pipeline, background=X, background_size=20)
+    assert explainer.background.shape[0] == 20
+
+    result = explainer.explain(X.iloc[:30])
+    assert result["shap_values"].shape == (30, len(explainer.feature_names))
+    # SHAP values are additive: base value + contributions = model output
+    np.testing.assert_allclose(
+        result["expected_value"] + result["shap_values"].sum(axis=1),
+        result["threat_score"],
+        atol=1e-6,
+    )
+
+    records = json.loads(explainer.explain_json(X.iloc[:3], top_k=2))
+    assert len(records) == 3
+    assert all(len(r["contributions"]) == 2 for r in records)
+    assert "num__speed" in records[0]["contributions"]
+
+
+def test_shared_explainer_is_path_dependent_and_follows_the_saved_model(project_root):
+    X, y = _data()
+    joblib.dump(_fit(X, y), config.model_path())
+    explainer = get_explainer()
+    assert explainer.background is None
+    assert get_explainer() is explainer
+
+    result = explainer.explain(X.iloc[:10])
+    np.testing.assert_allclose(
+        result["expected_value"] + result["shap_values"].sum(axis=1),
+        result["threat_score"],
+        atol=1e-6,
+    )
+
+    # Retraining replaces the model file; the next call explains the new one
+    joblib.dump(_fit(X, y, n_estimators=5), config.model_path())
+    stat = os.stat(config.model_path())
+    os.utime(config.model_path(), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    rebuilt = get_explainer()
+    assert rebuilt is not explainer
+    assert rebuilt.classifier.n_estimators == 5
@@ -14,3 +14,36 @@ def test_generate_writes_file(tmp_path):
         out.unlink()
     except OSError:
         pass
+
+
+def test_simulate_agents_is_seeded_and_sized():
+    import pandas as pd
+
+    from src.generate_data import simulate_agents
+
+    a = pd.concat(simulate_agents(1000, n_agents=30, seed=7, shard_rows=300), ignore_index=True)
+    b = pd.concat(simulate_agents(1000, n_agents=30, seed=7, shard_rows=300), ignore_index=True)
+    assert len(a) == 1000
+    pd.testing.assert_frame_equal(a, b)
+
+    assert a["timestamp"].is_monotonic_increasing
+    assert a["agent_id"].nunique() == 30
+    # Balanced labels, one per agent
+    per_agent = a.groupby("agent_id", observed=True)["label"].agg(["min", "max"])
+    assert (per_agent["min"] == per_agent["max"]).all()
+    assert per_agent["min"].sum() == 15
+
+
+def test_simulated_tracks_continue_across_shards():
+    import numpy as np
+    import pandas as pd
+
+    from src.generate_data import simulate_agents
+    from src.preprocess_data import haversine
+
+    df = pd.concat(simulate_agents(5 * 40, n_agents=5, seed=1, shard_rows=5 * 7), ignore_index=True)
+    for _, track in df.groupby("agent_id", observed=True):
+        step = haversine(track["true_latitude"].to_numpy()[:-1], track["true_longitude"].to_numpy()[:-1],
+                         track["true_latitude"].to_numpy()[1:], track["true_longitude"].to_numpy()[1:])
+        # Each step moves the agent by its speed over one second
+        np.testing.assert_allclose(step, track["speed"].to_numpy()[1:], rtol=1e-2)
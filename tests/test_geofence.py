@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from src import geofence
+from src.geofence import GeofenceIndex, get_geofence
+from src.preprocess_data import calculate_features, haversine
+
+
+def _brute_force(fence, lat, lon):
+    x, y = fence.project(lat, lon)
+    dist2, _ = fence._to_segments(x, y, slice(None))
+    return np.sqrt(dist2.min(axis=1))
+
+
+def test_grid_matches_brute_force_on_and_off_grid():
+    fence = GeofenceIndex(
+        [[[23.75, 68.60], [23.80, 68.75], [23.85, 68.85]], [[24.0, 68.0], [24.1, 68.1]]],
+        cell_size_m=500.0,
+        margin_m=5_000.0,
+    )
+    rng = np.random.default_rng(0)
+    lat = 23.9 + rng.uniform(-0.5, 0.5, 5000)
+    lon = 68.5 + rng.uniform(-0.8, 0.8, 5000)
+
+    out = fence.query(lat, lon)
+    np.testing.assert_allclose(out["dist_to_border_m"], _brute_force(fence, lat, lon), rtol=1e-12)
+
+
+def test_grid_is_built_in_chunks_of_cells(monkeypatch):
+    lines = [[[23.75, 68.60], [23.80, 68.75], [23.85, 68.85]], [[24.0, 68.0], [24.1, 68.1]]]
+    whole = GeofenceIndex(lines, cell_size_m=500.0, margin_m=5_000.0)
+    # A handful of cells per step, the last one short
+    monkeypatch.setattr(geofence, "GRID_CHUNK_PAIRS", 7 * 3)
+    chunked = GeofenceIndex(lines, cell_size_m=500.0, margin_m=5_000.0)
+    np.testing.assert_array_equal(chunked._cells, whole._cells)
+
+
+def test_distance_side_and_warning_zone():
+    fence = GeofenceIndex(
+        [[[23.0, 69.0], [24.0, 69.0]]],
+        [[[23.0, 69.0], [24.0, 69.0], [24.0, 68.99], [23.0, 68.99]]],
+    )
+    lat = np.array([23.5, 23.5, 23.5, 24.5])
+    lon = np.array([69.01, 68.995, 68.9, 69.0])
+    out = fence.query(lat, lon)
+
+    # Metres, close to the great-circle distance at this scale
+    expected = haversine(23.5, 69.0, lat[:3], lon[:3])
+    np.testing.assert_allclose(out["dist_to_border_m"][:3], expected, rtol=1e-3)
+    np.testing.assert_allclose(out["dist_to_border_m"][3], haversine(24.0, 69.0, 24.5, 69.0), rtol=1e-3)
+
+    # The line runs north: east of it is its right side
+    assert out["border_side"].tolist()[:3] == [-1, 1, 1]
+    assert out["in_warning_zone"].tolist() == [False, True, False, False]
+
+
+def test_features_use_configured_geofence():
+    df = pd.DataFrame(
+        {
+            "timestamp": pd.date_range("2025-01-01", periods=4, freq="s"),
+            "latitude": [23.83, 23.797, 23.70, 23.90],
+            "longitude": [68.80, 68.747, 68.40, 69.20],
+            "agent_id": "ID_001",
+        }
+    )
+    out = calculate_features(df)
+    expected = get_geofence().query(out["latitude"], out["longitude"])
+
+    # Stored as float32 by the schema
+    np.testing.assert_array_equal(out["dist_to_border"], expected["dist_to_border_m"].astype(np.float32))
+    assert out["border_side"].tolist()[:2] == [1, -1]
+    assert out["in_warning_zone"].tolist() == [False, True, False, False]
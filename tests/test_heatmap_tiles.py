@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.heatmap_tiles import TileStore, cell_center, cell_xy
+
+START = pd.Timestamp("2025-01-01")
+
+
+def _fixes(n, hours=24, seed=0):
+    """Scored fixes around the border over ``hours``."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "lat": 23.8 + rng.normal(0, 0.2, n),
+        "lon": 68.7 + rng.normal(0, 0.2, n),
+        "timestamp": START + pd.to_timedelta(rng.uniform(0, hours * 3600, n), unit="s"),
+        "threat_score": rng.random(n),
+    })
+
+
+def _add(store, fixes):
+    return store.add(fixes["lat"], fixes["lon"], fixes["timestamp"], fixes["threat_score"])
+
+
+def _brute_force(store, fixes, zoom, bbox=None, start=None, end=None):
+    """Aggregates the raw fixes in view the way ``query`` should."""
+    level = store.level_for_zoom(zoom)
+    x, y = cell_xy(fixes["lat"], fixes["lon"], level)
+    bucket = store.bucket(fixes["timestamp"])
+    keep = np.ones(len(fixes), dtype=bool)
+    if bbox is not None:
+        (bx0, bx1), (by1, by0) = cell_xy([bbox[0], bbox[2]], [bbox[1], bbox[3]], level)
+        keep &= (x >= bx0) & (x <= bx1) & (y >= by0) & (y <= by1)
+    if start is not None:
+        keep &= bucket >= store.bucket(start)[0]
+    if end is not None:
+        keep &= bucket <= store.bucket(end)[0]
+    view = pd.DataFrame({"x": x, "y": y, "score": fixes["threat_score"].to_numpy()})[keep]
+    view["hot"] = view["score"] > store.hot_score
+    return view.groupby(["y", "x"]).agg(count=("score", "size"), score_sum=("score", "sum"),
+                                        hot=("hot", "sum")).reset_index()
+
+
+def _check(store, fixes, zoom, **view):
+    got = store.query(zoom, **view)
+    expected = _brute_force(store, fixes, zoom, **view)
+    level = store.level_for_zoom(zoom)
+    x, y = cell_xy(got["lat"], got["lon"], level)
+    got = got.assign(x=x, y=y).sort_values(["y", "x"]).reset_index(drop=True)
+
+    assert len(got) == len(expected)
+    np.testing.assert_array_equal(got[["y", "x"]].to_numpy(), expected[["y", "x"]].to_numpy())
+    np.testing.assert_array_equal(got["count"], expected["count"])
+    np.testing.assert_array_equal(got["hot"], expected["hot"])
+    np.testing.assert_allclose(got["score_sum"], expected["score_sum"], rtol=1e-9)
+    np.testing.assert_allclose(got["score_mean"], got["score_sum"] / got["count"])
+    return got
+
+
+def test_cell_centres_round_trip():
+    lat = np.array([-60.0, 0.0, 23.8, 70.0])
+    lon = np.array([-179.9, 0.0, 68.7, 179.9])
+    for level in (4, 12, 18):
+        x, y = cell_xy(lat, lon, level)
+        assert (x >= 0).all() and (x < 1 << level).all()
+        c_lat, c_lon = cell_center(x, y, level)
+        np.testing.assert_array_equal(cell_xy(c_lat, c_lon, level), (x, y))
+    # A cell splits into its four children one level down
+    x, y = cell_xy(lat, lon, 12)
+    x2, y2 = cell_xy(lat, lon, 13)
+    np.testing.assert_array_equal((x2 >> 1, y2 >> 1), (x, y))
+
+
+@pytest.mark.parametrize("zoom", [2, 9, 13, 20])
+def test_queries_match_the_raw_fixes(zoom):
+    fixes = _fixes(20_000)
+    store = TileStore(merge_rows=5_000)
+    for chunk in np.array_split(fixes.index, 7):
+        _add(store, fixes.loc[chunk])
+    # Part merged into the levels, part still pending
+    assert store._pending and len(store.levels[store.max_level]["keys"])
+
+    _check(store, fixes, zoom)
+    _check(store, fixes, zoom, bbox=(23.7, 68.6, 23.95, 68.9))
+    got = _check(store, fixes, zoom, bbox=(23.5, 68.5, 24.0, 69.0),
+                 start=START + pd.Timedelta(hours=3), end=START + pd.Timedelta(hours=10))
+    assert got["count"].sum() < len(fixes)
+
+
+def test_merge_is_incremental():
+    first, second = _fixes(3_000), _fixes(3_000, seed=1)
+    store = TileStore(merge_rows=10**9)
+    _add(store, first)
+    store.merge()
+    _add(store, second)
+    store.merge()
+
+    once = TileStore(merge_rows=10**9)
+    _add(once, pd.concat([first, second], ignore_index=True))
+    once.merge()
+    for level in store.levels_range():
+        for name, values in store.levels[level].items():
+            np.testing.assert_allclose(values, once.levels[level][name])
+    assert store.fixes == once.fixes == 6_000
+
+
+def test_drop_before_keeps_recent_buckets():
+    fixes = _fixes(5_000, hours=48)
+    store = TileStore()
+    _add(store, fixes)
+    cutoff = START + pd.Timedelta(hours=24)
+    store.drop_before(cutoff)
+    recent = fixes[store.bucket(fixes["timestamp"]) >= store.bucket(cutoff)[0]]
+    assert store.query(10)["count"].sum() == len(recent)
+
+
+def test_save_and_load(tmp_path):
+    fixes = _fixes(4_000)
+    store = TileStore(bucket_s=900, min_level=6, max_level=14)
+    _add(store, fixes)
+    store.save(tmp_path / "tiles")
+
+    loaded = TileStore.load(tmp_path / "tiles")
+    assert (loaded.bucket_s, loaded.min_level, loaded.max_level) == (900, 6, 14)
+    assert loaded.fixes == 4_000
+    view = {"bbox": (23.6, 68.5, 24.0, 68.9), "start": START + pd.Timedelta(hours=2)}
+    pd.testing.assert_frame_equal(loaded.query(11, **view), store.query(11, **view))
+
+    _add(loaded, _fixes(10, seed=2))
+    assert loaded.query(11)["count"].sum() == 4_010
+
+    with pytest.raises(FileNotFoundError):
+        TileStore.load(tmp_path / "missing")
+
+
+def test_timestamps_before_the_epoch_are_rejected():
+    with pytest.raises(ValueError):
+        TileStore().add([23.8], [68.7], [pd.Timestamp("1960-01-01")], [0.9])
+
+
+def test_query_reads_only_the_cells_in_view():
+    fixes = _fixes(50_000, hours=168)
+    store = TileStore()
+    _add(store, fixes)
+    store.merge()
+    view = {"bbox": (23.75, 68.65, 23.85, 68.75), "start": START + pd.Timedelta(hours=144)}
+    before = store.query(11, **view)
+    scanned = store.last_scanned
+    assert 0 < scanned < len(store.levels[store.level_for_zoom(11)]["keys"]) / 10
+
+    # Many more fixes outside the view leave the work for it unchanged
+    far = _fixes(200_000, hours=168, seed=3).assign(lat=lambda d: d["lat"] + 2.0)
+    _add(store, far)
+    store.merge()
+    pd.testing.assert_frame_equal(store.query(11, **view), before)
+    assert store.last_scanned == scanned
@@ -0,0 +1,148 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.incident_index import (CATEGORICAL, IncidentIndex, alert_aggregates,
+                                build_incident_index, track_aggregates)
+
+
+def _tracks(n, seed=0):
+    """Rows shaped like ``track_aggregates`` output."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "track_id": [f"ID_{seed}_{i:05d}" for i in range(n)],
+        "source": "test",
+        "speed_mean": rng.uniform(1, 9, n),
+        "speed_max": rng.uniform(5, 15, n),
+        "angle_change_mean": rng.uniform(0, 120, n),
+        "sensor_confidence_mean": rng.uniform(0.55, 0.98, n),
+        "dist_to_border_min": rng.uniform(0, 60_000, n),
+        "warning_share": rng.random(n),
+        "object_type": rng.choice(["Human", "Vehicle", "Drone"], n),
+        "terrain": rng.choice(["Sandy", "Marshy"], n),
+        "visibility": rng.choice(["Clear", "Night"], n),
+        "label": rng.integers(0, 2, n),
+    })
+
+
+def _alerts(n, seed=9):
+    tracks = _tracks(n, seed)
+    return pd.DataFrame({
+        "track_id": tracks["track_id"],
+        "speed": tracks["speed_mean"],
+        "angle_change": tracks["angle_change_mean"],
+        "sensor_confidence": tracks["sensor_confidence_mean"],
+        "dist_to_border_m": tracks["dist_to_border_min"],
+        "in_warning_zone": tracks["warning_share"] > 0.5,
+        **{c: tracks[c] for c in CATEGORICAL},
+    })
+
+
+def _brute_force(index, alerts, k):
+    vectors = index.vectorize(pd.concat([index.incidents], ignore_index=True))
+    queries = index.vectorize(alert_aggregates(alerts))
+    dist = np.sqrt(((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2))
+    return np.sort(dist, axis=1)[:, :k]
+
+
+def test_track_aggregates():
+    featured = pd.DataFrame({
+        "agent_id": ["A", "A", "A", "B"],
+        "timestamp": pd.to_datetime(["2025-01-01 00:00:00", "2025-01-01 00:00:01",
+                                     "2025-01-01 00:00:02", "2025-01-01 00:00:00"]),
+        "speed": [1.0, 3.0, 5.0, 7.0],
+        "angle_change": [0.0, np.pi / 2, np.pi / 2, 0.0],
+        "sensor_confidence": [0.6, 0.8, 1.0, 0.9],
+        "dist_to_border": [500.0, 300.0, 100.0, 9_000.0],
+        "in_warning_zone": [False, True, True, False],
+        "label": [0, 1, 1, 0],
+        "object_type": ["Human", "Human", "Drone", "Vehicle"],
+        "terrain": ["Sandy"] * 4,
+        "visibility": ["Clear"] * 4,
+    })
+    out = track_aggregates(featured, source="f.csv").set_index("track_id")
+
+    a = out.loc["A"]
+    assert a["speed_mean"] == 3.0 and a["speed_max"] == 5.0
+    assert a["angle_change_mean"] == pytest.approx(60.0)
+    assert a["dist_to_border_min"] == 100.0
+    assert a["warning_share"] == pytest.approx(2 / 3)
+    assert a["object_type"] == "Human" and a["label"] == 1 and a["n_fixes"] == 3
+    assert out.loc["B", "source"] == "f.csv"
+
+
+def test_queries_match_brute_force_across_inserts():
+    index = IncidentIndex.from_tracks(_tracks(500), rebuild_rows=100)
+    alerts = _alerts(20)
+    np.testing.assert_allclose(index.query(alerts, k=5)["distance"].to_numpy().reshape(20, 5),
+                               _brute_force(index, alerts, 5), rtol=1e-9)
+
+    # Stays in the buffer, then triggers a rebuild
+    ids = index.add(_tracks(60, seed=1))
+    assert list(ids) == list(range(500, 560))
+    assert index._buffer
+    np.testing.assert_allclose(index.query(alerts, k=5)["distance"].to_numpy().reshape(20, 5),
+                               _brute_force(index, alerts, 5), rtol=1e-9)
+    index.add(_tracks(200, seed=2))
+    assert not index._buffer and len(index) == 760
+
+    found = index.query(alerts.head(1), k=3)
+    assert list(found["rank"]) == [1, 2, 3]
+    assert found["distance"].is_monotonic_increasing
+    row = index.incidents.set_index("incident_id").loc[found["incident_id"].iloc[0]]
+    assert row["track_id"] == found["track_id"].iloc[0]
+
+
+def test_unknown_categories_and_small_indexes():
+    categories = {"object_type": ["Human", "Vehicle", "Drone"], "terrain": ["Sandy", "Marshy"],
+                  "visibility": ["Clear", "Night"]}
+    index = IncidentIndex.from_tracks(_tracks(3), categories=categories)
+    alerts = _alerts(2).assign(object_type="Submarine")
+    vectors = pd.DataFrame(index.vectorize(alert_aggregates(alerts)), columns=index.feature_names())
+    assert vectors.filter(like="object_type_").to_numpy().sum() == 0
+    assert (vectors.filter(like="terrain_").sum(axis=1) == 1).all()
+    # Asking for more neighbours than incidents returns them all
+    assert len(index.query(alerts, k=10)) == 2 * 3
+
+
+def test_save_and_load(tmp_path):
+    index = IncidentIndex.from_tracks(_tracks(300), rebuild_rows=1_000)
+    index.add(_tracks(10, seed=1))
+    alerts = _alerts(5)
+    expected = index.query(alerts, k=4)
+
+    index.save(tmp_path / "incident_index")
+    loaded = IncidentIndex.load(tmp_path / "incident_index")
+    assert isinstance(loaded._tree_vectors, np.memmap)
+    got = loaded.query(alerts, k=4)
+    np.testing.assert_allclose(got["distance"], expected["distance"])
+    assert list(got["track_id"]) == list(expected["track_id"])
+
+    loaded.add(_tracks(5, seed=3))
+    assert len(loaded) == 315
+
+
+def test_build_from_featured_data(tmp_path):
+    from src.generate_data import simulate_agents
+    from src.preprocess_data import calculate_features
+
+    featured = calculate_features(pd.concat(simulate_agents(2_000, n_agents=40, seed=0)))
+    path = tmp_path / "featured.csv"
+    featured.to_csv(path, index=False)
+
+    index = build_incident_index(path, tmp_path / "incident_index", model_dir=tmp_path / "no_model")
+    assert len(index) == 40
+    assert set(index.incidents["source"]) == {"featured.csv"}
+    assert IncidentIndex.load(tmp_path / "incident_index").query(_alerts(1), k=2)["rank"].tolist() == [1, 2]
+
+
+def test_query_latency():
+    index = IncidentIndex.from_tracks(_tracks(50_000))
+    index.add(_tracks(2_000, seed=1))
+    alerts = _alerts(10)
+    index.query(alerts, k=5)
+    start = time.perf_counter()
+    index.query(alerts, k=5)
+    assert time.perf_counter() - start < 0.1
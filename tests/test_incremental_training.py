@@ -0,0 +1,70 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import train_model
+from src.train_model import build_pipeline, load_model_metadata, retrain_incremental
+
+NUMERIC = ["speed", "angle_change", "sensor_confidence"]
+CATEGORICAL = ["object_type", "terrain", "visibility"]
+
+
+def _partition(n, day, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "timestamp": pd.Timestamp(day) + pd.to_timedelta(np.arange(n), unit="s"),
+            "speed": rng.uniform(1, 9, n),
+            "angle_change": rng.uniform(0, 130, n),
+            "sensor_confidence": rng.uniform(0.55, 0.98, n),
+            "object_type": rng.choice(["Human", "Drone"], n),
+            "terrain": rng.choice(["Sandy", "Marshy"], n),
+            "visibility": rng.choice(["Clear", "Night"], n),
+        }
+    )
+    df["label"] = (df["speed"] > 5).astype(int)
+    return df
+
+
+@pytest.fixture
+def saved_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_model.config, "PROJECT_ROOT", tmp_path)
+    pipeline = build_pipeline(NUMERIC, CATEGORICAL)
+    pipeline.set_params(classifier__n_estimators=10)
+    df = _partition(200, "2025-01-01", 0)
+    pipeline.fit(df[NUMERIC + CATEGORICAL], df["label"])
+    train_model.config.models_dir().mkdir()
+    joblib.dump(pipeline, train_model.config.model_path())
+    return pipeline
+
+
+def test_incremental_retrain_appends_and_prunes(tmp_path, saved_model):
+    old_trees = saved_model.named_steps["classifier"].estimators_
+    new_path = tmp_path / "day2.csv"
+    _partition(120, "2025-01-02", 1).to_csv(new_path, index=False)
+
+    pipeline, metadata = retrain_incremental(new_path, n_new_trees=4, max_trees=10)
+    trees = pipeline.named_steps["classifier"].estimators_
+
+    # The four oldest trees make room for four trees grown on the new day
+    assert len(trees) == 10
+    for kept, old in zip(trees[:6], old_trees[4:]):
+        np.testing.assert_array_equal(kept.tree_.threshold, old.tree_.threshold)
+    assert [w["n_trees"] for w in metadata["windows"]] == [6, 4]
+    assert metadata["windows"][1]["start"].startswith("2025-01-02")
+    assert load_model_metadata() == metadata
+
+    reloaded = joblib.load(train_model.config.model_path())
+    assert len(reloaded.named_steps["classifier"].estimators_) == 10
+    assert train_model.config.compiled_model_path().exists()
+
+
+def test_incremental_retrain_needs_both_classes(tmp_path, saved_model):
+    new_path = tmp_path / "day2.csv"
+    df = _partition(50, "2025-01-02", 2)
+    df["label"] = 0
+    df.to_csv(new_path, index=False)
+
+    with pytest.raises(ValueError):
+        retrain_incremental(new_path, n_new_trees=4)
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import socket
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src.heatmap_tiles import TileStore
+from src.ingest import FixBuffer, IngestService, parse_fix
+from src.scoring import TrackScorer
+
+
+class SpeedModel:
+    def predict_proba(self, X):
+        p = np.clip(X["speed"].to_numpy() / 100.0, 0, 1)
+        return np.column_stack([1 - p, p])
+
+
+def _fix_lines(n=60, agents=("A", "B", "C")):
+    rng = np.random.default_rng(1)
+    lines = []
+    for i in range(n):
+        lines.append(json.dumps({
+            "agent_id": agents[i % len(agents)],
+            "timestamp": (pd.Timestamp("2025-01-01") + pd.Timedelta(seconds=i)).isoformat(),
+            "latitude": 23.8 + rng.normal(0, 1e-4),
+            "longitude": 68.7 + rng.normal(0, 1e-4),
+            "sensor_confidence": 0.9,
+            "object_type": "Human",
+            "terrain": "Sandy",
+            "visibility": "Clear",
+        }))
+    return lines
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_ring_buffer_keeps_latest_rows_in_order():
+    buffer = FixBuffer(capacity=5)
+    scored = pd.DataFrame({name: np.arange(7.0) for name in FixBuffer.NUMERIC})
+    for name in FixBuffer.TEXT:
+        scored[name] = [f"x{i}" for i in range(7)]
+    scored["timestamp"] = pd.date_range("2025-01-01", periods=7, freq="s")
+
+    seq = buffer.append(scored.iloc[:3])
+    assert seq == 3
+    buffer.append(scored.iloc[3:])
+
+    rows, seq = buffer.since(0)
+    assert seq == 7 and len(buffer) == 5
+    assert rows["threat_score"].tolist() == [2.0, 3.0, 4.0, 5.0, 6.0]
+
+    newer, _ = buffer.since(5)
+    assert newer["agent_id"].tolist() == ["x5", "x6"]
+
+
+def test_parse_fix_rejects_bad_lines():
+    assert parse_fix("not json") is None
+    assert parse_fix(json.dumps({"agent_id": "A"})) is None
+    assert parse_fix(_fix_lines(1)[0])["agent_id"] == "A"
+
+    good = json.loads(_fix_lines(1)[0])
+    for field, value in [("latitude", "23.8N"), ("longitude", None), ("sensor_confidence", True),
+                         ("latitude", float("nan")), ("timestamp", "yesterday"), ("timestamp", 1.5j)]:
+        assert parse_fix(json.dumps({**good, field: value}, default=str)) is None, (field, value)
+
+
+def test_full_queue_rejects_lines():
+    service = IngestService(scorer=TrackScorer(model=SpeedModel()))
+    service._queue = asyncio.Queue(maxsize=2)
+    for line in _fix_lines(3):
+        service.submit(line)
+    assert (service.received, service.rejected) == (2, 1)
+
+
+class FlakyScorer(TrackScorer):
+    """Fails the first batch it sees, then scores normally."""
+
+    def __init__(self):
+        super().__init__(model=SpeedModel())
+        self.calls = 0
+
+    def score_batch(self, fixes):
+        self.calls += 1
+        if self.calls == 1:
+            raise ValueError("sensor glitch")
+        return super().score_batch(fixes)
+
+
+def test_bad_lines_and_failed_batches_do_not_stop_scoring():
+    lines = _fix_lines(10)
+    poisoned = json.dumps({**json.loads(lines[0]), "latitude": "not a number"})
+    service = IngestService(scorer=FlakyScorer(), buffer=FixBuffer(100), batch_rows=1,
+                            max_delay_s=0.01)
+    service.start(port=0)
+    try:
+        with socket.create_connection(service.address) as conn:
+            conn.sendall(("\n".join([poisoned] + lines) + "\n").encode())
+        _wait_for(lambda: service.buffer.seq == 9)
+    finally:
+        service.stop()
+
+    stats = service.stats()
+    assert stats["rejected"] == 1 and stats["received"] == 10
+    assert stats["failed_batches"] == 1 and stats["batches"] == 9
+    assert isinstance(service.error, ValueError)
+
+
+def test_socket_and_file_feeds_are_scored(tmp_path):
+    lines = _fix_lines()
+    feed = tmp_path / "feed.jsonl"
+    tiles = TileStore()
+    service = IngestService(scorer=TrackScorer(model=SpeedModel()), buffer=FixBuffer(100),
+                            batch_rows=16, max_delay_s=0.01, tiles=tiles,
+                            tiles_path=tmp_path / "tiles")
+    service.start(port=0, path=feed)
+    try:
+        with socket.create_connection(service.address) as conn:
+            conn.sendall(("\n".join(lines[:30]) + "\nnot json\n").encode())
+        _wait_for(lambda: service.buffer.seq == 30)
+
+        # A line written in two parts is only read once complete
+        with open(feed, "a") as f:
+            f.write("\n".join(lines[30:]) + "\n" + lines[0][:10])
+            f.flush()
+        _wait_for(lambda: service.buffer.seq == 60)
+    finally:
+        service.stop()
+
+    assert service.stats()["rejected"] == 1
+    latest = service.buffer.latest_tracks()
+    assert sorted(latest["agent_id"]) == ["A", "B", "C"]
+
+    # Same scores as scoring the whole feed in one batch
+    expected = TrackScorer(model=SpeedModel()).score_batch(
+        pd.DataFrame([json.loads(line) for line in lines]))
+    rows, _ = service.buffer.since(0)
+    np.testing.assert_allclose(rows["threat_score"], expected["threat_score"], atol=1e-12)
+
+    # Every scored fix also lands in the heatmap tiles
+    cells = tiles.query(12)
+    assert cells["count"].sum() == 60
+    assert cells["score_sum"].sum() == pytest.approx(expected["threat_score"].sum())
+    # stop() saved them for the next start
+    assert TileStore.load(tmp_path / "tiles").query(12)["count"].sum() == 60
+
+
+def test_restart_does_not_replay_the_feed_file(tmp_path):
+    lines = _fix_lines(20)
+    feed = tmp_path / "feed.jsonl"
+    feed.write_text("\n".join(lines[:10]) + "\n")
+    service = IngestService(scorer=TrackScorer(model=SpeedModel()), buffer=FixBuffer(100),
+                            batch_rows=16, max_delay_s=0.01)
+    service.start(path=feed)
+    try:
+        with open(feed, "a") as f:
+            f.write("\n".join(lines[10:]) + "\n")
+        _wait_for(lambda: service.buffer.seq == 10)
+        time.sleep(0.2)
+    finally:
+        service.stop()
+
+    assert service.stats()["received"] == 10
+    assert service.latest_t == pd.Timestamp(json.loads(lines[-1])["timestamp"])
+    rows, _ = service.buffer.since(0)
+    assert rows["timestamp"].min() == pd.Timestamp(json.loads(lines[10])["timestamp"])
+
+
+def test_tiles_are_trimmed_and_saved_periodically(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "HEATMAP_SAVE_S", 0)
+    monkeypatch.setattr(config, "HEATMAP_RETENTION_H", 1)
+    service = IngestService(scorer=TrackScorer(model=SpeedModel()), tiles=TileStore(),
+                            tiles_path=tmp_path / "tiles")
+    old = [json.loads(line) for line in _fix_lines(5)]
+    new = [{**fix, "timestamp": "2025-01-01T05:00:00"} for fix in old]
+    service._score(old)
+    assert TileStore.load(tmp_path / "tiles").query(12)["count"].sum() == 5
+    service._score(new)
+    assert TileStore.load(tmp_path / "tiles").query(12)["count"].sum() == 5
+    assert service.latest_t == pd.Timestamp("2025-01-01T05:00:00")
@@ -0,0 +1,103 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import instrumentation
+from src.preprocess_data import calculate_features
+
+
+@pytest.fixture
+def enabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation.config, "PROJECT_ROOT", tmp_path)
+    instrumentation.reset()
+    instrumentation.configure(True)
+    yield
+    instrumentation.configure(False)
+    instrumentation.reset()
+
+
+def test_disabled_hooks_record_nothing(tmp_path):
+    instrumentation.configure(False)
+    instrumentation.reset()
+
+    @instrumentation.timed("work")
+    def work(x):
+        return x + 1
+
+    with instrumentation.timer("stage", rows=10):
+        assert work(1) == 2
+    instrumentation.count("events")
+
+    assert instrumentation.snapshot() == {"stages": {}, "counters": {}}
+    assert instrumentation.export(tmp_path / "metrics.prom") is None
+
+    # A disabled timer costs a function call and a shared no-op context
+    n = 100_000
+    start = time.perf_counter()
+    for _ in range(n):
+        with instrumentation.timer("hot"):
+            pass
+    assert (time.perf_counter() - start) / n < 5e-6
+
+
+def test_timers_counters_and_exports(enabled, tmp_path):
+    @instrumentation.timed()
+    def fit():
+        time.sleep(0.01)
+
+    fit()
+    fit()
+    with instrumentation.timer("kalman", rows=100) as t:
+        t.rows += 50
+    instrumentation.count("chunks", 3)
+
+    stages = instrumentation.snapshot()["stages"]
+    assert stages["fit"]["calls"] == 2
+    assert stages["fit"]["seconds"] >= 0.02
+    assert stages["kalman"]["rows"] == 150
+    assert stages["kalman"]["peak_rss_mb"] > 0
+
+    prom = instrumentation.export(tmp_path / "metrics.prom", fmt="prometheus").read_text()
+    assert 'border_stage_calls_total{stage="fit"} 2' in prom
+    assert 'border_stage_rows_total{stage="kalman"} 150' in prom
+    assert 'border_events_total{name="chunks"} 3' in prom
+
+    path = tmp_path / "metrics.jsonl"
+    instrumentation.export(path, fmt="jsonl")
+    instrumentation.export(path, fmt="jsonl")
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 2
+    assert records[0]["stages"]["kalman"]["rows"] == 150
+    assert records[0]["counters"] == {"chunks": 3}
+
+
+def test_profile_of_chosen_stage(enabled, tmp_path, monkeypatch):
+    monkeypatch.setenv("BORDER_PROFILE_STAGE", "kalman")
+    with instrumentation.timer("kalman"):
+        sum(range(1000))
+    with instrumentation.timer("other"):
+        pass
+
+    profiles = tmp_path / "outputs" / "profiles"
+    assert [p.name for p in profiles.iterdir()] == ["kalman.prof"]
+
+
+def test_preprocessing_reports_its_stages(enabled):
+    rng = np.random.default_rng(0)
+    n = 200
+    raw = pd.DataFrame(
+        {
+            "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(n), unit="s"),
+            "latitude": 23.8 + rng.normal(0, 1e-4, n).cumsum(),
+            "longitude": 68.7 + rng.normal(0, 1e-4, n).cumsum(),
+            "agent_id": rng.choice(["ID_000", "ID_001"], n),
+        }
+    )
+    calculate_features(raw)
+
+    stages = instrumentation.snapshot()["stages"]
+    for name in ("kalman", "motion_features", "geofence"):
+        assert stages[name]["rows"] == n
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import kalman_filter
+from src.kalman_filter import apply_kalman_filter, apply_kalman_filter_reference
+
+
+def _random_tracks(n_rows=300, n_agents=7, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2025-01-01")
+    return pd.DataFrame(
+        {
+            "agent_id": rng.choice([f"ID_{i:03d}" for i in range(n_agents)], n_rows),
+            "timestamp": start + pd.to_timedelta(rng.permutation(n_rows), unit="s"),
+            "latitude": 23.8 + rng.normal(0, 0.01, n_rows).cumsum(),
+            "longitude": 69.5 + rng.normal(0, 0.01, n_rows).cumsum(),
+        }
+    )
+
+
+def test_batched_filter_matches_reference():
+    df = _random_tracks()
+    # A single-fix agent is filtered to its own measurement
+    df.loc[len(df)] = ["ID_999", pd.Timestamp("2025-01-01"), 24.0, 70.0]
+
+    out = apply_kalman_filter(df)
+    ref = apply_kalman_filter_reference(df)
+
+    assert out.index.equals(df.index)
+    np.testing.assert_allclose(out["lat_kalman"], ref["lat_kalman"], rtol=0, atol=1e-10)
+    np.testing.assert_allclose(out["lon_kalman"], ref["lon_kalman"], rtol=0, atol=1e-10)
+    assert out.loc[len(df) - 1, "lat_kalman"] == 24.0
+
+
+def test_batched_filter_requires_agent_id():
+    df = _random_tracks().drop(columns="agent_id")
+    with pytest.raises(KeyError):
+        apply_kalman_filter(df)
+
+
+def _reference_adaptive(lat, lon, t_s, confidence, rts=False):
+    """One track through explicit per-fix matrices, with an optional RTS pass."""
+    noise_m = np.maximum(kalman_filter.SENSOR_NOISE_M * (1 - confidence), kalman_filter.MIN_SENSOR_NOISE_M)
+    accel = kalman_filter.ACCELERATION_NOISE_M_S2
+    M = kalman_filter.METRES_PER_DEGREE
+    H = np.eye(2, 4)
+    x = np.array([lat[0], lon[0], 0.0, 0.0])
+    P = np.eye(4) * kalman_filter.INITIAL_COVARIANCE
+    xs, Ps, xps, Pps, Fs = [], [], [], [], []
+    for k in range(len(lat)):
+        dt = t_s[k] - t_s[k - 1] if k else 0.0
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        scale = np.array([1 / M, 1 / (M * np.cos(np.radians(lat[k])))])
+        G = np.array([[dt ** 2 / 2, dt]])
+        Q = np.zeros((4, 4))
+        for axis, (pos, vel) in enumerate([(0, 2), (1, 3)]):
+            block = (accel * scale[axis]) ** 2 * G.T @ G
+            Q[np.ix_([pos, vel], [pos, vel])] = block
+        R = np.diag((noise_m[k] * scale) ** 2)
+
+        xp, Pp = F @ x, F @ P @ F.T + Q
+        K = Pp @ H.T @ np.linalg.inv(H @ Pp @ H.T + R)
+        x = xp + K @ (np.array([lat[k], lon[k]]) - H @ xp)
+        P = (np.eye(4) - K @ H) @ Pp
+        xs.append(x), Ps.append(P), xps.append(xp), Pps.append(Pp), Fs.append(F)
+
+    if rts:
+        for k in range(len(lat) - 2, -1, -1):
+            C = Ps[k] @ Fs[k + 1].T @ np.linalg.inv(Pps[k + 1])
+            xs[k] = xs[k] + C @ (xs[k + 1] - xps[k + 1])
+    return np.array(xs)[:, :2]
+
+
+@pytest.mark.parametrize("rts", [False, True])
+def test_adaptive_filter_and_smoother_match_reference(rts):
+    df = _random_tracks(n_rows=200, n_agents=4)
+    rng = np.random.default_rng(1)
+    # Irregular gaps and a missing confidence
+    df["timestamp"] = pd.Timestamp("2025-01-01") + pd.to_timedelta(
+        rng.permutation(np.cumsum(rng.choice([1, 2, 7], len(df)))), unit="s")
+    df["sensor_confidence"] = rng.uniform(0.55, 0.98, len(df))
+    df.loc[3, "sensor_confidence"] = np.nan
+
+    out = apply_kalman_filter(df, adaptive=True, smooth=rts)
+    for _, track in df.sort_values("timestamp").groupby("agent_id"):
+        confidence = track["sensor_confidence"].fillna(kalman_filter.DEFAULT_CONFIDENCE).to_numpy()
+        t_s = (track["timestamp"] - track["timestamp"].iloc[0]).dt.total_seconds().to_numpy()
+        ref = _reference_adaptive(track["latitude"].to_numpy(), track["longitude"].to_numpy(),
+                                  t_s, confidence, rts=rts)
+        np.testing.assert_allclose(out.loc[track.index, ["lat_kalman", "lon_kalman"]], ref,
+                                   rtol=0, atol=1e-10)
+
+
+def test_confident_fixes_pull_the_estimate_harder():
+    base = {"agent_id": "A", "latitude": 23.8, "longitude": 69.5, "sensor_confidence": 0.95}
+    rows = [dict(base, timestamp=pd.Timestamp("2025-01-01") + pd.Timedelta(seconds=i)) for i in range(10)]
+    # A 200 m jump on the last fix
+    rows[-1]["latitude"] += 200 / kalman_filter.METRES_PER_DEGREE
+    df = pd.DataFrame(rows)
+
+    shift = {}
+    for confidence in (0.95, 0.2):
+        df.loc[9, "sensor_confidence"] = confidence
+        out = apply_kalman_filter(df, adaptive=True)
+        shift[confidence] = out.loc[9, "lat_kalman"] - 23.8
+    assert shift[0.95] > 2 * shift[0.2] > 0
+
+
+def test_adaptive_smoothing_is_closer_to_the_truth():
+    from src.generate_data import simulate_agents
+
+    df = pd.concat(simulate_agents(20_000, n_agents=50, seed=2), ignore_index=True)
+    df = df[np.random.default_rng(0).random(len(df)) > 0.3]
+
+    def rmse(out):
+        return np.sqrt(((out["lat_kalman"] - out["true_latitude"]) ** 2
+                        + (out["lon_kalman"] - out["true_longitude"]) ** 2).mean())
+
+    fixed = rmse(apply_kalman_filter(df, adaptive=False))
+    adaptive = rmse(apply_kalman_filter(df, adaptive=True))
+    smoothed = rmse(apply_kalman_filter(df, adaptive=True, smooth=True))
+    assert smoothed < adaptive < fixed
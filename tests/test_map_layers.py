@@ -0,0 +1,63 @@
+import pandas as pd
+
+from src import config, map_layers
+
+
+def _tracks():
+    return pd.DataFrame(
+        {
+            "track_id": [1000, 1001, 1002],
+            "lat": [23.80, 23.81, 23.82],
+            "lon": [68.70, 68.71, 68.72],
+            "object_type": ["Drone", "Human", "Vehicle"],
+            "threat_score": [0.91, 0.2, 0.75],
+            "is_intruder": [1, 0, 1],
+            "dist_to_border_m": [120.4, 5000.0, 880.6],
+            "in_warning_zone": [True, False, False],
+        }
+    )
+
+
+def test_tracks_geojson_is_built_from_columns():
+    geojson = map_layers.tracks_geojson(_tracks())
+
+    assert geojson["type"] == "FeatureCollection"
+    first, second, _ = geojson["features"]
+    assert first["geometry"] == {"type": "Point", "coordinates": [68.70, 23.80]}
+    assert first["properties"]["track_id"] == "1000"
+    assert first["properties"]["border_m"] == 120
+    assert first["properties"]["warning_zone"] == "YES"
+    assert first["properties"]["color"] == map_layers.INTRUDER_COLOR
+    assert second["properties"]["color"] == map_layers.NORMAL_COLOR
+
+
+def test_track_layer_is_one_geojson_layer():
+    layer = map_layers.track_layer(_tracks())
+    kinds = [type(child).__name__ for child in layer._children.values()]
+    assert kinds.count("GeoJson") == 1
+    assert kinds.count("HeatMap") == 1
+
+    empty = map_layers.track_layer(_tracks().iloc[:0])
+    assert not empty._children
+
+
+def test_base_map_draws_configured_geofences():
+    html = map_layers.base_map("Satellite").get_root().render()
+    for lat, lon in config.BORDER_LINES[0]:
+        assert f"{lat}, {lon}" in html
+    assert "Tactical Legend" in html
+
+
+def test_track_layer_heat_from_tile_cells():
+    cells = pd.DataFrame({"lat": [23.8, 23.9, 24.0], "lon": [68.7, 68.8, 68.9],
+                          "count": [10, 4, 3], "score_sum": [8.0, 1.0, 0.5],
+                          "score_mean": [0.8, 0.25, 0.17], "hot": [8, 2, 0]})
+    assert map_layers.heat_points(cells) == [[23.8, 68.7, 1.0], [23.9, 68.8, 0.25]]
+
+    # Heat comes from the cells even when no track passes the filter
+    layer = map_layers.track_layer(_tracks().iloc[:0], heat_cells=cells)
+    kinds = [type(child).__name__ for child in layer._children.values()]
+    assert kinds == ["HeatMap"]
+    # Cells without hot fixes draw no heat
+    layer = map_layers.track_layer(_tracks(), heat_cells=cells.iloc[2:])
+    assert [type(child).__name__ for child in layer._children.values()] == ["GeoJson"]
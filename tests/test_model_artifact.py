@@ -0,0 +1,103 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.compiled_model import compile_pipeline
+from src.model_artifact import (
+    feature_importances,
+    load_artifact,
+    read_input_features,
+    read_manifest,
+    save_artifact,
+)
+from src.train_model import build_pipeline
+
+NUMERIC = ["speed", "angle_change", "sensor_confidence"]
+CATEGORICAL = ["object_type", "terrain", "visibility"]
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _data(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        {
+            "speed": rng.uniform(1, 9, n),
+            "angle_change": rng.uniform(0, 130, n),
+            "sensor_confidence": rng.uniform(0.55, 0.98, n),
+            "object_type": rng.choice(["Human", "Animal", "Vehicle", "Drone"], n),
+            "terrain": rng.choice(["Salt Flat", "Marshy", "Sandy"], n),
+            "visibility": rng.choice(["Clear", "Foggy", "Night"], n),
+        }
+    )
+    y = ((X["speed"] > 5) ^ (X["angle_change"] < 30)).astype(int)
+    return X, y
+
+
+@pytest.fixture
+def fitted():
+    X, y = _data()
+    pipeline = build_pipeline(NUMERIC, CATEGORICAL)
+    pipeline.set_params(classifier__n_estimators=15)
+    return pipeline.fit(X, y)
+
+
+def test_artifact_round_trip_is_memory_mapped(fitted, tmp_path):
+    path = tmp_path / "model"
+    windows = [{"source": "raw.csv", "rows": 300, "n_trees": 15, "start": None, "end": None}]
+    save_artifact(fitted, path, metrics={"test_accuracy": 0.9}, windows=windows)
+
+    model = load_artifact(path)
+    test, _ = _data(seed=1)
+    np.testing.assert_array_equal(model.predict_proba(test), fitted.predict_proba(test))
+    np.testing.assert_array_equal(model.predict(test), fitted.predict(test))
+
+    # The walk runs directly on the mapped files
+    assert isinstance(model._children, np.memmap)
+    assert isinstance(model._feature, np.memmap)
+    assert isinstance(model.value, np.memmap)
+
+    manifest = read_manifest(path)
+    assert manifest["metrics"] == {"test_accuracy": 0.9}
+    assert manifest["windows"] == windows
+    assert manifest["model"]["n_trees"] == 15
+    assert read_input_features(path) == (NUMERIC, CATEGORICAL)
+
+    importances = feature_importances(model)
+    assert list(importances) == NUMERIC + CATEGORICAL
+    assert sum(importances.values()) == pytest.approx(1.0)
+    assert feature_importances(fitted) == pytest.approx(importances)
+
+
+def test_artifact_overwrite_replaces_previous(fitted, tmp_path):
+    path = tmp_path / "model"
+    save_artifact(fitted, path, metrics={"version": 1})
+    save_artifact(fitted, path, metrics={"version": 2})
+
+    assert read_manifest(path)["metrics"] == {"version": 2}
+    assert [p.name for p in tmp_path.iterdir()] == ["model"]
+
+
+def test_artifact_loads_without_sklearn(fitted, tmp_path):
+    path = tmp_path / "model"
+    save_artifact(fitted, path)
+    expected = compile_pipeline(fitted).predict_proba(_data(n=5)[0])
+
+    X = _data(n=5)[0].to_dict("records")
+    code = (
+        "import json, sys\n"
+        "from src.model_artifact import load_artifact\n"
+        f"model = load_artifact({str(path)!r})\n"
+        f"proba = model.predict_proba(json.loads({json.dumps(json.dumps(X))}))\n"
+        "print(json.dumps({'sklearn': any(m.startswith('sklearn') for m in sys.modules),"
+        " 'proba': proba.tolist()}))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True,
+                         text=True, check=True)
+    result = json.loads(out.stdout)
+    assert not result["sklearn"]
+    np.testing.assert_array_equal(np.array(result["proba"]), expected)
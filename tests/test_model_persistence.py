@@ -7,7 +7,7 @@ from src import config
 from src.train_model import train_elite_model
 
 
-def test_model_pipeline_persistence(tmp_path):
+def test_model_pipeline_persistence(project_root):
     # Create minimal dataset expected by train_elite_model
     rows = []
     for i in range(40):
@@ -38,10 +38,3 @@ def test_model_pipeline_persistence(tmp_path):
     pipeline = joblib.load(model_file)
     assert hasattr(pipeline, "predict")
     assert hasattr(pipeline, "named_steps")
-
-    # Clean up
-    try:
-        model_file.unlink()
-        raw.unlink()
-    except Exception:
-        pass
@@ -0,0 +1,163 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.model_artifact import save_artifact
+from src.model_registry import (ModelRegistry, list_versions, pin_version, pinned_version,
+                                publish)
+from src.train_model import build_pipeline
+
+NUMERIC = ["speed", "angle_change", "sensor_confidence"]
+CATEGORICAL = ["object_type", "terrain", "visibility"]
+
+
+def _data(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        {
+            "speed": rng.uniform(1, 9, n),
+            "angle_change": rng.uniform(0, 130, n),
+            "sensor_confidence": rng.uniform(0.55, 0.98, n),
+            "object_type": rng.choice(["Human", "Animal", "Vehicle", "Drone"], n),
+            "terrain": rng.choice(["Salt Flat", "Marshy", "Sandy"], n),
+            "visibility": rng.choice(["Clear", "Foggy", "Night"], n),
+        }
+    )
+    y = ((X["speed"] > 5) ^ (X["angle_change"] < 30)).astype(int)
+    return X, y
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    """Two artifacts of differently seeded forests."""
+    X, y = _data()
+    paths = []
+    for seed in (0, 1):
+        pipeline = build_pipeline(NUMERIC, CATEGORICAL)
+        pipeline.set_params(classifier__n_estimators=10, classifier__random_state=seed)
+        path = tmp_path / f"artifact{seed}"
+        save_artifact(pipeline.fit(X, y), path)
+        paths.append(path)
+    return paths
+
+
+def test_publish_numbers_complete_versions(artifacts, tmp_path):
+    root = tmp_path / "registry"
+    assert publish(artifacts[0], root) == "v0001"
+    assert publish(artifacts[1], root) == "v0002"
+
+    # Half-copied or foreign directories are not versions
+    (root / ".publish-123").mkdir()
+    (root / "v0003").mkdir()
+    assert list_versions(root) == ["v0001", "v0002"]
+
+
+def test_auto_rollout_swaps_without_failing_requests(artifacts, tmp_path):
+    root = tmp_path / "registry"
+    publish(artifacts[0], root)
+    registry = ModelRegistry(root, rollout="auto")
+    registry.refresh()
+    assert registry.version == "v0001"
+
+    X, _ = _data(n=50, seed=2)
+    errors = []
+    done = threading.Event()
+
+    def serve():
+        while not done.is_set():
+            try:
+                assert registry.predict_proba(X).shape == (50, 2)
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+    client = threading.Thread(target=serve)
+    client.start()
+    try:
+        publish(artifacts[1], root)
+        assert registry.refresh()
+    finally:
+        done.set()
+        client.join()
+
+    assert not errors
+    assert registry.version == "v0002"
+    assert registry.swaps == 2
+    assert registry.candidate is None
+
+
+def test_shadow_rollout_compares_then_promotes(artifacts, tmp_path):
+    root = tmp_path / "registry"
+    publish(artifacts[0], root)
+    registry = ModelRegistry(root, rollout="shadow")
+    registry.refresh()
+    publish(artifacts[1], root)
+    registry.refresh()
+
+    # The candidate is scored on the same batches but the live model answers
+    assert registry.version == "v0001"
+    assert registry.candidate.version == "v0002"
+    X, _ = _data(n=40, seed=3)
+    live = registry.live.model.predict_proba(X)
+    np.testing.assert_array_equal(registry.predict_proba(X), live)
+    registry.predict_proba(X)
+
+    shadow = registry.stats()["shadow"]
+    candidate = registry.candidate.model.predict_proba(X)
+    assert shadow["batches"] == 2 and shadow["rows"] == 80
+    assert shadow["agreement"] == pytest.approx(
+        np.mean(candidate.argmax(axis=1) == live.argmax(axis=1)))
+    assert shadow["live_p95_ms"] is not None and shadow["candidate_p95_ms"] is not None
+
+    # predict answers from the live model without shadow-scoring the batch again
+    classes = registry.live.model.classes_
+    np.testing.assert_array_equal(registry.predict(X), classes[live.argmax(axis=1)])
+    assert registry.stats()["shadow"]["rows"] == 80
+
+    registry.promote()
+    assert pinned_version(root) == "v0002"
+    assert registry.version == "v0002"
+    assert registry.candidate is None
+    assert registry.stats()["shadow"] is None
+
+
+def test_publish_keeps_newest_and_pinned_versions(artifacts, tmp_path):
+    root = tmp_path / "registry"
+    for _ in range(3):
+        publish(artifacts[0], root, keep=2)
+    assert list_versions(root) == ["v0002", "v0003"]
+
+    pin_version("v0002", root)
+    for _ in range(3):
+        publish(artifacts[1], root, keep=2)
+    assert list_versions(root) == ["v0002", "v0005", "v0006"]
+    assert not any(path.name.startswith(".") for path in root.iterdir() if path.is_dir())
+
+
+def test_broken_version_keeps_serving_previous(artifacts, tmp_path):
+    root = tmp_path / "registry"
+    publish(artifacts[0], root)
+    registry = ModelRegistry(root, rollout="auto")
+    registry.refresh()
+
+    broken = root / publish(artifacts[1], root)
+    (broken / "value.npy").write_bytes(b"not an array")
+    assert not registry.refresh()
+    assert registry.version == "v0001"
+    assert "v0002" in registry.stats()["load_errors"]
+
+
+def test_watcher_thread_picks_up_new_versions(artifacts, tmp_path):
+    root = tmp_path / "registry"
+    publish(artifacts[0], root)
+    registry = ModelRegistry(root, rollout="auto", poll_s=0.01).start()
+    try:
+        publish(artifacts[1], root)
+        deadline = time.monotonic() + 5.0
+        while registry.version != "v0002" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert registry.version == "v0002"
+    finally:
+        registry.stop()
@@ -0,0 +1,49 @@
+from math import atan2, pi
+
+import numpy as np
+import pandas as pd
+
+from src.preprocess_data import calculate_features, haversine, motion_features
+
+
+def test_motion_features_match_scalar_maths():
+    lat = np.array([10.0, 10.001, 10.001, 11.0, 11.002])
+    lon = np.array([20.0, 20.001, 20.003, 21.0, 21.0])
+    t_ns = np.array([0, 10, 10, 0, 4], dtype=np.int64) * 1_000_000_000
+    new_track = np.array([True, False, False, True, False])
+
+    out = motion_features(lat, lon, t_ns, new_track)
+
+    # Second fix of the first agent
+    dist = haversine(10.0, 20.0, 10.001, 20.001)
+    assert np.isclose(out["dist_moved_m"][1], dist)
+    assert np.isclose(out["speed_m_s"][1], dist / 10.0)
+    assert np.isclose(out["direction"][1], atan2(np.radians(0.001), np.radians(0.001)))
+
+    # Zero time delta keeps speed at zero; heading turns from 45 to 0 degrees
+    assert out["time_delta_s"][2] == 0.0
+    assert out["speed_m_s"][2] == 0.0
+    assert np.isclose(out["angle_change"][2], pi / 4)
+
+    # Nothing carries over between agents
+    for values in out.values():
+        assert values[3] == 0.0
+    assert np.isclose(out["time_delta_s"][4], 4.0)
+
+
+def test_calculate_features_agents_are_independent():
+    df = pd.DataFrame(
+        {
+            "agent_id": ["b", "a", "b", "a"],
+            "timestamp": ["2025-01-01T00:00:05", "2025-01-01T00:00:00",
+                          "2025-01-01T00:00:00", "2025-01-01T00:00:05"],
+            "latitude": [11.001, 10.0, 11.0, 10.001],
+            "longitude": [21.0, 20.0, 21.0, 20.0],
+        }
+    )
+    out = calculate_features(df)
+
+    assert list(out["agent_id"]) == ["a", "a", "b", "b"]
+    assert list(out["time_delta_s"]) == [0.0, 5.0, 0.0, 5.0]
+    assert out.loc[[0, 2], "dist_moved_m"].eq(0).all()
+    assert out.loc[[1, 3], "dist_moved_m"].gt(0).all()
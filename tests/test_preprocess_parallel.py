@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from src.preprocess_data import calculate_features, calculate_features_parallel
+
+
+def _raw_tracks(n_rows=500, n_agents=9, seed=5):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.permutation(n_rows), unit="s"),
+            "latitude": 23.8 + rng.normal(0, 1e-4, n_rows).cumsum(),
+            "longitude": 69.5 + rng.normal(0, 1e-4, n_rows).cumsum(),
+            "agent_id": rng.choice([f"ID_{i:03d}" for i in range(n_agents)], n_rows),
+            "label": rng.integers(0, 2, n_rows),
+        }
+    )
+
+
+def test_parallel_matches_serial():
+    raw = _raw_tracks()
+    # A single-fix agent
+    raw.loc[len(raw)] = [pd.Timestamp("2025-01-01"), 24.0, 70.0, "ID_999", 1]
+
+    serial = calculate_features(raw.copy())
+    parallel = calculate_features_parallel(raw.copy(), n_workers=3)
+
+    pd.testing.assert_frame_equal(parallel, serial)
+
+
+def test_parallel_handles_empty_frame():
+    raw = _raw_tracks().iloc[:0]
+    out = calculate_features_parallel(raw.copy(), n_workers=2)
+    assert out.empty
+    assert "speed_m_s" in out.columns
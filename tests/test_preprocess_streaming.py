@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import storage
+from src.preprocess_data import StreamingPreprocessor, calculate_features, preprocess_streaming
+
+
+def _raw_tracks(n_rows=400, n_agents=6, seed=3):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "timestamp": (pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(n_rows), unit="s")).astype(str),
+            "latitude": 23.8 + rng.normal(0, 1e-4, n_rows).cumsum(),
+            "longitude": 69.5 + rng.normal(0, 1e-4, n_rows).cumsum(),
+            "agent_id": rng.choice([f"ID_{i:03d}" for i in range(n_agents)], n_rows),
+            "label": rng.integers(0, 2, n_rows),
+        }
+    )
+
+
+def test_streaming_matches_batch(tmp_path):
+    raw = _raw_tracks()
+    raw_path = tmp_path / "raw.csv"
+    out_path = tmp_path / "featured.csv"
+    raw.to_csv(raw_path, index=False)
+
+    rows = preprocess_streaming(raw_path, out_path, chunksize=37)
+    assert rows == len(raw)
+
+    batch = calculate_features(raw.copy())
+    streamed = storage.read_table(out_path)
+    streamed = streamed.sort_values(["agent_id", "timestamp"]).reset_index(drop=True)
+
+    assert list(streamed.columns) == list(batch.columns)
+    for col in ["lat_kalman", "lon_kalman"]:
+        np.testing.assert_allclose(streamed[col], batch[col], rtol=1e-9, atol=1e-9)
+    # float32 columns: equal up to float32 rounding
+    for col in ["dist_moved_m", "time_delta_s", "speed_m_s", "direction"]:
+        np.testing.assert_allclose(streamed[col], batch[col], rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(streamed["angle_change"], batch["angle_change"], rtol=1e-9, atol=1e-9)
+
+
+def test_streaming_parquet_matches_batch(tmp_path):
+    pytest.importorskip("pyarrow")
+    raw = _raw_tracks()
+    # Starts before midnight, so the raw dataset has two date partitions
+    raw["timestamp"] = (pd.Timestamp("2025-01-01 23:57:00")
+                        + pd.to_timedelta(np.arange(len(raw)), unit="s")).astype(str)
+    raw_path = tmp_path / "raw.parquet"
+    out_path = tmp_path / "featured.parquet"
+    storage.write_table(raw, raw_path)
+
+    rows = preprocess_streaming(raw_path, out_path, chunksize=37)
+    assert rows == len(raw)
+
+    batch = calculate_features(raw.copy())
+    streamed = storage.read_table(out_path)
+    assert sorted(p.name for p in out_path.iterdir()) == ["date=2025-01-01", "date=2025-01-02"]
+    streamed = streamed.sort_values(["agent_id", "timestamp"]).reset_index(drop=True)
+    batch = batch.sort_values(["agent_id", "timestamp"]).reset_index(drop=True)
+    assert len(streamed) == len(batch)
+    assert list(streamed["agent_id"].astype(str)) == list(batch["agent_id"].astype(str))
+    np.testing.assert_allclose(streamed["lat_kalman"], batch["lat_kalman"], rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(streamed["speed_m_s"], batch["speed_m_s"], rtol=1e-6, atol=1e-6)
+
+
+def test_streaming_rejects_out_of_order_chunks():
+    raw = _raw_tracks()
+    streamer = StreamingPreprocessor()
+    streamer.process(raw.iloc[100:200].copy())
+    with pytest.raises(ValueError):
+        streamer.process(raw.iloc[:100].copy())
+
+
+def test_streaming_adaptive_filter_matches_batch(monkeypatch):
+    from src import config
+    from src.preprocess_data import calculate_features_parallel
+
+    monkeypatch.setattr(config, "KALMAN_ADAPTIVE", True)
+    raw = _raw_tracks()
+    raw["sensor_confidence"] = np.random.default_rng(0).uniform(0.55, 0.98, len(raw))
+
+    streamer = StreamingPreprocessor()
+    streamed = pd.concat([streamer.process(raw.iloc[i:i + 37].copy()) for i in range(0, len(raw), 37)])
+    streamed = streamed.sort_values(["agent_id", "timestamp"]).reset_index(drop=True)
+    batch = calculate_features(raw.copy())
+    parallel = calculate_features_parallel(raw.copy(), n_workers=2)
+    for col in ["lat_kalman", "lon_kalman"]:
+        np.testing.assert_allclose(streamed[col], batch[col], rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(parallel[col], batch[col], rtol=1e-9, atol=1e-9)
+
+
+def test_pipeline_chunked_preprocess_writes_the_parquet_training_input(project_root, monkeypatch):
+    pytest.importorskip("pyarrow")
+    from src import config, run_pipeline
+
+    monkeypatch.setenv("BORDER_STORAGE_FORMAT", "parquet")
+    storage.write_table(_raw_tracks(), config.raw_data_path())
+    run_pipeline._preprocess(chunksize=50, workers=None)
+
+    processed = config.processed_data_path()
+    assert processed.suffix == ".parquet"
+    assert len(storage.read_table(processed)) == 400
+    assert not list(processed.parent.glob("*.csv"))
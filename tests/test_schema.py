@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.schema import apply_schema, memory_mb
+from src.train_model import build_pipeline
+
+
+def _raw(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "timestamp": (pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(n), unit="s")).astype(str),
+            "agent_id": np.array([f"ID_{i:03d}" for i in rng.integers(0, 20, n)], dtype=object),
+            "latitude": 23.8 + rng.normal(0, 0.01, n),
+            "longitude": 69.5 + rng.normal(0, 0.01, n),
+            "speed": rng.uniform(1, 9, n),
+            "angle_change": rng.uniform(0, 130, n),
+            "sensor_confidence": np.round(rng.uniform(0.55, 0.98, n), 2),
+            "object_type": rng.choice(["Human", "Animal", "Vehicle", "Drone"], n).astype(object),
+            "terrain": rng.choice(["Salt Flat", "Marshy", "Sandy"], n).astype(object),
+            "visibility": rng.choice(["Clear", "Foggy", "Night"], n).astype(object),
+            "speed_m_s": rng.uniform(0, 9, n),
+            "dist_moved_m": rng.uniform(0, 9, n),
+            "label": rng.integers(0, 2, n),
+            "extra": np.arange(n),
+        }
+    )
+
+
+def test_columns_are_cast_to_schema_dtypes():
+    out = apply_schema(_raw())
+    assert out["timestamp"].dtype == "datetime64[ns]"
+    for col in ["agent_id", "object_type", "terrain", "visibility"]:
+        assert isinstance(out[col].dtype, pd.CategoricalDtype)
+    assert out["speed_m_s"].dtype == np.float32
+    assert out["latitude"].dtype == np.float64
+    assert out["speed"].dtype == np.float64
+    assert out["label"].dtype == np.int8
+    # Unknown columns are left alone
+    assert out["extra"].dtype == np.int64
+
+
+def test_schema_cuts_memory_at_least_three_fold():
+    raw = _raw(20_000).drop(columns="extra")
+    # Text as loaded by read_csv with Python string objects
+    for col in ["timestamp", "agent_id", "object_type", "terrain", "visibility"]:
+        raw[col] = raw[col].astype(object)
+    assert memory_mb(raw) / memory_mb(apply_schema(raw)) >= 3.0
+
+
+def test_model_outputs_are_identical():
+    raw = _raw()
+    numeric = ["speed", "angle_change", "sensor_confidence"]
+    categorical = ["object_type", "terrain", "visibility"]
+    typed = apply_schema(raw)
+
+    a = build_pipeline(numeric, categorical).fit(raw[numeric + categorical], raw["label"])
+    b = build_pipeline(numeric, categorical).fit(typed[numeric + categorical], typed["label"])
+    np.testing.assert_array_equal(a.predict_proba(raw[numeric + categorical]),
+                                  b.predict_proba(typed[numeric + categorical]))
+
+
+def test_validation_errors():
+    with pytest.raises(KeyError):
+        apply_schema(_raw(), required=["latitude", "missing"])
+
+    bad = _raw()
+    bad.loc[3, "latitude"] = 123.0
+    bad.loc[4, "sensor_confidence"] = 1.5
+    with pytest.raises(ValueError, match="latitude.*sensor_confidence"):
+        apply_schema(bad)
+
+
+def test_missing_values_pass_validation_and_stay_missing():
+    raw = _raw()
+    for row, col in enumerate(["latitude", "longitude", "sensor_confidence", "agent_id",
+                               "object_type", "terrain", "visibility"]):
+        raw.loc[row, col] = np.nan
+    out = apply_schema(raw)
+
+    for row, col in enumerate(["latitude", "longitude", "sensor_confidence"]):
+        assert np.isnan(out.loc[row, col])
+    for row, col in enumerate(["agent_id", "object_type", "terrain", "visibility"], start=3):
+        assert pd.isna(out.loc[row, col])
+        assert "nan" not in out[col].cat.categories
+    assert out["object_type"].notna().sum() == len(raw) - 1
+
+
+def test_missing_categories_survive_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    from src import storage
+
+    raw = _raw(60)
+    raw.loc[5, "terrain"] = np.nan
+    storage.write_table(raw, tmp_path / "raw.parquet")
+    out = storage.read_table(tmp_path / "raw.parquet")
+    assert out["terrain"].isna().sum() == 1
+    assert "nan" not in out["terrain"].cat.categories
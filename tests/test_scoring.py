@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from src.preprocess_data import calculate_features
+from src.scoring import TrackScorer, TrackStore
+
+
+class SpeedModel:
+    """Stand-in model whose threat score is the normalised input speed."""
+
+    def predict_proba(self, X):
+        p = np.clip(X["speed"].to_numpy() / 100.0, 0, 1)
+        return np.column_stack([1 - p, p])
+
+
+def _fixes(n_rows=120, n_agents=4, seed=5):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "agent_id": rng.choice(["A", "B", "C", "D"][:n_agents], n_rows),
+            "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(n_rows) * 2, unit="s"),
+            "latitude": 23.8 + rng.normal(0, 1e-4, n_rows).cumsum(),
+            "longitude": 69.5 + rng.normal(0, 1e-4, n_rows).cumsum(),
+            "sensor_confidence": 0.9,
+            "object_type": "Human",
+            "terrain": "Sandy",
+            "visibility": "Clear",
+        }
+    )
+
+
+def test_incremental_features_match_batch():
+    fixes = _fixes()
+    scorer = TrackScorer(model=SpeedModel(), capacity=2)
+    online = scorer.score_batch(fixes)
+
+    batch = calculate_features(fixes.copy())
+    online = online.sort_values(["agent_id", "timestamp"]).reset_index(drop=True)
+    for col in ["lat_kalman", "lon_kalman", "angle_change"]:
+        np.testing.assert_allclose(online[col], batch[col], rtol=1e-9, atol=1e-9)
+    # Stored as float32 in the batch features
+    for col in ["dist_moved_m", "speed_m_s"]:
+        np.testing.assert_allclose(online[col], batch[col], rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(online["threat_score"], np.clip(batch["speed_m_s"] / 100.0, 0, 1), rtol=1e-6)
+
+
+def test_single_fix_score():
+    scorer = TrackScorer(model=SpeedModel())
+    fix = _fixes().iloc[0].to_dict()
+    # First fix of a track has no motion yet
+    assert scorer.score(fix) == 0.0
+    assert len(scorer.tracks) == 1
+
+
+def test_stale_tracks_are_evicted_and_slots_reused():
+    store = TrackStore(capacity=2)
+    a, _ = store.slot("A")
+    store.t_ns[a] = 10
+    b, _ = store.slot("B")
+    store.t_ns[b] = 50
+
+    assert store.evict_before(20) == ["A"]
+    assert "A" not in store and "B" in store
+    c, is_new = store.slot("C")
+    assert is_new and c == a
+
+
+def test_micro_batches_match_fix_by_fix():
+    fixes = _fixes(n_rows=90)
+    one_by_one = TrackScorer(model=SpeedModel())
+    expected = [one_by_one.score(fix) for fix in fixes.to_dict("records")]
+
+    batched = TrackScorer(model=SpeedModel(), capacity=2)
+    scores = pd.concat([batched.score_batch(fixes.iloc[i:i + 25]) for i in range(0, len(fixes), 25)])
+    np.testing.assert_allclose(scores["threat_score"], expected, rtol=1e-9, atol=1e-12)
+
+
+def test_adaptive_filter_matches_batch_online(monkeypatch):
+    from src import config
+
+    monkeypatch.setattr(config, "KALMAN_ADAPTIVE", True)
+    fixes = _fixes(n_rows=90)
+    fixes["sensor_confidence"] = np.random.default_rng(1).uniform(0.55, 0.98, len(fixes))
+
+    one_by_one = TrackScorer(model=SpeedModel())
+    expected = [one_by_one.score(fix) for fix in fixes.to_dict("records")]
+    batched = TrackScorer(model=SpeedModel())
+    online = pd.concat([batched.score_batch(fixes.iloc[i:i + 25]) for i in range(0, len(fixes), 25)])
+    np.testing.assert_allclose(online["threat_score"], expected, rtol=1e-9, atol=1e-12)
+
+    batch = calculate_features(fixes.copy())
+    online = online.sort_values(["agent_id", "timestamp"]).reset_index(drop=True)
+    np.testing.assert_allclose(online["lat_kalman"], batch["lat_kalman"], rtol=1e-9, atol=1e-9)
@@ -0,0 +1,130 @@
+import sys
+
+import pandas as pd
+import pytest
+
+from src import config, instrumentation, run_pipeline, storage
+from src.stage_cache import StageCache
+
+
+def _writer(path, text, calls):
+    def run():
+        calls.append(text)
+        path.write_text(text)
+    return run
+
+
+def test_hits_only_when_inputs_params_and_code_match(tmp_path):
+    cache = StageCache(tmp_path / "cache", max_bytes=1 << 20)
+    src, out = tmp_path / "in.txt", tmp_path / "out.txt"
+    src.write_text("a")
+    calls = []
+
+    def run(params, text="x"):
+        return cache.run("stage", _writer(out, text, calls), inputs=[src], outputs=[out],
+                         params=params, code=[config])
+
+    assert not run({"n": 1})
+    out.unlink()
+    assert run({"n": 1}, text="never written")
+    assert out.read_text() == "x"
+    assert calls == ["x"]
+
+    assert not run({"n": 2})
+    src.write_text("b")
+    assert not run({"n": 2})
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_directory_outputs_round_trip(tmp_path):
+    cache = StageCache(tmp_path / "cache", max_bytes=1 << 20)
+    out = tmp_path / "artifact"
+
+    def build():
+        (out / "sub").mkdir(parents=True)
+        (out / "sub" / "a.npy").write_bytes(b"123")
+
+    cache.run("train", build, outputs=[out])
+    (out / "sub" / "a.npy").write_bytes(b"changed")
+    (out / "extra").write_text("stale")
+
+    assert cache.run("train", build, outputs=[out])
+    assert (out / "sub" / "a.npy").read_bytes() == b"123"
+    assert not (out / "extra").exists()
+
+
+def test_stage_missing_an_output_raises_and_is_not_cached(tmp_path):
+    cache = StageCache(tmp_path / "cache", max_bytes=1 << 20)
+    out, never = tmp_path / "out.txt", tmp_path / "never_written"
+    calls = []
+
+    for _ in range(2):
+        with pytest.raises(FileNotFoundError, match="never_written"):
+            cache.run("stage", _writer(out, "x", calls), outputs=[out, never])
+    assert calls == ["x", "x"]
+    assert cache.entries() == [] and cache.hits == 0
+
+
+def test_preprocess_errors_are_not_swallowed(project_root, monkeypatch):
+    def broken(df):
+        raise ValueError("bad raw data")
+
+    storage.write_table(pd.DataFrame({"timestamp": ["2025-01-01"], "latitude": [23.8],
+                                      "longitude": [68.7], "agent_id": ["A"]}),
+                        config.raw_data_path())
+    monkeypatch.setattr(run_pipeline.preprocess_data, "calculate_features", broken)
+    with pytest.raises(ValueError, match="bad raw data"):
+        run_pipeline._preprocess(chunksize=None, workers=None)
+
+    config.raw_data_path().unlink()
+    with pytest.raises(FileNotFoundError):
+        run_pipeline._preprocess(chunksize=None, workers=None)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = StageCache(tmp_path / "cache", max_bytes=2_500)
+    out = tmp_path / "out.bin"
+
+    def store(name):
+        out.write_bytes(b"x" * 1_000)
+        cache.store(name, "k", [out])
+
+    store("a")
+    store("b")
+    # Using "a" makes "b" the least recently used entry
+    assert cache.restore("a", "k", [tmp_path / "restored.bin"])
+    store("c")
+
+    assert sorted(p.name for p in cache.root.iterdir()) == ["a-k", "c-k"]
+    assert cache.size() <= 2_500
+
+    # An entry larger than the whole cache is not stored
+    out.write_bytes(b"x" * 3_000)
+    assert not cache.store("d", "k", [out])
+
+
+def test_run_all_reruns_only_downstream_stages(tmp_path, monkeypatch, capsys):
+    for module in {config, sys.modules.get("config")} - {None}:
+        monkeypatch.setattr(module, "PROJECT_ROOT", tmp_path)
+    monkeypatch.delenv("BORDER_CACHE_DIR", raising=False)
+    monkeypatch.setenv("MPLBACKEND", "Agg")
+    monkeypatch.chdir(tmp_path)
+    for sub in ("data/raw", "data/processed", "models", "visuals", "outputs"):
+        (tmp_path / sub).mkdir(parents=True)
+    instrumentation.reset()
+    instrumentation.configure(True)
+    try:
+        run_pipeline.run_all(n_points=120)
+        run_pipeline.run_all(n_points=120)
+        assert instrumentation.snapshot()["counters"] == {
+            "stage_cache_misses": 5, "stage_cache_hits": 5}
+        capsys.readouterr()
+
+        run_pipeline.run_all(n_points=120, chunksize=40)
+        restored = [line.split(":")[0].strip() for line in capsys.readouterr().out.splitlines()
+                    if "restored from cache" in line]
+        assert "generate" in restored and "preprocess" not in restored
+        assert (tmp_path / "models" / "border_intruder_model.pkl").exists()
+    finally:
+        instrumentation.configure(False)
+        instrumentation.reset()
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import storage
+
+
+def _frame(n=60):
+    return pd.DataFrame(
+        {
+            "timestamp": pd.date_range("2025-01-01 23:59:30", periods=n, freq="s").astype(str),
+            "agent_id": np.tile(["ID_001", "ID_002", "ID_003"], n // 3),
+            "object_type": np.tile(["Human", "Drone"], n // 2),
+            "speed": np.arange(n, dtype=float),
+            "label": np.arange(n) % 2,
+        }
+    )
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_round_trip_keeps_rows_and_order(tmp_path, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    df = _frame()
+    path = tmp_path / f"data{suffix}"
+    storage.write_table(df, path)
+
+    out = storage.read_table(path)
+    assert list(out.columns) == list(df.columns)
+    np.testing.assert_array_equal(out["speed"], df["speed"])
+    assert list(out["agent_id"].astype(str)) == list(df["agent_id"])
+
+
+def test_parquet_partitions_and_column_projection(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "data.parquet"
+    storage.write_table(_frame(), path)
+
+    # Data straddles midnight, so there is one partition per day
+    assert sorted(p.name for p in path.iterdir()) == ["date=2025-01-01", "date=2025-01-02"]
+
+    out = storage.read_table(path, columns=["speed", "object_type", "missing"])
+    assert list(out.columns) == ["speed", "object_type"]
+    assert isinstance(out["object_type"].dtype, pd.CategoricalDtype)
+
+
+def test_unknown_suffix_raises(tmp_path):
+    with pytest.raises(ValueError):
+        storage.write_table(_frame(), tmp_path / "data.xlsx")
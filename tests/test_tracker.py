@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.geofence import METRES_PER_DEGREE
+from src.preprocess_data import StreamingPreprocessor, calculate_features
+from src.tracker import MultiTargetTracker, assign_tracks
+
+
+def _detections(n_agents=40, n_steps=25, noise_m=5.0, spacing_m=500.0, seed=0, times=None):
+    """
+    Agents on a grid moving at constant velocity, one shuffled frame per
+    second, or at ``times`` (seconds) when given.
+    """
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(n_agents)))
+    grid = np.arange(n_agents)
+    north0 = (grid // side) * spacing_m
+    east0 = (grid % side) * spacing_m
+    velocity = rng.uniform(-8, 8, (n_agents, 2))
+
+    times = np.arange(n_steps) if times is None else times
+    rows = []
+    for step in times:
+        north = north0 + velocity[:, 0] * step + rng.normal(0, noise_m, n_agents)
+        east = east0 + velocity[:, 1] * step + rng.normal(0, noise_m, n_agents)
+        for agent in rng.permutation(n_agents):
+            rows.append({
+                "timestamp": pd.Timestamp("2025-01-01") + pd.Timedelta(seconds=int(step)),
+                "latitude": 23.8 + north[agent] / METRES_PER_DEGREE,
+                "longitude": 69.5 + east[agent] / (METRES_PER_DEGREE * np.cos(np.radians(23.8))),
+                "true_agent": agent,
+            })
+    return pd.DataFrame(rows)
+
+
+def _one_track_per_agent(df, ids):
+    pairs = pd.DataFrame({"agent": df["true_agent"].to_numpy(), "track": ids})
+    return (pairs.groupby("agent")["track"].nunique().eq(1).all()
+            and pairs.groupby("track")["agent"].nunique().eq(1).all())
+
+
+def test_separated_agents_get_one_track_each():
+    df = _detections()
+    out = assign_tracks(df.drop(columns="true_agent"))
+
+    assert out.index.equals(df.index)
+    assert out["agent_id"].str.match(r"^TRK_\d{6}$").all()
+    assert _one_track_per_agent(df, out["agent_id"].to_numpy())
+
+
+def test_crossing_targets_keep_their_identity():
+    # Two targets pass within 10 m of each other at right angles
+    rows = []
+    for step in range(30):
+        for agent, (north, east) in enumerate([(-150 + 10 * step, 0.0), (0.0, -145 + 10 * step)]):
+            rows.append({
+                "timestamp": pd.Timestamp("2025-01-01") + pd.Timedelta(seconds=step),
+                "latitude": 23.8 + north / METRES_PER_DEGREE,
+                "longitude": 69.5 + east / (METRES_PER_DEGREE * np.cos(np.radians(23.8))),
+                "true_agent": agent,
+            })
+    df = pd.DataFrame(rows)
+    ids = MultiTargetTracker(measurement_noise_m=5.0, acceleration_noise_m_s2=0.5).assign(df)
+    assert _one_track_per_agent(df, ids)
+
+
+def test_tracks_coast_through_missed_frames_then_end():
+    df = _detections(n_agents=4, n_steps=20, noise_m=2.0)
+    t = df["timestamp"]
+    # Agent 0 is missed for 2 frames, agent 1 for 5
+    missed = ((df["true_agent"] == 0) & t.isin(t.unique()[8:10])) | (
+        (df["true_agent"] == 1) & t.isin(t.unique()[8:13]))
+    df = df[~missed].reset_index(drop=True)
+    ids = MultiTargetTracker(max_coast_s=2.0).assign(df)
+
+    per_agent = pd.Series(ids).groupby(df["true_agent"]).nunique()
+    assert per_agent[0] == 1
+    assert per_agent[1] == 2
+    assert per_agent[2] == per_agent[3] == 1
+
+
+def test_gating_follows_the_time_between_frames():
+    # Frames every second, then nothing for 20 s while the agents move up to
+    # 160 m: predicting one step would leave them outside the gate
+    times = np.r_[np.arange(10), np.arange(30, 40)]
+    df = _detections(n_agents=9, n_steps=20, noise_m=2.0, spacing_m=1000.0, times=times)
+    tracker = MultiTargetTracker()
+    ids = tracker.assign(df.drop(columns="true_agent"))
+
+    assert _one_track_per_agent(df, ids)
+    assert tracker.last_t_ns == df["timestamp"].max().value
+
+
+def test_chunks_match_one_pass_even_when_a_frame_is_split():
+    df = _detections().drop(columns="true_agent")
+    whole = MultiTargetTracker().assign(df)
+
+    tracker = MultiTargetTracker()
+    # 130 rows per chunk splits most frames of 40 detections
+    parts = [tracker.assign(df.iloc[i:i + 130]) for i in range(0, len(df), 130)]
+    assert _one_track_per_agent(_detections(), np.concatenate(parts))
+    assert tracker.next_id == MultiTargetTracker().next_id + len(np.unique(whole))
+
+    with pytest.raises(ValueError):
+        tracker.assign(df.iloc[:10])
+
+
+def test_preprocessing_tracks_rows_without_agent_id():
+    df = _detections(n_agents=9, n_steps=12)
+    out = calculate_features(df.drop(columns="true_agent"))
+    assert out["agent_id"].astype(str).str.startswith("TRK_").all()
+    assert out["agent_id"].nunique() == 9
+
+    streaming = StreamingPreprocessor()
+    raw = df.drop(columns="true_agent")
+    parts = [streaming.process(raw.iloc[i:i + 25].copy()) for i in range(0, len(raw), 25)]
+    assert pd.concat(parts)["agent_id"].nunique() == 9
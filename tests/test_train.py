@@ -1,12 +1,13 @@
 from pathlib import Path
 
+import joblib
 import pandas as pd
 
 from src import config
 from src.train_model import train_elite_model
 
 
-def test_train_creates_model(tmp_path):
+def test_train_creates_model(project_root):
     # Prepare a tiny dataset matching expected columns
     rows = []
     for i in range(20):
@@ -32,10 +33,13 @@ def test_train_creates_model(tmp_path):
 
     model_file = Path(config.model_path())
     assert model_file.exists()
-
-    # Clean up artifacts
-    try:
-        model_file.unlink()
-        raw.unlink()
-    except OSError:
-        pass
+    # Everything lands under the temporary project root
+    assert model_file.parent == project_root / "models"
+    assert (project_root / "models" / "registry" / "v0001").is_dir()
+    assert (project_root / "outputs" / "training_report.json").exists()
+
+    # Folds ran on one core each; the saved forest uses every core
+    assert joblib.load(model_file).named_steps["classifier"].n_jobs == -1
+    # The fold cache is cleared once training is done
+    cache = Path(config.cache_dir()) / "pipeline"
+    assert not any(path.is_file() for path in cache.glob("joblib/**/*"))
@@ -0,0 +1,50 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.train_model import search_hyperparameters, write_training_report
+
+NUMERIC = ["speed", "angle_change", "sensor_confidence"]
+CATEGORICAL = ["object_type", "terrain", "visibility"]
+GRID = {"classifier__n_estimators": [5, 10], "classifier__max_depth": [3, None]}
+
+
+def _data(n=240, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        {
+            "speed": rng.uniform(1, 9, n),
+            "angle_change": rng.uniform(0, 130, n),
+            "sensor_confidence": rng.uniform(0.55, 0.98, n),
+            "object_type": rng.choice(["Human", "Drone"], n),
+            "terrain": rng.choice(["Sandy", "Marshy"], n),
+            "visibility": rng.choice(["Clear", "Night"], n),
+        }
+    )
+    return X, (X["speed"] > 5).astype(int)
+
+
+@pytest.mark.parametrize("method", ["grid", "halving"])
+def test_search_reports_every_configuration(tmp_path, method):
+    X, y = _data()
+    search, report = search_hyperparameters(
+        X, y, NUMERIC, CATEGORICAL, method=method, param_grid=GRID,
+        cv=3, n_jobs=1, memory=str(tmp_path / "cache"),
+    )
+
+    assert report["method"] == method
+    assert report["wall_time_s"] > 0
+    assert set(report["best_params"]) == {"n_estimators", "max_depth"}
+    assert len(report["configurations"]) >= 4
+    assert all("fit_time_s" in c and "mean_score" in c for c in report["configurations"])
+
+    path = write_training_report(report, tmp_path / "report.json")
+    assert json.loads(path.read_text())["best_score"] == report["best_score"]
+
+
+def test_unknown_search_method():
+    X, y = _data()
+    with pytest.raises(ValueError):
+        search_hyperparameters(X, y, NUMERIC, CATEGORICAL, method="random")
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import storage
+from src.preprocess_data import calculate_features, haversine, preprocess_streaming
+from src.window_features import WINDOW_STATS, window_columns, window_features
+
+
+def _tracks(n=300, n_agents=4, seed=0):
+    rng = np.random.default_rng(seed)
+    agent = np.sort(rng.integers(0, n_agents, n))
+    gaps = rng.choice([1, 2, 5, 40], n, p=[0.6, 0.2, 0.15, 0.05]) * 10**9
+    t_ns = np.cumsum(gaps)
+    new_track = np.r_[True, agent[1:] != agent[:-1]]
+    speed = rng.uniform(0, 10, n)
+    speed[new_track] = 0.0
+    dist_moved = np.where(rng.random(n) < 0.1, 0.0, rng.uniform(0, 20, n))
+    dist_moved[new_track] = 0.0
+    return {
+        "t_ns": t_ns,
+        "new_track": new_track,
+        "lat": 23.8 + rng.normal(0, 1e-4, n).cumsum(),
+        "lon": 68.7 + rng.normal(0, 1e-4, n).cumsum(),
+        "speed": speed,
+        "direction": rng.uniform(-np.pi, np.pi, n),
+        "dist_moved": dist_moved,
+        "time_delta": np.where(new_track, 0.0, np.r_[0, np.diff(t_ns)] / 1e9),
+        "dist_to_border": rng.uniform(0, 1_000, n),
+    }
+
+
+def _brute_force(d, w, dwell_m):
+    """Each window re-scanned from scratch."""
+    n = len(d["t_ns"])
+    track = np.cumsum(d["new_track"])
+    out = {stat: np.zeros(n) for stat in WINDOW_STATS}
+    for i in range(n):
+        js = [j for j in range(i + 1)
+              if track[j] == track[i] and d["t_ns"][j] > d["t_ns"][i] - w * 10**9]
+        left = js[0]
+        steps = js[1:]
+        dt = (d["t_ns"][i] - d["t_ns"][left]) / 1e9
+        moving = [j for j in steps if d["dist_moved"][j] > 0]
+        path = sum(d["dist_moved"][j] for j in steps)
+        disp = haversine(d["lat"][left], d["lon"][left], d["lat"][i], d["lon"][i])
+        out["speed_mean"][i] = np.mean(d["speed"][js])
+        out["speed_max"][i] = np.max(d["speed"][js])
+        out["accel"][i] = (d["speed"][i] - d["speed"][left]) / dt if dt > 0 else 0.0
+        if moving:
+            c = np.cos(d["direction"][moving]).sum()
+            s = np.sin(d["direction"][moving]).sum()
+            out["heading_var"][i] = 1.0 - np.hypot(c, s) / len(moving)
+        out["tortuosity"][i] = path / max(disp, 1.0) if path > 0 else 1.0
+        out["dwell_near_border_s"][i] = sum(
+            d["time_delta"][j] for j in steps if d["dist_to_border"][j] <= dwell_m)
+        out["approach_rate"][i] = (
+            (d["dist_to_border"][left] - d["dist_to_border"][i]) / dt if dt > 0 else 0.0)
+    return out
+
+
+def test_matches_brute_force_windows():
+    d = _tracks()
+    windows = (10, 60)
+    features = window_features(**d, windows=windows, dwell_m=400.0)
+    assert list(features) == window_columns(windows)
+
+    for w in windows:
+        expected = _brute_force(d, w, 400.0)
+        for stat in WINDOW_STATS:
+            np.testing.assert_allclose(features[f"{stat}_{w}s"], expected[stat],
+                                       rtol=1e-5, atol=1e-4, err_msg=f"{stat}_{w}s")
+
+
+def test_handles_empty_input():
+    d = {name: values[:0] for name, values in _tracks().items()}
+    features = window_features(**d, windows=(10,))
+    assert all(len(v) == 0 for v in features.values())
+
+
+def test_streaming_matches_batch_windows(tmp_path):
+    rng = np.random.default_rng(4)
+    n = 600
+    raw = pd.DataFrame(
+        {
+            "timestamp": (pd.Timestamp("2025-01-01")
+                          + pd.to_timedelta(np.cumsum(rng.integers(1, 4, n)), unit="s")).astype(str),
+            "latitude": 23.8 + rng.normal(0, 1e-4, n).cumsum(),
+            "longitude": 68.7 + rng.normal(0, 1e-4, n).cumsum(),
+            "agent_id": rng.choice([f"ID_{i:03d}" for i in range(5)], n),
+        }
+    )
+    raw_path, out_path = tmp_path / "raw.csv", tmp_path / "featured.csv"
+    raw.to_csv(raw_path, index=False)
+    preprocess_streaming(raw_path, out_path, chunksize=53)
+
+    batch = calculate_features(raw.copy())
+    streamed = storage.read_table(out_path).sort_values(["agent_id", "timestamp"])
+    streamed = streamed.reset_index(drop=True)
+    for col in window_columns():
+        np.testing.assert_allclose(streamed[col], batch[col], rtol=1e-4, atol=1e-3, err_msg=col)
+    assert batch["dwell_near_border_s_300s"].dtype == np.float32
+
+
+@pytest.mark.parametrize("n", [1, 2])
+def test_short_tracks(n):
+    d = {name: values[:n] for name, values in _tracks().items()}
+    features = window_features(**d, windows=(10,))
+    assert features["speed_mean_10s"][0] == pytest.approx(d["speed"][0])
+    assert features["tortuosity_10s"][0] == 1.0
+
+
+def test_window_starts_with_many_long_tracks():
+    # 4,000 tracks of 30 days each: a per-track offset of the longest
+    # duration in ns would overflow int64
+    from src.window_features import _window_starts
+
+    n_tracks, day_ns = 4_000, 86_400 * 10**9
+    offsets = np.array([0, 30 * day_ns - 30 * 10**9, 30 * day_ns])
+    t_ns = (np.arange(n_tracks)[:, None] * 10**9 + offsets).ravel()
+    new_track = np.tile([True, False, False], n_tracks)
+
+    left = _window_starts(t_ns, new_track, 60 * 10**9)
+    first = np.arange(n_tracks) * 3
+    np.testing.assert_array_equal(left.reshape(-1, 3), np.column_stack([first, first + 1, first + 1]))